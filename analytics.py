@@ -0,0 +1,115 @@
+"""Vectorized campaign analytics over the daily rollups.
+
+load_campaign_metrics() pulls budget, schedule and funnel totals for every
+campaign in one query and returns them as columnar NumPy arrays;
+compute_campaign_kpis() derives rates, pacing and rankings for all campaigns
+at once with array operations.
+
+No spend data is tracked, so spend is estimated from linear budget pacing:
+burn_rate is the share of the campaign's scheduled days already elapsed, and
+cost_per_click divides the budget spent so far under that pacing by clicks.
+"""
+import logging
+
+import numpy as np
+import psycopg2
+
+from backend import get_db_connection, release_db_connection
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_METRICS_SQL = """
+    SELECT c.id,
+           c.name,
+           c.budget::float8 AS budget,
+           GREATEST(c.end_date - c.start_date + 1, 1) AS duration_days,
+           LEAST(GREATEST(CURRENT_DATE - c.start_date + 1, 0), GREATEST(c.end_date - c.start_date + 1, 1)) AS elapsed_days,
+           COALESCE(SUM(d.total) FILTER (WHERE d.metric_name = 'emails_sent'), 0)::float8 AS sent,
+           COALESCE(SUM(d.total) FILTER (WHERE d.metric_name = 'emails_opened'), 0)::float8 AS opened,
+           COALESCE(SUM(d.total) FILTER (WHERE d.metric_name = 'emails_clicked'), 0)::float8 AS clicked
+    FROM campaigns c
+    LEFT JOIN campaign_performance_daily d ON d.campaign_id = c.id
+    GROUP BY c.id
+    ORDER BY c.id;
+"""
+
+NUMERIC_COLUMNS = ("budget", "duration_days", "elapsed_days", "sent", "opened", "clicked")
+
+# KPI columns that can be ranked, and whether higher is better
+RANKABLE = {
+    "open_rate": True,
+    "click_through_rate": True,
+    "click_to_open_rate": True,
+    "cost_per_click": False,
+    "burn_rate": True,
+    "clicked": True,
+}
+
+def _columns_from_rows(rows, names):
+    """Transposes fetched tuples into one array per column."""
+    columns = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+    arrays = {"id": np.asarray(columns["id"], dtype=np.int64), "name": np.asarray(columns["name"], dtype=object)}
+    for name in NUMERIC_COLUMNS:
+        arrays[name] = np.asarray(columns[name], dtype=np.float64)
+    return arrays
+
+def load_campaign_metrics():
+    """Returns {column: ndarray} with id, name, budget, schedule days and funnel totals for every campaign."""
+    conn = get_db_connection(read_only=True)
+    if conn is None:
+        return {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(CAMPAIGN_METRICS_SQL)
+            names = [column.name for column in cur.description]
+            return _columns_from_rows(cur.fetchall(), names)
+    except psycopg2.Error as e:
+        logger.error("Error loading campaign metrics: %s", e)
+        return {}
+    finally:
+        release_db_connection(conn)
+
+def _ratio(numerator, denominator):
+    """Element-wise numerator / denominator, NaN where the denominator is zero."""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+def rank(values, higher_is_better=True):
+    """Returns 1-based dense-order ranks; NaN values rank last."""
+    keys = np.where(np.isnan(values), -np.inf if higher_is_better else np.inf, values)
+    order = np.argsort(-keys if higher_is_better else keys, kind="stable")
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    return ranks
+
+def compute_campaign_kpis(metrics):
+    """Adds rate, pacing, cost and rank columns to a load_campaign_metrics() result."""
+    kpis = dict(metrics)
+    kpis["open_rate"] = _ratio(metrics["opened"], metrics["sent"])
+    kpis["click_through_rate"] = _ratio(metrics["clicked"], metrics["sent"])
+    kpis["click_to_open_rate"] = _ratio(metrics["clicked"], metrics["opened"])
+    kpis["burn_rate"] = _ratio(metrics["elapsed_days"], metrics["duration_days"])
+    kpis["spend_to_date"] = metrics["budget"] * np.nan_to_num(kpis["burn_rate"])
+    kpis["cost_per_click"] = _ratio(kpis["spend_to_date"], metrics["clicked"])
+    for column, higher_is_better in RANKABLE.items():
+        kpis[f"{column}_rank"] = rank(kpis[column], higher_is_better)
+    return kpis
+
+def campaign_leaderboard(kpis, sort_by="click_through_rate", top=20, min_sent=0):
+    """Returns the top campaigns by `sort_by` as a columnar dict, skipping those with fewer than min_sent emails."""
+    if sort_by not in RANKABLE:
+        raise ValueError(f"cannot rank by {sort_by!r}")
+    eligible = np.flatnonzero(kpis["sent"] >= min_sent)
+    ranks = rank(kpis[sort_by][eligible], RANKABLE[sort_by])
+    chosen = eligible[np.argsort(ranks, kind="stable")[:top]]
+    board = {column: values[chosen] for column, values in kpis.items()}
+    board["rank"] = np.arange(1, len(chosen) + 1)
+    return board
+
+def get_campaign_leaderboard(sort_by="click_through_rate", top=20, min_sent=0):
+    """Loads every campaign's rollups in one query and returns the leaderboard columns ({} on error)."""
+    metrics = load_campaign_metrics()
+    if not metrics:
+        return {}
+    return campaign_leaderboard(compute_campaign_kpis(metrics), sort_by, top, min_sent)
@@ -0,0 +1,262 @@
+"""asyncio counterpart of the backend read and insight functions.
+
+Built on psycopg 3 (`pip install "psycopg[binary,pool]"`) with an
+AsyncConnectionPool sized like the synchronous one. Functions keep the names,
+arguments and return values of their backend.py equivalents and reuse its SQL,
+so independent queries can be fanned out with asyncio.gather:
+
+    totals, series, insights = await asyncio.gather(
+        get_performance_totals_by_campaign(campaign_id),
+        get_performance_series(campaign_id, start=start, end=end),
+        get_insights_snapshot(),
+    )
+
+Each event loop gets its own pool, opened on first use and closed when the
+loop shuts down its async generators (asyncio.run does this on exit), so
+repeated asyncio.run calls do not leak connections.
+"""
+import asyncio
+import logging
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+import backend
+
+logger = logging.getLogger(__name__)
+
+# Per event loop: its pool, the lock guarding the pool's creation, and the guard that closes it
+_pools = {}
+_pool_locks = {}
+_lifetimes = {}
+# Set once performance_archive (migration 8) has been seen, as in retention.catalog_exists
+_archive_catalog_seen = False
+
+def _conninfo():
+    return make_conninfo(
+        dbname=backend.DB_NAME,
+        user=backend.DB_USER,
+        password=backend.DB_PASSWORD,
+        host=backend.DB_HOST,
+        port=backend.DB_PORT,
+    )
+
+async def _close_on_shutdown(loop):
+    """Stays suspended while `loop` runs; closing it (shutdown_asyncgens or close_pool) closes the loop's pool."""
+    try:
+        yield
+    finally:
+        _lifetimes.pop(loop, None)
+        _pool_locks.pop(loop, None)
+        pool = _pools.pop(loop, None)
+        if pool is not None:
+            await pool.close()
+
+async def get_pool():
+    """Returns the async pool for the running event loop, opening it on first use."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is not None:
+        return pool
+    async with _pool_locks.setdefault(loop, asyncio.Lock()):
+        if loop not in _pools:
+            pool = AsyncConnectionPool(
+                _conninfo(),
+                min_size=backend.DB_POOL_MIN,
+                max_size=backend.DB_POOL_MAX,
+                timeout=backend.DB_POOL_TIMEOUT,
+                max_lifetime=backend.DB_POOL_MAX_AGE,
+                max_idle=backend.DB_POOL_PING_AFTER * 10,
+                check=AsyncConnectionPool.check_connection,
+                open=False,
+            )
+            await pool.open()
+            _pools[loop] = pool
+            # The loop tracks started async generators and closes them on shutdown
+            lifetime = _close_on_shutdown(loop)
+            await lifetime.asend(None)
+            _lifetimes[loop] = lifetime
+    return _pools[loop]
+
+async def close_pool():
+    """Closes the pool owned by the running event loop."""
+    lifetime = _lifetimes.get(asyncio.get_running_loop())
+    if lifetime is not None:
+        await lifetime.aclose()
+
+async def _fetch(sql, params=None, one=False, dicts=True):
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=dict_row if dicts else None) as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchone() if one else await cur.fetchall()
+
+async def _scalar(sql, params=None):
+    row = await _fetch(sql, params, one=True, dicts=False)
+    return row[0] if row else None
+
+# --- Campaigns and Customers ---
+
+async def read_campaigns(channel=None):
+    """Retrieves all campaigns with their associated channels, optionally only those using `channel`."""
+    try:
+        return await _fetch(*backend._campaigns_query(channel))
+    except psycopg.Error as e:
+        logger.error("Error reading campaigns: %s", e)
+        return []
+
+async def read_campaigns_page(page_size=None, after=None, channel=None):
+    """Returns one page of campaigns (newest start_date first) and the key for the next page."""
+    page_size = page_size or backend.PAGE_SIZE
+    try:
+        rows = await _fetch(*backend._campaigns_query(channel, after, page_size + 1))
+        return backend._keyset_page(rows, page_size, ("start_date", "id"))
+    except psycopg.Error as e:
+        logger.error("Error reading campaigns page: %s", e)
+        return [], None
+
+async def read_customers_page(page_size=None, after=None):
+    """Returns one page of customers (newest first) and the key for the next page."""
+    page_size = page_size or backend.PAGE_SIZE
+    try:
+        if after:
+            rows = await _fetch(
+                "SELECT * FROM customers WHERE (created_at, id) < (%s, %s) ORDER BY created_at DESC, id DESC LIMIT %s;",
+                (*after, page_size + 1)
+            )
+        else:
+            rows = await _fetch("SELECT * FROM customers ORDER BY created_at DESC, id DESC LIMIT %s;", (page_size + 1,))
+        return backend._keyset_page(rows, page_size, ("created_at", "id"))
+    except psycopg.Error as e:
+        logger.error("Error reading customers page: %s", e)
+        return [], None
+
+# --- Performance ---
+
+async def get_performance_totals_by_campaign(campaign_id):
+    """Returns {metric_name: total} for a campaign, read from the daily rollups."""
+    try:
+        return dict(await _fetch(backend.PERFORMANCE_TOTALS_SQL, (campaign_id,), dicts=False))
+    except psycopg.Error as e:
+        logger.error("Error reading performance totals: %s", e)
+        return {}
+
+async def _read_archive(campaign_id, start, end):
+    """Like retention.read_archive: the catalog is queried on the pool, the Parquet files are read in a thread."""
+    global _archive_catalog_seen
+    import retention
+    if not _archive_catalog_seen:
+        _archive_catalog_seen = await _scalar(retention.CATALOG_EXISTS_SQL)
+        if not _archive_catalog_seen:
+            return None
+    paths = [row[0] for row in await _fetch(*retention.archive_paths_query(start, end), dicts=False)]
+    return await asyncio.to_thread(retention.read_archive_files, paths, campaign_id, start, end)
+
+async def get_performance_series(campaign_id, metrics=None, start=None, end=None, bucket=None, max_points=None):
+    """Returns time-bucketed metric sums for a campaign; see backend.get_performance_series."""
+    try:
+        if start is None or end is None:
+            bounds = await _fetch(backend.SERIES_BOUNDS_SQL, (campaign_id,), one=True)
+            if bounds["first_day"] is None:
+                return []
+            start, end = backend._series_bounds(bounds, start, end)
+        query = backend._performance_series_query(campaign_id, metrics, start, end, bucket, max_points)
+        unit = backend.choose_series_bucket(start, end, max_points, bucket)
+        archived = await _read_archive(campaign_id, start, end) if unit in backend.RAW_BUCKET_FREQUENCIES else None
+        rows = await _fetch(*query)
+        if archived is None:
+            return rows
+        import pandas as pd
+        live = pd.DataFrame(rows, columns=["bucket", "metric_name", "value"])
+        live["bucket"] = pd.to_datetime(live["bucket"])
+        frame = backend._sum_series(backend._bucket_archived(archived, unit, metrics), live)
+        return backend._frame_result(frame, "rows")
+    except (psycopg.Error, OSError) as e:
+        logger.error("Error reading performance series: %s", e)
+        return []
+
+# --- Business Insights ---
+
+async def get_total_campaign_count():
+    """Returns the total number of campaigns."""
+    try:
+        return await _scalar("SELECT COUNT(*) FROM campaigns;")
+    except psycopg.Error as e:
+        logger.error("Error getting total campaign count: %s", e)
+        return 0
+
+async def get_total_customers_count():
+    """Returns the total number of customers."""
+    try:
+        return await _scalar("SELECT COUNT(*) FROM customers;")
+    except psycopg.Error as e:
+        logger.error("Error getting total customer count: %s", e)
+        return 0
+
+async def _budget(aggregate, label):
+    try:
+        result = await _scalar(f"SELECT {aggregate}(budget) FROM campaigns;")
+        return float(result) if result else 0.0
+    except psycopg.Error as e:
+        logger.error("Error getting %s campaign budget: %s", label, e)
+        return 0.0
+
+async def get_avg_campaign_budget():
+    """Returns the average budget of all campaigns."""
+    return await _budget("AVG", "average")
+
+async def get_max_campaign_budget():
+    """Returns the maximum budget of any campaign."""
+    return await _budget("MAX", "max")
+
+async def get_min_campaign_budget():
+    """Returns the minimum budget of any campaign."""
+    return await _budget("MIN", "min")
+
+async def get_total_emails_sent():
+    """Returns the total value for the 'emails_sent' metric across all campaigns."""
+    try:
+        return await _scalar(
+            "SELECT COALESCE(SUM(total), 0) FROM campaign_performance_daily WHERE metric_name = 'emails_sent';"
+        )
+    except psycopg.Error as e:
+        logger.error("Error getting total emails sent: %s", e)
+        return 0
+
+async def get_insights_snapshot():
+    """Returns all Business Insights figures from one query (uncached)."""
+    try:
+        row = await _fetch(backend.INSIGHTS_SNAPSHOT_SQL, one=True)
+    except psycopg.Error as e:
+        logger.error("Error getting insights snapshot: %s", e)
+        return dict(backend.EMPTY_INSIGHTS)
+    for key in ("avg_budget", "max_budget", "min_budget"):
+        row[key] = float(row[key]) if row[key] else 0.0
+    return row
+
+# --- Fan-out helpers ---
+
+async def gather_queries(**queries):
+    """Awaits keyword coroutines concurrently and returns their results under the same keys."""
+    results = await asyncio.gather(*queries.values())
+    return dict(zip(queries, results))
+
+async def load_business_insights():
+    """Runs the six Business Insights aggregates concurrently."""
+    return await gather_queries(
+        total_campaigns=get_total_campaign_count(),
+        total_customers=get_total_customers_count(),
+        total_emails_sent=get_total_emails_sent(),
+        avg_budget=get_avg_campaign_budget(),
+        max_budget=get_max_campaign_budget(),
+        min_budget=get_min_campaign_budget(),
+    )
+
+async def load_performance_dashboard(campaign_id, start=None, end=None):
+    """Fetches a campaign's totals and bucketed series concurrently."""
+    return await gather_queries(
+        totals=get_performance_totals_by_campaign(campaign_id),
+        series=get_performance_series(campaign_id, start=start, end=end),
+    )
@@ -1,30 +1,616 @@
 import psycopg2
 from psycopg2 import extras
+from psycopg2 import errors as pg_errors
+from psycopg2 import pool as pg_pool
+import contextvars
+import csv
+import io
+import itertools
 import json
-from datetime import datetime
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
 import os
+import sys
+import threading
+import time
+
+import instrumentation
+import segments
+
+logger = logging.getLogger(__name__)
 
 # Database connection details, replace with your own configuration
 DB_NAME = os.environ.get("DB_NAME", "mar")
 DB_USER = os.environ.get("DB_USER", "postgres")
 DB_PASSWORD = os.environ.get("DB_PASSWORD", "1230")
 DB_HOST = os.environ.get("DB_HOST", "localhost")
+DB_PORT = int(os.environ.get("DB_PORT", "5432"))
 
-def get_db_connection():
-    """Establishes and returns a connection to the PostgreSQL database."""
-    conn = None
-    try:
-        conn = psycopg2.connect(
-            dbname=mar,
-            user=postgres,
-            password=1230,
-            host=DB_HOST
-        )
-        print("Database connection successful.")
+# Rows per multi-row INSERT when bulk loading
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", "500"))
+
+# Rows per COPY batch (and per commit) when streaming performance events
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "50000"))
+
+# Rows per page for keyset-paginated reads, and per round trip for streaming reads
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "50"))
+STREAM_ITERSIZE = int(os.environ.get("STREAM_ITERSIZE", "2000"))
+
+# Seconds a Business Insights snapshot is served from the in-process cache
+INSIGHTS_CACHE_TTL = float(os.environ.get("INSIGHTS_CACHE_TTL", "30"))
+
+# Upper bound on points per metric returned by get_performance_series
+SERIES_MAX_POINTS = int(os.environ.get("SERIES_MAX_POINTS", "500"))
+
+# Connection pool sizing and recycling
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "2"))  # connections opened up front
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))  # hard cap on open connections, idle ones included
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_MAX_AGE = float(os.environ.get("DB_POOL_MAX_AGE", "1800"))  # recycle connections older than this
+DB_POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", "30"))  # ping connections idle longer than this
+
+# Record per-function query counts and timings (see instrumentation.py)
+QUERY_INSTRUMENTATION = os.environ.get("QUERY_INSTRUMENTATION", "1") == "1"
+
+# Read replicas as comma-separated host[:port]; every query goes to DB_HOST when empty
+DB_REPLICA_HOSTS = [entry.strip() for entry in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if entry.strip()]
+# How reads pick a replica: round_robin, or least_busy (fewest connections checked out)
+DB_REPLICA_BALANCE = os.environ.get("DB_REPLICA_BALANCE", "round_robin")
+# Seconds a replica that failed to connect is skipped before it is tried again
+DB_REPLICA_RETRY_AFTER = float(os.environ.get("DB_REPLICA_RETRY_AFTER", "30"))
+# Backend functions whose names start with these only read, so replicas may serve them
+READ_ONLY_PREFIXES = ("read_", "get_", "iter_", "count_")
+
+# --- Connection Pool ---
+
+class ConnectionPool:
+    """Thread-safe pool of PostgreSQL connections with health checks and usage stats.
+
+    Returned connections stay open for reuse up to maxconn; unlike psycopg2's
+    ThreadedConnectionPool, idle ones are not trimmed back to minconn.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, max_age, ping_after, **connect_kwargs):
+        self._connect_kwargs = connect_kwargs
+        # Most recently returned last, so checkouts reuse warm connections
+        self._idle = []
+        self._closed = False
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._timeout = timeout
+        self._max_age = max_age
+        self._ping_after = ping_after
+        self._created_at = {}
+        self._released_at = {}
+        self._stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+        }
+        self._idle = [self._connect() for _ in range(minconn)]
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._lock:
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def getconn(self):
+        """Checks out a healthy connection, waiting up to the pool timeout for a free slot."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self._timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise pg_pool.PoolError(f"Timed out after {self._timeout}s waiting for a free connection.")
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        return conn
+
+    def putconn(self, conn):
+        """Returns a connection to the pool, rolling back any open transaction."""
+        try:
+            if not conn.closed:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN or self._closed:
+                    conn.close()
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+        except psycopg2.Error:
+            conn.close()
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+                if conn.closed:
+                    self._created_at.pop(id(conn), None)
+                    self._released_at.pop(id(conn), None)
+                else:
+                    self._released_at[id(conn)] = time.monotonic()
+                    self._idle.append(conn)
+            self._slots.release()
+
+    def closeall(self):
+        """Closes the idle connections; checked-out ones are closed when they are returned."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Returns a snapshot of the pool counters."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        checkouts = snapshot["checkouts"]
+        snapshot["wait_time_avg"] = snapshot["wait_time_total"] / checkouts if checkouts else 0.0
+        return snapshot
+
+    def _checkout_healthy(self):
+        # Discard connections that were closed, outlived DB_POOL_MAX_AGE or fail a ping
+        # after sitting idle, and keep drawing until the pool hands out a usable one.
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                # The slot semaphore keeps open connections within maxconn
+                return self._connect()
+            now = time.monotonic()
+            with self._lock:
+                created_at = self._created_at.get(id(conn), now)
+                released_at = self._released_at.get(id(conn), now)
+            if conn.closed or now - created_at > self._max_age:
+                self._discard(conn)
+                continue
+            if now - released_at > self._ping_after and not self._ping(conn):
+                with self._lock:
+                    self._stats["failed_health_checks"] += 1
+                self._discard(conn)
+                continue
+            return conn
+
+    def _ping(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created_at.pop(id(conn), None)
+            self._released_at.pop(id(conn), None)
+            self._stats["recycled"] += 1
+        if not conn.closed:
+            conn.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_MAX_AGE, DB_POOL_PING_AFTER,
+                    dbname=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    connection_factory=instrumentation.InstrumentedConnection if QUERY_INSTRUMENTATION else None
+                )
+    return _pool
+
+# --- Read Replicas ---
+
+def _lsn_value(lsn):
+    """Converts a pg_lsn text such as 16/B374D848 into a comparable integer."""
+    high, _, low = lsn.partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+class Replica:
+    """A read replica with its own connection pool, health and last known replay position."""
+
+    def __init__(self, entry):
+        self.name = entry
+        host, _, port = entry.partition(":")
+        self.host = host
+        self.port = int(port) if port else DB_PORT
+        self.pool = None
+        self.down_until = 0.0
+        self.replay_lsn = None
+        self.reads = 0
+        self.errors = 0
+
+    def getconn(self):
+        if self.pool is None:
+            self.pool = ConnectionPool(
+                DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_MAX_AGE, DB_POOL_PING_AFTER,
+                dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=self.host, port=self.port,
+                connection_factory=instrumentation.InstrumentedConnection if QUERY_INSTRUMENTATION else None
+            )
+        return self.pool.getconn()
+
+    def in_use(self):
+        return self.pool.stats()["in_use"] if self.pool is not None else 0
+
+    def has_replayed(self, conn, lsn):
+        """True if this replica has replayed WAL up to `lsn` (an integer); asks the server only when needed."""
+        if self.replay_lsn is not None and self.replay_lsn >= lsn:
+            return True
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_last_wal_replay_lsn()::text;")
+            replayed = cur.fetchone()[0]
+        # NULL means the server is not a standby, so it has none of the primary's writes
+        self.replay_lsn = _lsn_value(replayed) if replayed else None
+        return self.replay_lsn is not None and self.replay_lsn >= lsn
+
+_replicas = None
+_replica_turn = itertools.count()
+# Checked-out connection id -> (pool, Replica or None for the primary, read_only)
+_checked_out = {}
+_routing_stats = {"primary_reads": 0, "replica_reads": 0, "writes": 0, "lsn_fallbacks": 0}
+# WAL position of this context's latest write; reads wait for replicas that have replayed it
+_session_token = contextvars.ContextVar("db_session_token", default=None)
+
+def get_replicas():
+    """Returns the configured replicas, creating them on first use (their pools open lazily)."""
+    global _replicas
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                _replicas = [Replica(entry) for entry in DB_REPLICA_HOSTS]
+    return _replicas
+
+def get_session_token():
+    """Returns the WAL position of the last write made in this context, or None.
+
+    Pass it to set_session_token() in a later request or thread to read your own writes there.
+    """
+    return _session_token.get()
+
+def set_session_token(token):
+    """Makes reads in this context use only replicas that have replayed `token`, else the primary.
+
+    None lets reads use any replica.
+    """
+    _session_token.set(token)
+
+def _replica_order():
+    """Healthy replicas in the order reads should try them."""
+    now = time.monotonic()
+    replicas = [replica for replica in get_replicas() if replica.down_until <= now]
+    if not replicas:
+        return []
+    start = next(_replica_turn) % len(replicas)
+    replicas = replicas[start:] + replicas[:start]
+    if DB_REPLICA_BALANCE == "least_busy":
+        # Stable sort: the rotation breaks ties between equally busy replicas
+        replicas.sort(key=lambda replica: replica.in_use())
+    return replicas
+
+def _replica_connection():
+    """Checks out a connection from a replica that satisfies the session token, or returns None."""
+    token = _session_token.get()
+    needed = _lsn_value(token) if token else None
+    for replica in _replica_order():
+        try:
+            conn = replica.getconn()
+        except pg_pool.PoolError:
+            # Busy rather than broken; try the next replica
+            continue
+        except psycopg2.Error as e:
+            logger.warning("Replica %s unavailable, skipping for %.0fs: %s", replica.name, DB_REPLICA_RETRY_AFTER, e)
+            with _pool_lock:
+                replica.errors += 1
+                replica.down_until = time.monotonic() + DB_REPLICA_RETRY_AFTER
+            continue
+        try:
+            caught_up = needed is None or replica.has_replayed(conn, needed)
+        except psycopg2.Error:
+            conn.rollback()
+            caught_up = False
+        if not caught_up:
+            replica.pool.putconn(conn)
+            with _pool_lock:
+                _routing_stats["lsn_fallbacks"] += 1
+            continue
+        with _pool_lock:
+            replica.reads += 1
+            _routing_stats["replica_reads"] += 1
+        _checked_out[id(conn)] = (replica.pool, replica, True)
         return conn
+    return None
+
+def _record_write_position(conn):
+    """Advances the session token to the primary's current WAL position after a write."""
+    if conn.closed:
+        return
+    try:
+        with conn.cursor() as cur:
+            # The insert position already covers commits not yet flushed (synchronous_commit=off)
+            cur.execute("SELECT pg_current_wal_insert_lsn()::text;")
+            lsn = cur.fetchone()[0]
+        conn.rollback()
+    except psycopg2.Error as e:
+        conn.rollback()
+        logger.warning("Could not read the primary's WAL position: %s", e)
+        return
+    current = _session_token.get()
+    if current is None or _lsn_value(lsn) > _lsn_value(current):
+        _session_token.set(lsn)
+
+# A token no replica can satisfy; reads under it go to the primary
+_PRIMARY_ONLY = "FFFFFFFF/FFFFFFFF"
+
+def _primary_position():
+    """Returns the primary's current WAL insert position, or None if it cannot be read."""
+    pool = get_pool()
+    try:
+        conn = pool.getconn()
+    except (psycopg2.Error, pg_pool.PoolError) as e:
+        logger.warning("Could not reach the primary for its WAL position: %s", e)
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_insert_lsn()::text;")
+            return cur.fetchone()[0]
     except psycopg2.Error as e:
-        print(f"Error connecting to the database: {e}")
+        logger.warning("Could not read the primary's WAL position: %s", e)
         return None
+    finally:
+        pool.putconn(conn)
+
+@contextmanager
+def consistent_reads():
+    """Makes reads in the block see every write committed on the primary before it began.
+
+    For results shared beyond this session (caches keyed on table versions):
+    a lagging replica would otherwise store pre-write rows under the
+    post-write version. Costs one primary round trip when replicas are configured.
+    """
+    if not DB_REPLICA_HOSTS:
+        yield
+        return
+    position = _primary_position() or _PRIMARY_ONLY
+    current = _session_token.get()
+    if current is not None and _lsn_value(current) > _lsn_value(position):
+        position = current
+    reset = _session_token.set(position)
+    try:
+        yield
+    finally:
+        _session_token.reset(reset)
+
+def _caller_name(frame):
+    """Names the function that checked out a connection, module-qualified outside backend."""
+    module = frame.f_globals.get("__name__")
+    name = frame.f_code.co_name
+    return name if module == __name__ else f"{module}.{name}"
+
+def get_db_connection(read_only=None):
+    """Checks out a pooled connection to the PostgreSQL database.
+
+    With DB_REPLICA_HOSTS set, read-only calls go to a replica. `read_only`
+    defaults to True for backend functions named read_*, get_*, iter_* and
+    count_*; other modules pass read_only=True to opt in.
+    """
+    started = time.perf_counter()
+    frame = sys._getframe(1)
+    if read_only is None:
+        read_only = frame.f_globals.get("__name__") == __name__ and frame.f_code.co_name.startswith(READ_ONLY_PREFIXES)
+    conn = _replica_connection() if read_only and DB_REPLICA_HOSTS else None
+    if conn is None:
+        try:
+            conn = get_pool().getconn()
+        except (psycopg2.Error, pg_pool.PoolError) as e:
+            logger.error("Error connecting to the database: %s", e)
+            return None
+        _checked_out[id(conn)] = (get_pool(), None, read_only)
+        with _pool_lock:
+            _routing_stats["primary_reads" if read_only else "writes"] += 1
+    instrumentation.begin_call(conn, _caller_name(frame), time.perf_counter() - started)
+    return conn
+
+def release_db_connection(conn):
+    """Returns a connection obtained from get_db_connection() to the pool it came from."""
+    if conn is not None:
+        pool, replica, read_only = _checked_out.pop(id(conn), (get_pool(), None, False))
+        if replica is None and not read_only and DB_REPLICA_HOSTS:
+            _record_write_position(conn)
+        instrumentation.end_call(conn)
+        pool.putconn(conn)
+
+def get_pool_stats():
+    """Returns checkout, wait-time and in-use counters for the primary pool, plus replica routing figures."""
+    stats = get_pool().stats() if _pool is not None else {}
+    if DB_REPLICA_HOSTS:
+        now = time.monotonic()
+        with _pool_lock:
+            stats["routing"] = dict(_routing_stats)
+        stats["replicas"] = {
+            replica.name: dict(
+                replica.pool.stats() if replica.pool is not None else {},
+                reads=replica.reads, errors=replica.errors, down=replica.down_until > now,
+            )
+            for replica in get_replicas()
+        }
+    return stats
+
+def get_prometheus_metrics():
+    """Returns query instrumentation counters and pool figures in the Prometheus text format."""
+    pool_stats = get_pool_stats()
+    gauges = {
+        "mark_pool_connections_in_use": ("Connections currently checked out.", pool_stats.get("in_use", 0)),
+        "mark_pool_wait_seconds_max": ("Longest wait for a connection.", pool_stats.get("wait_time_max", 0.0)),
+    }
+    counters = {
+        "mark_pool_checkouts_total": ("Connection checkouts since start.", pool_stats.get("checkouts", 0)),
+        "mark_pool_timeouts_total": ("Checkouts that timed out.", pool_stats.get("timeouts", 0)),
+    }
+    routing = pool_stats.get("routing")
+    if routing:
+        counters["mark_replica_reads_total"] = ("Reads served by replicas since start.", routing["replica_reads"])
+        counters["mark_primary_reads_total"] = (
+            "Read-only calls served by the primary since start.", routing["primary_reads"]
+        )
+        counters["mark_replica_lsn_fallbacks_total"] = (
+            "Replica checkouts skipped because the replica had not replayed the session's writes.",
+            routing["lsn_fallbacks"],
+        )
+    return instrumentation.render_prometheus(gauges, counters)
+
+def close_pool():
+    """Closes all pooled connections, replicas included; pools are recreated on next use."""
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        for replica in _replicas or ():
+            if replica.pool is not None:
+                replica.pool.closeall()
+        _replicas = None
+
+# --- Columnar Results ---
+
+# Read functions taking `fmt` return "rows" (list of dicts, the default), "tuples"
+# ((column names, list of tuples)), "arrays" ({column: NumPy array}) or "frame" (pandas DataFrame)
+RESULT_FORMATS = ("rows", "tuples", "arrays", "frame")
+
+# NumPy dtypes for PostgreSQL type OIDs; anything else stays an object array
+NUMPY_DTYPES = {
+    20: "int64", 21: "int64", 23: "int64",  # bigint, smallint, integer
+    700: "float64", 701: "float64", 1700: "float64",  # real, double precision, numeric
+    16: "bool",
+    1082: "datetime64[D]",  # date
+    1114: "datetime64[us]",  # timestamp without time zone
+}
+
+def _check_format(fmt):
+    if fmt not in RESULT_FORMATS:
+        raise ValueError(f"fmt must be one of {', '.join(RESULT_FORMATS)}, got {fmt!r}")
+
+def _empty_result(fmt):
+    """The value read functions return on errors in each format."""
+    if fmt == "tuples":
+        return [], []
+    if fmt == "arrays":
+        return {}
+    if fmt == "frame":
+        import pandas as pd
+        return pd.DataFrame()
+    return []
+
+def _parse_text_array(value):
+    """Parses a PostgreSQL text[] literal such as {Email,"Paid Ads"} from COPY output."""
+    if not isinstance(value, str) or value in ("", "{}"):
+        return []
+    return next(csv.reader([value[1:-1]], escapechar="\\"))
+
+def _fetch_columnar(conn, sql, params, fmt, date_columns=(), list_columns=()):
+    """Runs `sql` and returns it as tuples, NumPy arrays or a DataFrame, never building per-row dicts.
+
+    Frames are parsed by pandas from COPY ... TO STDOUT CSV output; jsonb columns
+    stay JSON text there. NULLs are written as \\N so empty strings and text such as
+    "NA" or "None" survive the round trip. Arrays are built column by column from
+    the fetched tuples.
+    """
+    if fmt == "frame":
+        import pandas as pd
+        with conn.cursor() as cur:
+            query = cur.mogrify(sql.rstrip().rstrip(";"), params).decode()
+            buffer = io.BytesIO()
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER, NULL '\\N')", buffer)
+        buffer.seek(0)
+        frame = pd.read_csv(
+            buffer, parse_dates=list(date_columns), keep_default_na=False, na_values=["\\N"]
+        )
+        for column in list_columns:
+            frame[column] = frame[column].map(_parse_text_array)
+        return frame
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        description = cur.description
+        rows = cur.fetchall()
+    names = [column.name for column in description]
+    if fmt == "tuples":
+        return names, rows
+    import numpy as np
+    columns = zip(*rows) if rows else [()] * len(names)
+    arrays = {}
+    for column, values in zip(description, columns):
+        dtype = NUMPY_DTYPES.get(column.type_code)
+        if dtype is not None:
+            try:
+                arrays[column.name] = np.array(values, dtype=dtype)
+                continue
+            except (TypeError, ValueError):
+                pass  # NULLs (or values NumPy cannot convert) keep the column as objects
+        # Filled element by element: slice assignment (or np.array) would turn equal-length
+        # lists from text[] columns into a 2-D array instead of one list per row
+        array = np.empty(len(values), dtype=object)
+        for index, value in enumerate(values):
+            array[index] = value
+        arrays[column.name] = array
+    return arrays
+
+def _python_value(value):
+    """Turns pandas/NumPy scalars back into the types psycopg2 returns (datetime, int, float...)."""
+    if hasattr(value, "to_pydatetime"):
+        return value.to_pydatetime()
+    return value.item() if hasattr(value, "item") else value
+
+def _frame_result(frame, fmt):
+    """Converts a DataFrame into the result shape `fmt` (see RESULT_FORMATS)."""
+    if fmt == "frame":
+        return frame
+    if fmt == "arrays":
+        return {column: frame[column].to_numpy() for column in frame.columns}
+    names = list(frame.columns)
+    rows = [tuple(map(_python_value, row)) for row in frame.itertuples(index=False, name=None)]
+    if fmt == "tuples":
+        return names, rows
+    return [dict(zip(names, row)) for row in rows]
+
+# --- Table Versions ---
+
+# Per-table write counters for this process; caches key their entries on them
+_table_versions = {}
+_table_versions_lock = threading.Lock()
+
+# Tables whose writes change the Business Insights snapshot
+INSIGHTS_TABLES = {"campaigns", "customers", "campaign_performance"}
+
+def bump_table_version(*tables):
+    """Marks tables as changed; called by every write after it commits."""
+    with _table_versions_lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+    if INSIGHTS_TABLES.intersection(tables):
+        invalidate_insights_cache()
+
+def get_table_versions(*tables):
+    """Returns the current version counter of each table, in order."""
+    with _table_versions_lock:
+        return tuple(_table_versions.get(table, 0) for table in tables)
 
 # --- CRUD Operations for Campaigns ---
 
@@ -42,44 +628,238 @@ def create_campaign(name, budget, start_date, end_date, description, channels):
             )
             campaign_id = cur.fetchone()[0]
 
-            # Insert associated channels
-            for channel in channels:
-                cur.execute(
-                    "INSERT INTO campaign_channels (campaign_id, channel_name) VALUES (%s, %s);",
-                    (campaign_id, channel)
+            # Insert associated channels in a single multi-row statement
+            if channels:
+                psycopg2.extras.execute_values(
+                    cur,
+                    "INSERT INTO campaign_channels (campaign_id, channel_name) VALUES %s;",
+                    [(campaign_id, channel) for channel in channels]
                 )
 
         conn.commit()
+        bump_table_version("campaigns")
         return True, f"Campaign '{name}' created successfully."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error creating campaign: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+def _parse_date(value, field):
+    """Accepts a date, datetime or ISO 'YYYY-MM-DD' string."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return date.fromisoformat(value.strip()[:10])
+        except ValueError:
+            pass
+    raise ValueError(f"{field} must be a YYYY-MM-DD date, got {value!r}")
+
+def _normalize_campaign_row(row):
+    """Validates one bulk-import row and returns (campaign values, channel list)."""
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    try:
+        budget = float(row.get("budget"))
+    except (TypeError, ValueError):
+        raise ValueError(f"budget must be a number, got {row.get('budget')!r}")
+    if budget < 0:
+        raise ValueError("budget must not be negative")
+    start_date = _parse_date(row.get("start_date"), "start_date")
+    end_date = _parse_date(row.get("end_date"), "end_date")
+    if end_date < start_date:
+        raise ValueError("end_date is before start_date")
+    channels = row.get("channels") or []
+    if isinstance(channels, str):
+        channels = [channel.strip() for channel in channels.split(";") if channel.strip()]
+    description = row.get("description") or ""
+    return (name, budget, start_date, end_date, description), list(dict.fromkeys(channels))
+
+def _insert_campaign_batch(cur, batch):
+    """Inserts campaigns and their channels with two multi-row statements."""
+    ids = psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO campaigns (name, budget, start_date, end_date, description) VALUES %s RETURNING id;",
+        [values for _, values, _ in batch],
+        page_size=len(batch), fetch=True
+    )
+    channel_rows = [
+        (campaign_id, channel)
+        for (campaign_id,), (_, _, channels) in zip(ids, batch)
+        for channel in channels
+    ]
+    if channel_rows:
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO campaign_channels (campaign_id, channel_name) VALUES %s;",
+            channel_rows, page_size=1000
+        )
+
+def bulk_create_campaigns(rows):
+    """Creates many campaigns and their channels in one transaction.
+
+    Each row is a dict with name, budget, start_date, end_date, description and
+    channels (a list or a ';'-separated string). Invalid rows are skipped and
+    reported instead of aborting the batch. Returns (success, message, errors)
+    where errors is a list of (row_number, reason) with 1-based row numbers.
+    """
+    errors = []
+    valid = []
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            values, channels = _normalize_campaign_row(row)
+            valid.append((row_number, values, channels))
+        except ValueError as e:
+            errors.append((row_number, str(e)))
+    total = len(valid) + len(errors)
+    if not valid:
+        return False, f"No valid campaigns to import ({len(errors)} rejected).", errors
 
-def read_campaigns():
-    """Retrieves all campaigns with their associated channels."""
     conn = get_db_connection()
     if conn is None:
-        return []
+        return False, "Database connection failed.", errors
+    try:
+        created = 0
+        with conn.cursor() as cur:
+            for offset in range(0, len(valid), BULK_BATCH_SIZE):
+                batch = valid[offset:offset + BULK_BATCH_SIZE]
+                cur.execute("SAVEPOINT campaign_batch;")
+                try:
+                    _insert_campaign_batch(cur, batch)
+                    cur.execute("RELEASE SAVEPOINT campaign_batch;")
+                    created += len(batch)
+                    continue
+                except psycopg2.Error:
+                    cur.execute("ROLLBACK TO SAVEPOINT campaign_batch;")
+                # The batch hit a database error; retry row by row to isolate the bad rows
+                for item in batch:
+                    cur.execute("SAVEPOINT campaign_row;")
+                    try:
+                        _insert_campaign_batch(cur, [item])
+                        cur.execute("RELEASE SAVEPOINT campaign_row;")
+                        created += 1
+                    except psycopg2.Error as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT campaign_row;")
+                        errors.append((item[0], str(e).strip()))
+        conn.commit()
+        bump_table_version("campaigns")
+        errors.sort()
+        return True, f"Imported {created} of {total} campaigns.", errors
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error importing campaigns: {e}", errors
+    finally:
+        release_db_connection(conn)
+
+# Campaign rows with their channels aggregated server-side in a single query
+CAMPAIGNS_WITH_CHANNELS_SQL = """
+    SELECT c.*,
+           COALESCE(
+               array_agg(cc.channel_name::text ORDER BY cc.channel_name)
+                   FILTER (WHERE cc.channel_name IS NOT NULL),
+               ARRAY[]::text[]
+           ) AS channels
+    FROM campaigns c
+    LEFT JOIN campaign_channels cc ON cc.campaign_id = c.id
+"""
+
+CHANNEL_FILTER_SQL = """
+    EXISTS (
+        SELECT 1 FROM campaign_channels f
+        WHERE f.campaign_id = c.id AND f.channel_name = %s
+    )
+"""
+
+def _campaigns_query(channel=None, after=None, limit=None):
+    """Builds the aggregated campaign query, newest first, with optional keyset bounds."""
+    conditions, params = [], []
+    if channel:
+        conditions.append(CHANNEL_FILTER_SQL)
+        params.append(channel)
+    if after:
+        conditions.append("(c.start_date, c.id) < (%s, %s)")
+        params.extend(after)
+    sql = CAMPAIGNS_WITH_CHANNELS_SQL
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " GROUP BY c.id ORDER BY c.start_date DESC, c.id DESC"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql + ";", params
+
+def _fetch_campaigns(cur, channel=None):
+    """Runs the aggregated campaign query on an open cursor."""
+    cur.execute(*_campaigns_query(channel))
+    return cur.fetchall()
+
+def read_campaigns(channel=None, fmt="rows"):
+    """Retrieves all campaigns with their associated channels, optionally only those using `channel`.
+
+    `fmt` selects the result shape; see RESULT_FORMATS.
+    """
+    _check_format(fmt)
+    conn = get_db_connection()
+    if conn is None:
+        return _empty_result(fmt)
     try:
+        if fmt != "rows":
+            return _fetch_columnar(
+                conn, *_campaigns_query(channel), fmt,
+                date_columns=("start_date", "end_date", "created_at"), list_columns=("channels",)
+            )
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM campaigns ORDER BY start_date DESC;")
-            campaigns = cur.fetchall()
-
-            # For each campaign, fetch its channels
-            for campaign in campaigns:
-                cur.execute("SELECT channel_name FROM campaign_channels WHERE campaign_id = %s;", (campaign['id'],))
-                channels = [row['channel_name'] for row in cur.fetchall()]
-                campaign['channels'] = channels
-        return campaigns
+            return _fetch_campaigns(cur, channel)
     except psycopg2.Error as e:
-        print(f"Error reading campaigns: {e}")
-        return []
+        logger.error("Error reading campaigns: %s", e)
+        return _empty_result(fmt)
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+def _keyset_page(rows, page_size, key_columns):
+    """Splits a page_size + 1 fetch into (page rows, key of the last row or None on the last page)."""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, tuple(rows[-1][column] for column in key_columns)
+
+def read_campaigns_page(page_size=None, after=None, channel=None):
+    """Returns one page of campaigns (newest start_date first) and the key for the next page.
+
+    Pass the returned key as `after` to fetch the following page; it is None on the last page.
+    """
+    page_size = page_size or PAGE_SIZE
+    conn = get_db_connection()
+    if conn is None:
+        return [], None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(*_campaigns_query(channel, after, page_size + 1))
+            return _keyset_page(cur.fetchall(), page_size, ("start_date", "id"))
+    except psycopg2.Error as e:
+        logger.error("Error reading campaigns page: %s", e)
+        return [], None
+    finally:
+        release_db_connection(conn)
+
+def iter_campaigns(channel=None, itersize=None):
+    """Yields every campaign through a server-side cursor, fetching `itersize` rows per round trip."""
+    conn = get_db_connection()
+    if conn is None:
+        return
+    try:
+        with conn.cursor(name="iter_campaigns", cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.itersize = itersize or STREAM_ITERSIZE
+            cur.execute(*_campaigns_query(channel))
+            yield from cur
+    except psycopg2.Error as e:
+        logger.error("Error streaming campaigns: %s", e)
+    finally:
+        release_db_connection(conn)
 
 def update_campaign(campaign_id, name, budget, start_date, end_date, description):
     """Updates an existing campaign's details."""
@@ -93,13 +873,13 @@ def update_campaign(campaign_id, name, budget, start_date, end_date, description
                 (name, budget, start_date, end_date, description, campaign_id)
             )
         conn.commit()
+        bump_table_version("campaigns")
         return True, f"Campaign ID {campaign_id} updated successfully."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error updating campaign: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def delete_campaign(campaign_id):
     """Deletes a campaign and its associated records."""
@@ -110,58 +890,116 @@ def delete_campaign(campaign_id):
         with conn.cursor() as cur:
             cur.execute("DELETE FROM campaigns WHERE id = %s;", (campaign_id,))
         conn.commit()
+        bump_table_version("campaigns", "campaign_performance")
         return True, f"Campaign ID {campaign_id} deleted successfully."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error deleting campaign: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 # --- CRUD Operations for Customers ---
 
+def normalize_email(email):
+    """Returns the stored form of an email; customers are unique on it (migration 9).
+
+    The unique index is on lower(email), so look customers up with
+    `WHERE lower(email) = lower(%s)` to use it.
+    """
+    return email.strip().lower()
+
 def create_customer(name, email, demographics):
     """Adds a new customer to the database."""
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
+    email = normalize_email(email)
     try:
         with conn.cursor() as cur:
             demographics_json = json.dumps(demographics)
             cur.execute(
-                "INSERT INTO customers (name, email, demographics) VALUES (%s, %s, %s);",
+                "INSERT INTO customers (name, email, demographics) VALUES (%s, %s, %s) RETURNING id;",
                 (name, email, demographics_json)
             )
+            refresh_customer_memberships(cur, [cur.fetchone()[0]])
         conn.commit()
+        bump_table_version("customers", "segment_members")
         return True, f"Customer '{name}' added successfully."
+    except pg_errors.UniqueViolation:
+        conn.rollback()
+        return False, f"A customer with email {email} already exists."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error adding customer: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
-def read_customers():
-    """Retrieves all customers from the database."""
+def read_customers(fmt="rows"):
+    """Retrieves all customers from the database; `fmt` selects the result shape (see RESULT_FORMATS)."""
+    _check_format(fmt)
     conn = get_db_connection()
     if conn is None:
-        return []
+        return _empty_result(fmt)
     try:
+        if fmt != "rows":
+            return _fetch_columnar(
+                conn, "SELECT * FROM customers ORDER BY created_at DESC;", [], fmt, date_columns=("created_at",)
+            )
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute("SELECT * FROM customers ORDER BY created_at DESC;")
             return cur.fetchall()
     except psycopg2.Error as e:
-        print(f"Error reading customers: {e}")
-        return []
+        logger.error("Error reading customers: %s", e)
+        return _empty_result(fmt)
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+def read_customers_page(page_size=None, after=None):
+    """Returns one page of customers (newest first) and the key for the next page.
+
+    Pass the returned key as `after` to fetch the following page; it is None on the last page.
+    """
+    page_size = page_size or PAGE_SIZE
+    conn = get_db_connection()
+    if conn is None:
+        return [], None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            if after:
+                cur.execute(
+                    "SELECT * FROM customers WHERE (created_at, id) < (%s, %s) ORDER BY created_at DESC, id DESC LIMIT %s;",
+                    (*after, page_size + 1)
+                )
+            else:
+                cur.execute("SELECT * FROM customers ORDER BY created_at DESC, id DESC LIMIT %s;", (page_size + 1,))
+            return _keyset_page(cur.fetchall(), page_size, ("created_at", "id"))
+    except psycopg2.Error as e:
+        logger.error("Error reading customers page: %s", e)
+        return [], None
+    finally:
+        release_db_connection(conn)
+
+def iter_customers(itersize=None):
+    """Yields every customer through a server-side cursor, fetching `itersize` rows per round trip."""
+    conn = get_db_connection()
+    if conn is None:
+        return
+    try:
+        with conn.cursor(name="iter_customers", cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.itersize = itersize or STREAM_ITERSIZE
+            cur.execute("SELECT * FROM customers ORDER BY created_at DESC, id DESC;")
+            yield from cur
+    except psycopg2.Error as e:
+        logger.error("Error streaming customers: %s", e)
+    finally:
+        release_db_connection(conn)
 
 def update_customer(customer_id, name, email, demographics):
     """Updates an existing customer's details."""
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
+    email = normalize_email(email)
     try:
         with conn.cursor() as cur:
             demographics_json = json.dumps(demographics)
@@ -169,14 +1007,18 @@ def update_customer(customer_id, name, email, demographics):
                 "UPDATE customers SET name = %s, email = %s, demographics = %s WHERE id = %s;",
                 (name, email, demographics_json, customer_id)
             )
+            refresh_customer_memberships(cur, [customer_id])
         conn.commit()
+        bump_table_version("customers", "segment_members")
         return True, f"Customer ID {customer_id} updated successfully."
+    except pg_errors.UniqueViolation:
+        conn.rollback()
+        return False, f"Another customer already has email {email}."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error updating customer: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def delete_customer(customer_id):
     """Deletes a customer from the database."""
@@ -187,18 +1029,22 @@ def delete_customer(customer_id):
         with conn.cursor() as cur:
             cur.execute("DELETE FROM customers WHERE id = %s;", (customer_id,))
         conn.commit()
+        bump_table_version("customers", "segment_members")
         return True, f"Customer ID {customer_id} deleted successfully."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error deleting customer: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 # --- CRUD Operations for Segments ---
 
 def create_segment(segment_name, criteria):
     """Creates a new customer segment."""
+    try:
+        segments.compile_criteria(criteria)
+    except ValueError as e:
+        return False, f"Invalid segment criteria: {e}"
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
@@ -206,33 +1052,69 @@ def create_segment(segment_name, criteria):
         with conn.cursor() as cur:
             criteria_json = json.dumps(criteria)
             cur.execute(
-                "INSERT INTO segments (segment_name, criteria) VALUES (%s, %s);",
+                "INSERT INTO segments (segment_name, criteria) VALUES (%s, %s) RETURNING id;",
                 (segment_name, criteria_json)
             )
+            segment_id = cur.fetchone()[0]
         conn.commit()
+        bump_table_version("segments")
+        start_segment_rebuild(segment_id)
         return True, f"Segment '{segment_name}' created successfully."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error creating segment: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def read_segments():
-    """Retrieves all segments from the database."""
+    """Retrieves all segments with their materialized member counts."""
     conn = get_db_connection()
     if conn is None:
         return []
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM segments ORDER BY created_at DESC;")
+            cur.execute(
+                """
+                SELECT s.*, COALESCE(m.member_count, 0) AS member_count
+                FROM segments s
+                LEFT JOIN (
+                    SELECT segment_id, COUNT(*) AS member_count FROM segment_members GROUP BY segment_id
+                ) m ON m.segment_id = s.id
+                ORDER BY s.created_at DESC;
+                """
+            )
             return cur.fetchall()
     except psycopg2.Error as e:
-        print(f"Error reading segments: {e}")
+        logger.error("Error reading segments: %s", e)
         return []
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+def update_segment(segment_id, segment_name, criteria):
+    """Updates a segment's name and criteria."""
+    try:
+        segments.compile_criteria(criteria)
+    except ValueError as e:
+        return False, f"Invalid segment criteria: {e}"
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE segments SET segment_name = %s, criteria = %s WHERE id = %s;",
+                (segment_name, json.dumps(criteria), segment_id)
+            )
+        conn.commit()
+        segments.invalidate_segment(segment_id)
+        bump_table_version("segments")
+        start_segment_rebuild(segment_id)
+        return True, f"Segment ID {segment_id} updated successfully."
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error updating segment: {e}"
+    finally:
+        release_db_connection(conn)
 
 def delete_segment(segment_id):
     """Deletes a segment from the database."""
@@ -243,13 +1125,334 @@ def delete_segment(segment_id):
         with conn.cursor() as cur:
             cur.execute("DELETE FROM segments WHERE id = %s;", (segment_id,))
         conn.commit()
+        segments.invalidate_segment(segment_id)
+        bump_table_version("segments", "segment_members")
         return True, f"Segment ID {segment_id} deleted successfully."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error deleting segment: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+# --- Segment Evaluation ---
+
+def _segment_plan(cur, segment_id):
+    """Returns the compiled plan for a segment, recompiling only if its row version changed."""
+    # Read every time: another process may have edited the segment since the plan was cached
+    cur.execute("SELECT version, criteria FROM segments WHERE id = %s;", (segment_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    version, criteria = row
+    criteria = json.loads(criteria) if isinstance(criteria, str) else criteria
+    return segments.get_compiled_segment(segment_id, criteria, version)
+
+def count_segment_members(segment_id):
+    """Returns the number of customers matching a segment's criteria."""
+    conn = get_db_connection()
+    if conn is None: return 0
+    try:
+        with conn.cursor() as cur:
+            plan = _segment_plan(cur, segment_id)
+            if plan is None:
+                return 0
+            cur.execute(f"SELECT COUNT(*) FROM customers WHERE {plan.where_sql};", plan.params)
+            return cur.fetchone()[0]
+    except (psycopg2.Error, ValueError) as e:
+        logger.error("Error counting segment members: %s", e)
+        return 0
+    finally:
+        release_db_connection(conn)
+
+def iter_segment_member_ids(segment_id, itersize=None):
+    """Yields the ids of customers matching a segment, streamed through a server-side cursor."""
+    conn = get_db_connection()
+    if conn is None:
+        return
+    try:
+        with conn.cursor() as cur:
+            plan = _segment_plan(cur, segment_id)
+        if plan is None:
+            return
+        with conn.cursor(name="segment_member_ids") as cur:
+            cur.itersize = itersize or STREAM_ITERSIZE
+            cur.execute(f"SELECT id FROM customers WHERE {plan.where_sql} ORDER BY id;", plan.params)
+            for (customer_id,) in cur:
+                yield customer_id
+    except (psycopg2.Error, ValueError) as e:
+        logger.error("Error streaming segment members: %s", e)
+    finally:
+        release_db_connection(conn)
+
+# --- Materialized Segment Membership ---
+
+def _load_segment_plans(cur, segment_id=None, versioned=True):
+    """Returns [(segment_id, plan)] for one or all segments, skipping criteria that no longer compile.
+
+    versioned=False is for migrations that run before segments.version exists (migration 7).
+    """
+    version = "version" if versioned else "NULL"
+    if segment_id is None:
+        cur.execute(f"SELECT id, {version}, criteria FROM segments ORDER BY id;")
+    else:
+        cur.execute(f"SELECT id, {version}, criteria FROM segments WHERE id = %s;", (segment_id,))
+    plans = []
+    for sid, version, criteria in cur.fetchall():
+        criteria = json.loads(criteria) if isinstance(criteria, str) else criteria
+        try:
+            plans.append((sid, segments.get_compiled_segment(sid, criteria, version)))
+        except ValueError as e:
+            logger.warning("Skipping segment %s with invalid criteria: %s", sid, e)
+    return plans
+
+def refresh_customer_memberships(cur, customer_ids):
+    """Re-evaluates the given customers against every segment inside the caller's transaction."""
+    customer_ids = list(customer_ids)
+    if not customer_ids:
+        return
+    cur.execute("DELETE FROM segment_members WHERE customer_id = ANY(%s);", (customer_ids,))
+    plans = _load_segment_plans(cur)
+    if not plans:
+        return
+    # One statement evaluates every segment, restricted to the touched customers
+    branches, params = [], []
+    for segment_id, plan in plans:
+        branches.append(f"SELECT %s, id FROM customers WHERE id = ANY(%s) AND {plan.where_sql}")
+        params.extend([segment_id, customer_ids, *plan.params])
+    cur.execute(
+        "INSERT INTO segment_members (segment_id, customer_id) "
+        + " UNION ALL ".join(branches)
+        + " ON CONFLICT DO NOTHING;",
+        params
+    )
+
+def rebuild_segment(cur, segment_id, plan):
+    """Replaces one segment's materialized members on an open cursor."""
+    cur.execute("DELETE FROM segment_members WHERE segment_id = %s;", (segment_id,))
+    cur.execute(
+        f"INSERT INTO segment_members (segment_id, customer_id) "
+        f"SELECT %s, id FROM customers WHERE {plan.where_sql} ON CONFLICT DO NOTHING;",
+        [segment_id, *plan.params]
+    )
+
+def rebuild_segment_members(segment_id=None):
+    """Recomputes membership for one segment, or all segments, committing one segment at a time."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        rebuilt = 0
+        with conn.cursor() as cur:
+            plans = _load_segment_plans(cur, segment_id)
+            conn.commit()
+            for sid, plan in plans:
+                rebuild_segment(cur, sid, plan)
+                conn.commit()
+                bump_table_version("segment_members")
+                rebuilt += 1
+        return True, f"Rebuilt membership for {rebuilt} segment(s)."
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error rebuilding segment membership: {e}"
+    finally:
+        release_db_connection(conn)
+
+def start_segment_rebuild(segment_id=None):
+    """Runs rebuild_segment_members in a background thread and returns the thread."""
+    thread = threading.Thread(
+        target=rebuild_segment_members, args=(segment_id,), name="segment-rebuild", daemon=True
+    )
+    thread.start()
+    return thread
+
+# --- Bulk Updates and Deletes ---
+
+# Filters accepted by the bulk functions: name -> SQL condition on alias c with one parameter
+CAMPAIGN_FILTERS = {
+    "channel": CHANNEL_FILTER_SQL,
+    "name_contains": "c.name ILIKE '%%' || %s || '%%'",
+    "start_date_from": "c.start_date >= %s",
+    "start_date_before": "c.start_date < %s",
+    "end_date_from": "c.end_date >= %s",
+    "end_date_before": "c.end_date < %s",
+    "budget_below": "c.budget < %s",
+}
+CUSTOMER_FILTERS = {
+    "email_domain": "c.email ILIKE '%%@' || %s",
+    "name_contains": "c.name ILIKE '%%' || %s || '%%'",
+    "created_before": "c.created_at < %s",
+    "created_from": "c.created_at >= %s",
+}
+# Columns the bulk update functions may set
+CAMPAIGN_UPDATE_COLUMNS = ("name", "budget", "start_date", "end_date", "description")
+CUSTOMER_UPDATE_COLUMNS = ("name", "email", "demographics")
+
+def _filter_targets(cur, table, filters, allowed):
+    """Resolves filter predicates to {id: version} for the matching rows, locking them."""
+    conditions, params = [], []
+    for name, value in filters.items():
+        if name == "demographics" and table == "customers":
+            where_sql, criteria_params = segments.compile_criteria(value, column="c.demographics")
+            conditions.append(where_sql)
+            params.extend(criteria_params)
+        elif name in allowed:
+            conditions.append(allowed[name])
+            params.append(value)
+        else:
+            raise ValueError(f"unsupported filter {name!r} for {table}")
+    if not conditions:
+        raise ValueError("filters must not be empty; pass ids to target every row explicitly")
+    cur.execute(
+        f"SELECT c.id, c.version FROM {table} c WHERE {' AND '.join(conditions)} ORDER BY c.id FOR UPDATE;",
+        params
+    )
+    return dict(cur.fetchall())
+
+def _bulk_targets(cur, table, ids, filters, expected_versions, allowed_filters):
+    """Returns {id: expected version or None} from explicit ids/versions and/or filters."""
+    targets = {int(target_id): None for target_id in ids or ()}
+    for target_id, version in (expected_versions or {}).items():
+        targets[int(target_id)] = int(version)
+    if filters:
+        for target_id, version in _filter_targets(cur, table, filters, allowed_filters).items():
+            targets.setdefault(target_id, version)
+    return targets
+
+def _bulk_apply(cur, table, statement, targets, params=()):
+    """Runs `statement` once per batch of targets and returns (applied ids, conflicting ids, missing ids).
+
+    `statement` is an UPDATE or DELETE on `table` aliased c that joins the batch
+    as v(id, version) via {targets} and must end with RETURNING c.id; rows whose
+    version moved since the caller read them are left alone and reported as conflicts.
+    """
+    applied, skipped = [], []
+    items = sorted(targets.items())
+    for offset in range(0, len(items), BULK_BATCH_SIZE):
+        batch = items[offset:offset + BULK_BATCH_SIZE]
+        cur.execute(
+            statement.format(targets="unnest(%s::int[], %s::int[]) AS v(id, version)"),
+            (*params, [target_id for target_id, _ in batch], [version for _, version in batch])
+        )
+        done = {row[0] for row in cur.fetchall()}
+        applied.extend(target_id for target_id, _ in batch if target_id in done)
+        skipped.extend(target_id for target_id, _ in batch if target_id not in done)
+    conflicts = []
+    if skipped:
+        cur.execute(f"SELECT id FROM {table} WHERE id = ANY(%s);", (skipped,))
+        conflicts = sorted(row[0] for row in cur.fetchall())
+    missing = sorted(set(skipped) - set(conflicts))
+    return applied, conflicts, missing
+
+def _bulk_run(table, action, apply, ids, filters, expected_versions, all_or_nothing, allowed_filters,
+              bump_tables, on_applied=None):
+    """Shared transaction handling for the bulk functions; returns (success, message, result)."""
+    result = {"affected": 0, "ids": [], "conflicts": [], "missing": []}
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed.", result
+    try:
+        with conn.cursor() as cur:
+            targets = _bulk_targets(cur, table, ids, filters, expected_versions, allowed_filters)
+            applied, conflicts, missing = apply(cur, targets) if targets else ([], [], [])
+            result.update(affected=len(applied), ids=applied, conflicts=conflicts, missing=missing)
+            if conflicts and all_or_nothing:
+                conn.rollback()
+                result.update(affected=0, ids=[])
+                return False, f"No {table} {action}: {len(conflicts)} changed since they were read.", result
+            if applied and on_applied is not None:
+                on_applied(cur, applied)
+        conn.commit()
+        if applied:
+            bump_table_version(*bump_tables)
+        message = f"{len(applied)} {table} {action}."
+        if conflicts:
+            message += f" {len(conflicts)} skipped because they changed since they were read."
+        if missing:
+            message += f" {len(missing)} no longer exist."
+        return True, message, result
+    except (psycopg2.Error, ValueError) as e:
+        conn.rollback()
+        return False, f"Error in bulk {table} {action.split()[0]}: {e}", result
+    finally:
+        release_db_connection(conn)
+
+def _set_clause(changes, allowed):
+    unknown = set(changes) - set(allowed)
+    if unknown or not changes:
+        raise ValueError(f"changes must set some of {', '.join(allowed)}; got {', '.join(sorted(changes)) or 'nothing'}")
+    columns = sorted(changes)
+    values = [json.dumps(changes[column]) if column == "demographics" else changes[column] for column in columns]
+    return ", ".join(f"{column} = %s" for column in columns), values
+
+_VERSION_MATCH = "c.id = v.id AND (v.version IS NULL OR c.version = v.version)"
+
+def bulk_update_campaigns(changes, ids=None, filters=None, expected_versions=None, all_or_nothing=False):
+    """Applies `changes` ({column: value}) to many campaigns with one UPDATE per batch.
+
+    Targets are `ids`, the keys of `expected_versions` ({id: version read})
+    and/or the campaigns matching `filters` (see CAMPAIGN_FILTERS). Rows whose
+    version no longer matches are skipped and reported as conflicts, or the
+    whole call is rolled back if all_or_nothing is set. Returns (success,
+    message, result) with affected count, ids, conflicts and missing ids.
+    """
+    try:
+        assignments, values = _set_clause(changes, CAMPAIGN_UPDATE_COLUMNS)
+    except ValueError as e:
+        return False, str(e), {"affected": 0, "ids": [], "conflicts": [], "missing": []}
+    statement = f"UPDATE campaigns c SET {assignments} FROM {{targets}} WHERE {_VERSION_MATCH} RETURNING c.id;"
+    return _bulk_run(
+        "campaigns", "updated", lambda cur, targets: _bulk_apply(cur, "campaigns", statement, targets, values),
+        ids, filters, expected_versions, all_or_nothing, CAMPAIGN_FILTERS, ("campaigns",)
+    )
+
+def bulk_delete_campaigns(ids=None, filters=None, expected_versions=None, all_or_nothing=False):
+    """Deletes many campaigns (and their channels and performance data) with one DELETE per batch.
+
+    Targets and conflict handling are as for bulk_update_campaigns.
+    """
+    statement = f"DELETE FROM campaigns c USING {{targets}} WHERE {_VERSION_MATCH} RETURNING c.id;"
+    return _bulk_run(
+        "campaigns", "deleted", lambda cur, targets: _bulk_apply(cur, "campaigns", statement, targets),
+        ids, filters, expected_versions, all_or_nothing, CAMPAIGN_FILTERS, ("campaigns", "campaign_performance")
+    )
+
+def bulk_update_customers(changes, ids=None, filters=None, expected_versions=None, all_or_nothing=False):
+    """Applies `changes` to many customers with one UPDATE per batch; see bulk_update_campaigns.
+
+    Filters are CUSTOMER_FILTERS plus "demographics", which takes segment criteria.
+    Segment memberships of updated customers are refreshed in the same transaction.
+    """
+    if isinstance(changes.get("email"), str):
+        changes = dict(changes, email=normalize_email(changes["email"]))
+    try:
+        assignments, values = _set_clause(changes, CUSTOMER_UPDATE_COLUMNS)
+    except ValueError as e:
+        return False, str(e), {"affected": 0, "ids": [], "conflicts": [], "missing": []}
+    statement = f"UPDATE customers c SET {assignments} FROM {{targets}} WHERE {_VERSION_MATCH} RETURNING c.id;"
+    return _bulk_run(
+        "customers", "updated", lambda cur, targets: _bulk_apply(cur, "customers", statement, targets, values),
+        ids, filters, expected_versions, all_or_nothing, CUSTOMER_FILTERS, ("customers", "segment_members"),
+        refresh_customer_memberships
+    )
+
+def bulk_delete_customers(ids=None, filters=None, expected_versions=None, all_or_nothing=False):
+    """Deletes many customers with one DELETE per batch; see bulk_update_customers for targets and filters."""
+    statement = f"DELETE FROM customers c USING {{targets}} WHERE {_VERSION_MATCH} RETURNING c.id;"
+    return _bulk_run(
+        "customers", "deleted", lambda cur, targets: _bulk_apply(cur, "customers", statement, targets),
+        ids, filters, expected_versions, all_or_nothing, CUSTOMER_FILTERS, ("customers", "segment_members")
+    )
+
+def bulk_delete_segments(ids=None, expected_versions=None, all_or_nothing=False):
+    """Deletes many segments with one DELETE per batch; see bulk_update_campaigns for conflict handling."""
+    statement = f"DELETE FROM segments c USING {{targets}} WHERE {_VERSION_MATCH} RETURNING c.id;"
+    success, message, result = _bulk_run(
+        "segments", "deleted", lambda cur, targets: _bulk_apply(cur, "segments", statement, targets),
+        ids, None, expected_versions, all_or_nothing, {}, ("segments", "segment_members")
+    )
+    for segment_id in result["ids"]:
+        segments.invalidate_segment(segment_id)
+    return success, message, result
 
 # --- Performance Tracking and Mock Data Generation ---
 
@@ -265,32 +1468,259 @@ def add_performance_data(campaign_id, metric_name, value):
                 (campaign_id, metric_name, value)
             )
         conn.commit()
+        bump_table_version("campaign_performance")
         return True, "Performance data added successfully."
     except psycopg2.Error as e:
         conn.rollback()
         return False, f"Error adding performance data: {e}"
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+def _write_event_batch(events, batch_size):
+    """Serializes up to batch_size events into an in-memory CSV buffer for COPY."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for campaign_id, metric_name, value, timestamp in itertools.islice(events, batch_size):
+        writer.writerow((campaign_id, metric_name, value, timestamp or datetime.now()))
+        count += 1
+    buffer.seek(0)
+    return buffer, count
 
-def get_performance_data_by_campaign(campaign_id):
-    """Retrieves all performance data for a given campaign."""
+def ingest_performance_events(events, batch_size=None):
+    """Streams (campaign_id, metric_name, value, timestamp) tuples into campaign_performance.
+
+    `events` may be any iterable or generator and is consumed lazily; each batch
+    of `batch_size` rows is sent with COPY FROM STDIN and committed on its own, so
+    memory stays bounded by the batch size. A timestamp of None means "now".
+    Returns (success, message, stats) where stats holds rows, batches, seconds
+    and rows_per_sec for the rows that were committed.
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    stats = {"rows": 0, "batches": 0, "seconds": 0.0, "rows_per_sec": 0.0}
     conn = get_db_connection()
     if conn is None:
-        return []
+        return False, "Database connection failed.", stats
+    events = iter(events)
+    started = time.perf_counter()
     try:
+        with conn.cursor() as cur:
+            while True:
+                buffer, count = _write_event_batch(events, batch_size)
+                if not count:
+                    break
+                cur.copy_expert(
+                    "COPY campaign_performance (campaign_id, metric_name, value, timestamp) "
+                    "FROM STDIN WITH (FORMAT csv);",
+                    buffer
+                )
+                conn.commit()
+                bump_table_version("campaign_performance")
+                stats["rows"] += count
+                stats["batches"] += 1
+        return True, f"Ingested {stats['rows']:,} performance events.", stats
+    except (psycopg2.Error, ValueError) as e:
+        conn.rollback()
+        return False, f"Error ingesting performance data after {stats['rows']:,} rows: {e}", stats
+    finally:
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        release_db_connection(conn)
+
+PERFORMANCE_DATA_SQL = (
+    "SELECT metric_name, value FROM campaign_performance WHERE campaign_id = %s ORDER BY timestamp ASC;"
+)
+# Same rows with their timestamps, for merging with archived rows
+PERFORMANCE_DATA_TIMESTAMPED_SQL = (
+    "SELECT metric_name, value, timestamp FROM campaign_performance WHERE campaign_id = %s;"
+)
+
+def _read_archive(conn, campaign_id, start=None, end=None):
+    """Rows retention.py moved to Parquet for a campaign within start..end, or None if none were archived there."""
+    import retention
+    return retention.read_archive(conn, campaign_id, start, end)
+
+def _live_frame(conn, sql, params, fmt, archived, date_column):
+    """Fetches live rows as a DataFrame whose value column matches `fmt`; returns it with `archived` matched to it.
+
+    Values stay exact Decimals for "rows" and "tuples", as the unmerged reads
+    return them, and become float64 for "frame" and "arrays".
+    """
+    import pandas as pd
+    if fmt in ("rows", "tuples"):
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            names = [column.name for column in cur.description]
+            live = pd.DataFrame(cur.fetchall(), columns=names)
+        live[date_column] = pd.to_datetime(live[date_column])
+        return live, archived
+    live = _fetch_columnar(conn, sql, params, "frame", date_columns=(date_column,))
+    return live, archived.assign(value=archived["value"].astype("float64"))
+
+def get_performance_data_by_campaign(campaign_id, fmt="rows"):
+    """Retrieves all performance data for a given campaign; `fmt` selects the result shape (see RESULT_FORMATS).
+
+    Rows archived by retention.py are read back from their Parquet files and merged in timestamp order.
+    """
+    _check_format(fmt)
+    conn = get_db_connection()
+    if conn is None:
+        return _empty_result(fmt)
+    try:
+        archived = _read_archive(conn, campaign_id)
+        if archived is not None:
+            live, archived = _live_frame(conn, PERFORMANCE_DATA_TIMESTAMPED_SQL, [campaign_id], fmt, archived,
+                                         "timestamp")
+            import pandas as pd
+            frame = pd.concat([archived[["metric_name", "value", "timestamp"]], live], ignore_index=True)
+            frame = frame.sort_values("timestamp", kind="stable", ignore_index=True)
+            return _frame_result(frame[["metric_name", "value"]], fmt)
+        if fmt != "rows":
+            return _fetch_columnar(conn, PERFORMANCE_DATA_SQL, [campaign_id], fmt)
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(
-                "SELECT metric_name, value FROM campaign_performance WHERE campaign_id = %s ORDER BY timestamp ASC;",
-                (campaign_id,)
-            )
+            cur.execute(PERFORMANCE_DATA_SQL, (campaign_id,))
             return cur.fetchall()
+    except (psycopg2.Error, OSError) as e:
+        logger.error("Error reading performance data: %s", e)
+        return _empty_result(fmt)
+    finally:
+        release_db_connection(conn)
+
+PERFORMANCE_TOTALS_SQL = (
+    "SELECT metric_name, SUM(total) FROM campaign_performance_daily "
+    "WHERE campaign_id = %s GROUP BY metric_name ORDER BY metric_name;"
+)
+
+def get_performance_totals_by_campaign(campaign_id):
+    """Returns {metric_name: total} for a campaign, read from the daily rollups."""
+    conn = get_db_connection()
+    if conn is None:
+        return {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(PERFORMANCE_TOTALS_SQL, (campaign_id,))
+            return dict(cur.fetchall())
     except psycopg2.Error as e:
-        print(f"Error reading performance data: {e}")
-        return []
+        logger.error("Error reading performance totals: %s", e)
+        return {}
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+# pandas floor frequencies for the sub-day buckets read from raw (or archived) rows
+RAW_BUCKET_FREQUENCIES = {"minute": "min", "hour": "h"}
+
+# date_trunc units from finest to coarsest, with their approximate length in seconds
+SERIES_BUCKETS = (
+    ("minute", 60),
+    ("hour", 3600),
+    ("day", 86400),
+    ("week", 7 * 86400),
+    ("month", 30 * 86400),
+    ("quarter", 91 * 86400),
+    ("year", 365 * 86400),
+)
+ROLLUP_BUCKETS = ("day", "week", "month", "quarter", "year")
+
+def choose_series_bucket(start, end, max_points=None, minimum=None):
+    """Returns the finest date_trunc unit, no finer than `minimum`, that keeps start..end within max_points buckets."""
+    max_points = max_points or SERIES_MAX_POINTS
+    span = max((end - start).total_seconds(), 0)
+    names = [name for name, _ in SERIES_BUCKETS]
+    candidates = SERIES_BUCKETS[names.index(minimum):] if minimum else SERIES_BUCKETS
+    for name, seconds in candidates:
+        # Truncation can add a partial bucket at each end of the range
+        if span / seconds + 2 <= max_points:
+            return name
+    return SERIES_BUCKETS[-1][0]
+
+SERIES_BOUNDS_SQL = (
+    "SELECT MIN(day) AS first_day, MAX(day) AS last_day FROM campaign_performance_daily WHERE campaign_id = %s;"
+)
+
+def _series_bounds(bounds, start, end):
+    """Fills a missing start/end from the campaign's first and last day of rollup data."""
+    start = start or datetime.combine(bounds["first_day"], dt_time.min)
+    end = end or datetime.combine(bounds["last_day"] + timedelta(days=1), dt_time.min)
+    return start, end
+
+def _performance_series_query(campaign_id, metrics, start, end, bucket, max_points):
+    """Builds the bucketed series query for a resolved start/end range."""
+    unit = choose_series_bucket(start, end, max_points, bucket)
+    params = [unit, campaign_id, start, end]
+    if unit in ROLLUP_BUCKETS:
+        sql = """
+            SELECT date_trunc(%s, day::timestamp) AS bucket, metric_name, SUM(total) AS value
+            FROM campaign_performance_daily
+            WHERE campaign_id = %s AND day >= %s::date AND day < %s::date
+        """
+        # A partial last day still belongs to the range
+        if isinstance(end, datetime) and end.time() != dt_time.min:
+            params[3] = end.date() + timedelta(days=1)
+    else:
+        sql = """
+            SELECT date_trunc(%s, timestamp) AS bucket, metric_name, SUM(value) AS value
+            FROM campaign_performance
+            WHERE campaign_id = %s AND timestamp >= %s AND timestamp < %s
+        """
+    if metrics:
+        sql += " AND metric_name = ANY(%s)"
+        params.append(list(metrics))
+    return sql + " GROUP BY 1, 2 ORDER BY 1, 2;", params
+
+def _bucket_archived(archived, unit, metrics):
+    """Keeps the archived rows of `metrics` and floors their timestamps to `unit` buckets like date_trunc."""
+    if metrics:
+        archived = archived[archived["metric_name"].isin(list(metrics))]
+    return archived.assign(bucket=archived["timestamp"].dt.floor(RAW_BUCKET_FREQUENCIES[unit]))
+
+def _sum_series(archived, live):
+    """Sums bucketed archived rows with a live series frame per bucket and metric."""
+    import pandas as pd
+    frame = pd.concat([archived[["bucket", "metric_name", "value"]], live], ignore_index=True)
+    return frame.groupby(["bucket", "metric_name"], as_index=False)["value"].sum()
+
+def _merge_archived_series(conn, query, archived, unit, metrics, fmt):
+    """Buckets archived rows like date_trunc and sums them with the live series as a DataFrame."""
+    live, archived = _live_frame(conn, *query, fmt, _bucket_archived(archived, unit, metrics), "bucket")
+    return _sum_series(archived, live)
+
+def get_performance_series(campaign_id, metrics=None, start=None, end=None, bucket=None, max_points=None,
+                           fmt="rows"):
+    """Returns time-bucketed metric sums for a campaign as rows of bucket, metric_name and value.
+
+    Aggregation runs on the server with date_trunc. The bucket is widened
+    automatically so each metric gets at most `max_points` points; `bucket`
+    only sets the finest unit allowed. Day and coarser buckets are served from
+    the daily rollups, finer ones from the raw table plus any rows archived
+    by retention.py. Missing start/end default to the campaign's first and
+    last day of data. `fmt` selects the result shape (see RESULT_FORMATS).
+    """
+    _check_format(fmt)
+    conn = get_db_connection()
+    if conn is None:
+        return _empty_result(fmt)
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            if start is None or end is None:
+                cur.execute(SERIES_BOUNDS_SQL, (campaign_id,))
+                bounds = cur.fetchone()
+                if bounds["first_day"] is None:
+                    return _empty_result(fmt)
+                start, end = _series_bounds(bounds, start, end)
+            query = _performance_series_query(campaign_id, metrics, start, end, bucket, max_points)
+            unit = choose_series_bucket(start, end, max_points, bucket)
+            archived = _read_archive(conn, campaign_id, start, end) if unit in RAW_BUCKET_FREQUENCIES else None
+            if archived is not None:
+                return _frame_result(_merge_archived_series(conn, query, archived, unit, metrics, fmt), fmt)
+            if fmt == "rows":
+                cur.execute(*query)
+                return cur.fetchall()
+        return _fetch_columnar(conn, *query, fmt, date_columns=("bucket",))
+    except (psycopg2.Error, OSError) as e:
+        logger.error("Error reading performance series: %s", e)
+        return _empty_result(fmt)
+    finally:
+        release_db_connection(conn)
 
 # --- Business Insights Functions ---
 
@@ -303,11 +1733,10 @@ def get_total_campaign_count():
             cur.execute("SELECT COUNT(*) FROM campaigns;")
             return cur.fetchone()[0]
     except psycopg2.Error as e:
-        print(f"Error getting total campaign count: {e}")
+        logger.error("Error getting total campaign count: %s", e)
         return 0
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def get_total_customers_count():
     """Returns the total number of customers."""
@@ -318,11 +1747,10 @@ def get_total_customers_count():
             cur.execute("SELECT COUNT(*) FROM customers;")
             return cur.fetchone()[0]
     except psycopg2.Error as e:
-        print(f"Error getting total customer count: {e}")
+        logger.error("Error getting total customer count: %s", e)
         return 0
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def get_avg_campaign_budget():
     """Returns the average budget of all campaigns."""
@@ -334,11 +1762,10 @@ def get_avg_campaign_budget():
             result = cur.fetchone()[0]
             return float(result) if result else 0.0
     except psycopg2.Error as e:
-        print(f"Error getting average campaign budget: {e}")
+        logger.error("Error getting average campaign budget: %s", e)
         return 0.0
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def get_max_campaign_budget():
     """Returns the maximum budget of any campaign."""
@@ -350,11 +1777,10 @@ def get_max_campaign_budget():
             result = cur.fetchone()[0]
             return float(result) if result else 0.0
     except psycopg2.Error as e:
-        print(f"Error getting max campaign budget: {e}")
+        logger.error("Error getting max campaign budget: %s", e)
         return 0.0
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def get_min_campaign_budget():
     """Returns the minimum budget of any campaign."""
@@ -366,11 +1792,10 @@ def get_min_campaign_budget():
             result = cur.fetchone()[0]
             return float(result) if result else 0.0
     except psycopg2.Error as e:
-        print(f"Error getting min campaign budget: {e}")
+        logger.error("Error getting min campaign budget: %s", e)
         return 0.0
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 def get_total_emails_sent():
     """Returns the total value for the 'emails_sent' metric across all campaigns."""
@@ -378,11 +1803,76 @@ def get_total_emails_sent():
     if conn is None: return 0
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT COALESCE(SUM(value), 0) FROM campaign_performance WHERE metric_name = 'emails_sent';")
+            cur.execute("SELECT COALESCE(SUM(total), 0) FROM campaign_performance_daily WHERE metric_name = 'emails_sent';")
             return cur.fetchone()[0]
     except psycopg2.Error as e:
-        print(f"Error getting total emails sent: {e}")
+        logger.error("Error getting total emails sent: %s", e)
         return 0
     finally:
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+INSIGHTS_SNAPSHOT_SQL = """
+    WITH campaign_stats AS (
+        SELECT COUNT(*) AS total_campaigns,
+               AVG(budget) AS avg_budget,
+               MAX(budget) AS max_budget,
+               MIN(budget) AS min_budget
+        FROM campaigns
+    )
+    SELECT campaign_stats.*,
+           (SELECT COUNT(*) FROM customers) AS total_customers,
+           (SELECT COALESCE(SUM(total), 0) FROM campaign_performance_daily
+            WHERE metric_name = 'emails_sent') AS total_emails_sent
+    FROM campaign_stats;
+"""
+
+_insights_cache = {"snapshot": None, "expires_at": 0.0, "generation": 0}
+_insights_cache_lock = threading.Lock()
+
+def invalidate_insights_cache():
+    """Drops the cached insights snapshot; bump_table_version calls it for the aggregated tables."""
+    with _insights_cache_lock:
+        _insights_cache["snapshot"] = None
+        _insights_cache["generation"] += 1
+
+# Returned by get_insights_snapshot when the database cannot be read
+EMPTY_INSIGHTS = {
+    "total_campaigns": 0, "total_customers": 0, "total_emails_sent": 0,
+    "avg_budget": 0.0, "max_budget": 0.0, "min_budget": 0.0,
+}
+
+def get_insights_snapshot(ttl=None):
+    """Returns all Business Insights figures from one query, cached for `ttl` seconds.
+
+    The dict holds total_campaigns, total_customers, total_emails_sent and
+    avg_budget, max_budget, min_budget.
+    """
+    ttl = INSIGHTS_CACHE_TTL if ttl is None else ttl
+    with _insights_cache_lock:
+        if _insights_cache["snapshot"] is not None and time.monotonic() < _insights_cache["expires_at"]:
+            return dict(_insights_cache["snapshot"])
+        generation = _insights_cache["generation"]
+
+    # The snapshot is shared by every session, so it must include every write made before it
+    with consistent_reads():
+        conn = get_db_connection()
+        if conn is None: return dict(EMPTY_INSIGHTS)
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(INSIGHTS_SNAPSHOT_SQL)
+                row = cur.fetchone()
+        except psycopg2.Error as e:
+            logger.error("Error getting insights snapshot: %s", e)
+            return dict(EMPTY_INSIGHTS)
+        finally:
+            release_db_connection(conn)
+
+    snapshot = dict(row)
+    for key in ("avg_budget", "max_budget", "min_budget"):
+        snapshot[key] = float(snapshot[key]) if snapshot[key] else 0.0
+    with _insights_cache_lock:
+        # Skip caching if a write invalidated the cache while the query was running
+        if _insights_cache["generation"] == generation and ttl > 0:
+            _insights_cache["snapshot"] = snapshot
+            _insights_cache["expires_at"] = time.monotonic() + ttl
+    return dict(snapshot)
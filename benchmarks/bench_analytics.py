@@ -0,0 +1,83 @@
+"""Times the campaign KPI computation: vectorized NumPy vs a per-campaign Python loop.
+
+Synthetic funnel totals are generated in memory, so no database is needed;
+pass --db to also time load_campaign_metrics() against the configured database.
+
+    python -m benchmarks.bench_analytics --campaigns 100000 --repeat 5
+"""
+import argparse
+import math
+import statistics
+import time
+
+import numpy as np
+
+import analytics
+
+def synthetic_metrics(count, seed=0):
+    """Returns load_campaign_metrics()-shaped arrays for `count` campaigns."""
+    rng = np.random.default_rng(seed)
+    duration = rng.integers(1, 120, count).astype(np.float64)
+    sent = rng.integers(0, 50000, count).astype(np.float64)
+    opened = np.floor(sent * rng.uniform(0.05, 0.6, count))
+    return {
+        "id": np.arange(1, count + 1, dtype=np.int64),
+        "name": np.array([f"Campaign {i}" for i in range(1, count + 1)], dtype=object),
+        "budget": np.round(rng.uniform(100, 100000, count), 2),
+        "duration_days": duration,
+        "elapsed_days": np.floor(duration * rng.uniform(0, 1, count)),
+        "sent": sent,
+        "opened": opened,
+        "clicked": np.floor(opened * rng.uniform(0, 0.4, count)),
+    }
+
+def loop_kpis(metrics):
+    """Per-campaign Python baseline for the same rates (no ranking)."""
+    def ratio(numerator, denominator):
+        return numerator / denominator if denominator > 0 else math.nan
+    rows = []
+    for i in range(len(metrics["id"])):
+        sent, opened, clicked = metrics["sent"][i], metrics["opened"][i], metrics["clicked"][i]
+        burn = ratio(metrics["elapsed_days"][i], metrics["duration_days"][i])
+        spend = metrics["budget"][i] * (0.0 if math.isnan(burn) else burn)
+        rows.append({
+            "open_rate": ratio(opened, sent),
+            "click_through_rate": ratio(clicked, sent),
+            "click_to_open_rate": ratio(clicked, opened),
+            "burn_rate": burn,
+            "cost_per_click": ratio(spend, clicked),
+        })
+    rows.sort(key=lambda row: -row["click_through_rate"] if not math.isnan(row["click_through_rate"]) else math.inf)
+    return rows
+
+def time_call(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--campaigns", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", action="store_true", help="also time loading metrics from the database")
+    args = parser.parse_args()
+
+    metrics = synthetic_metrics(args.campaigns)
+    vectorized = time_call(lambda: analytics.compute_campaign_kpis(metrics), args.repeat)
+    leaderboard = time_call(
+        lambda: analytics.campaign_leaderboard(analytics.compute_campaign_kpis(metrics), top=20), args.repeat
+    )
+    loop = time_call(lambda: loop_kpis(metrics), max(1, args.repeat // 2))
+    print(f"{args.campaigns:,} campaigns (median of {args.repeat})")
+    print(f"  python loop (rates + sort):    {loop * 1000:9.1f} ms")
+    print(f"  numpy kpis (rates + 6 ranks):  {vectorized * 1000:9.1f} ms  ({loop / vectorized:.0f}x)")
+    print(f"  numpy kpis + top-20 board:     {leaderboard * 1000:9.1f} ms")
+    if args.db:
+        load = time_call(analytics.load_campaign_metrics, args.repeat)
+        print(f"  load_campaign_metrics ({len(analytics.load_campaign_metrics().get('id', [])):,} rows): {load * 1000:9.1f} ms")
+
+if __name__ == "__main__":
+    main()
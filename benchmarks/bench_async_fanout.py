@@ -0,0 +1,74 @@
+"""Measures Business Insights and dashboard latency: sequential sync calls vs asyncio.gather.
+
+The sequential page waits for the sum of its queries; the fanned-out page
+should approach the slowest single query.
+
+    python -m benchmarks.bench_async_fanout --campaign-id 1 --repeat 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import async_backend
+import backend
+
+def page_queries(campaign_id):
+    """(name, sync callable, async coroutine factory) for every query one page render needs."""
+    return [
+        ("total_campaigns", backend.get_total_campaign_count, async_backend.get_total_campaign_count),
+        ("total_customers", backend.get_total_customers_count, async_backend.get_total_customers_count),
+        ("total_emails_sent", backend.get_total_emails_sent, async_backend.get_total_emails_sent),
+        ("avg_budget", backend.get_avg_campaign_budget, async_backend.get_avg_campaign_budget),
+        ("max_budget", backend.get_max_campaign_budget, async_backend.get_max_campaign_budget),
+        ("min_budget", backend.get_min_campaign_budget, async_backend.get_min_campaign_budget),
+        ("performance_totals",
+         lambda: backend.get_performance_totals_by_campaign(campaign_id),
+         lambda: async_backend.get_performance_totals_by_campaign(campaign_id)),
+        ("performance_series",
+         lambda: backend.get_performance_series(campaign_id),
+         lambda: async_backend.get_performance_series(campaign_id)),
+    ]
+
+def time_sync(queries):
+    timings = {}
+    started = time.perf_counter()
+    for name, sync_call, _ in queries:
+        call_started = time.perf_counter()
+        sync_call()
+        timings[name] = time.perf_counter() - call_started
+    return time.perf_counter() - started, timings
+
+async def time_async(queries):
+    started = time.perf_counter()
+    await asyncio.gather(*(async_call() for _, _, async_call in queries))
+    return time.perf_counter() - started
+
+async def run(campaign_id, repeat):
+    queries = page_queries(campaign_id)
+    # Warm both pools so connection setup is not measured
+    time_sync(queries)
+    await time_async(queries)
+
+    sequential, gathered, slowest, summed = [], [], [], []
+    for _ in range(repeat):
+        total, timings = time_sync(queries)
+        sequential.append(total)
+        summed.append(sum(timings.values()))
+        slowest.append(max(timings.values()))
+        gathered.append(await time_async(queries))
+    await async_backend.close_pool()
+
+    ms = lambda values: f"{statistics.median(values) * 1000:8.2f} ms"
+    print(f"{len(queries)} queries per page, median of {repeat} runs")
+    print(f"  sequential (sync backend):   {ms(sequential)}")
+    print(f"  sum of single-query latency: {ms(summed)}")
+    print(f"  slowest single query:        {ms(slowest)}")
+    print(f"  asyncio.gather:              {ms(gathered)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--campaign-id", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.campaign_id, args.repeat))
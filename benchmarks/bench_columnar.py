@@ -0,0 +1,115 @@
+"""Compares row dicts + pd.DataFrame with the columnar read formats on large tables.
+
+Tops customers up to --rows and writes --rows performance rows for a scratch
+campaign, then times read_customers and get_performance_data_by_campaign in
+each format and records peak Python memory with tracemalloc. Scratch rows are
+deleted afterwards.
+
+    python -m benchmarks.bench_columnar --rows 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import backend
+import datagen
+import migrations
+
+MODES = {
+    "rows + DataFrame": lambda read: pd.DataFrame(read("rows")),
+    "tuples": lambda read: read("tuples"),
+    "arrays": lambda read: read("arrays"),
+    "frame (COPY csv)": lambda read: read("frame"),
+}
+
+def prepare(rows):
+    """Creates the scratch data; returns (first scratch customer id or None, scratch campaign id)."""
+    rng = np.random.default_rng(0)
+    conn = backend.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM customers;")
+            missing = rows - cur.fetchone()[0]
+            first_customer = None
+            if missing > 0:
+                first_customer = datagen.reserve_ids(cur, "customers", missing)
+                datagen.copy_columns(cur, "customers", ("id", "name", "email", "demographics", "created_at"),
+                                     datagen.customer_columns(rng, first_customer, missing,
+                                                              datetime.now().replace(microsecond=0)))
+
+            today = date.today()
+            cur.execute(
+                "INSERT INTO campaigns (name, budget, start_date, end_date, description) "
+                "VALUES ('bench-columnar', 0, %s, %s, 'columnar benchmark') RETURNING id;",
+                (today - timedelta(days=30), today)
+            )
+            campaign_id = cur.fetchone()[0]
+            migrations.ensure_performance_partitions(cur, today - timedelta(days=30), today)
+            timestamps = np.datetime64(datetime.combine(today, datetime.min.time()), "s") - rng.integers(
+                0, 30 * 86400, rows).astype("timedelta64[s]")
+            datagen.copy_columns(cur, "campaign_performance", ("campaign_id", "metric_name", "value", "timestamp"), (
+                np.full(rows, campaign_id),
+                np.array(["emails_sent", "emails_opened", "emails_clicked"])[np.arange(rows) % 3],
+                rng.integers(0, 1000, rows),
+                timestamps,
+            ))
+        conn.commit()
+        return first_customer, campaign_id
+    finally:
+        backend.release_db_connection(conn)
+
+def cleanup(first_customer, campaign_id):
+    conn = backend.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM campaigns WHERE id = %s;", (campaign_id,))
+            if first_customer is not None:
+                cur.execute("DELETE FROM customers WHERE id >= %s;", (first_customer,))
+        conn.commit()
+    finally:
+        backend.release_db_connection(conn)
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if isinstance(result, pd.DataFrame):
+        retained = result.memory_usage(deep=True).sum()
+    elif isinstance(result, dict):
+        retained = sum(array.nbytes for array in result.values())
+    else:
+        retained = None
+    return seconds, peak, retained
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    first_customer, campaign_id = prepare(args.rows)
+    try:
+        reads = {
+            "customers": lambda fmt: backend.read_customers(fmt=fmt),
+            "campaign_performance": lambda fmt: backend.get_performance_data_by_campaign(campaign_id, fmt=fmt),
+        }
+        for table, read in reads.items():
+            print(f"{table} ({args.rows:,} rows)")
+            print(f"  {'mode':<20}{'seconds':>10}{'peak MiB':>12}{'result MiB':>12}")
+            for mode, build in MODES.items():
+                seconds, peak, retained = measure(lambda: build(read))
+                result = f"{retained / 2**20:>12.1f}" if retained is not None else f"{'-':>12}"
+                print(f"  {mode:<20}{seconds:>10.2f}{peak / 2**20:>12.1f}{result}")
+    finally:
+        cleanup(first_customer, campaign_id)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compares the old N+1 read_campaigns path with the aggregated single query.
+
+Seeds campaigns inside a transaction that is rolled back afterwards, so the
+benchmark leaves the database untouched.
+
+    python -m benchmarks.bench_read_campaigns --sizes 1000 10000 100000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2 import extras
+
+import backend
+
+CHANNELS = ["Email", "Social Media", "Paid Ads", "Content Marketing", "SMS"]
+
+def seed_campaigns(cur, count):
+    """Inserts `count` campaigns with one to three channels each."""
+    today = date.today()
+    rows = [
+        (f"bench-{i}", round(random.uniform(100, 50000), 2), today - timedelta(days=i % 365),
+         today + timedelta(days=30), "benchmark campaign")
+        for i in range(count)
+    ]
+    ids = extras.execute_values(
+        cur,
+        "INSERT INTO campaigns (name, budget, start_date, end_date, description) VALUES %s RETURNING id;",
+        rows, page_size=1000, fetch=True
+    )
+    channel_rows = [
+        (campaign_id, channel)
+        for (campaign_id,) in ids
+        for channel in random.sample(CHANNELS, random.randint(1, 3))
+    ]
+    extras.execute_values(
+        cur,
+        "INSERT INTO campaign_channels (campaign_id, channel_name) VALUES %s;",
+        channel_rows, page_size=1000
+    )
+
+def read_campaigns_n_plus_one(cur):
+    """The original implementation: one channel query per campaign."""
+    cur.execute("SELECT * FROM campaigns ORDER BY start_date DESC;")
+    campaigns = cur.fetchall()
+    for campaign in campaigns:
+        cur.execute("SELECT channel_name FROM campaign_channels WHERE campaign_id = %s;", (campaign['id'],))
+        campaign['channels'] = [row['channel_name'] for row in cur.fetchall()]
+    return campaigns
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, len(result)
+
+def run(sizes, repeat):
+    conn = psycopg2.connect(
+        dbname=backend.DB_NAME, user=backend.DB_USER, password=backend.DB_PASSWORD,
+        host=backend.DB_HOST, port=backend.DB_PORT
+    )
+    try:
+        for size in sizes:
+            with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
+                seed_campaigns(cur, size)
+                old = min(timed(read_campaigns_n_plus_one, cur) for _ in range(repeat))
+                new = min(timed(backend._fetch_campaigns, cur) for _ in range(repeat))
+                filtered = min(timed(backend._fetch_campaigns, cur, "Email") for _ in range(repeat))
+            conn.rollback()
+            print(
+                f"{size:>7} campaigns | n+1: {old[0] * 1000:9.1f} ms ({old[1]} rows)"
+                f" | aggregated: {new[0] * 1000:8.1f} ms ({new[1]} rows)"
+                f" | channel filter: {filtered[0] * 1000:8.1f} ms ({filtered[1]} rows)"
+                f" | speedup x{old[0] / new[0]:.1f}"
+            )
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="best-of-N timing per path")
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
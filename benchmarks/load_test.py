@@ -0,0 +1,354 @@
+"""Latency and load benchmarks for the public backend functions.
+
+Each function is called repeatedly against the seeded database (see
+benchmarks.seed) and reported with p50/p95/p99 latency, queries issued per
+call and calls per second. A mixed workload then runs reads and writes from
+several threads at once. Results are written as JSON so runs can be compared:
+
+    python -m benchmarks.seed --campaigns 10000 --customers 100000 --reset
+    python -m benchmarks.load_test --repeat 50 --threads 8 --duration 30 --output results/today.json
+    python -m benchmarks.load_test --compare results/yesterday.json results/today.json
+
+Write benchmarks create their own campaigns and customers and delete them
+again (their counts include the id lookups the round trip needs);
+performance rows go to a scratch campaign deleted at the end.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import psycopg2
+
+import backend
+import instrumentation
+
+# --- Measurement ---
+
+def summarize(latencies, queries, elapsed=None):
+    """Returns p50/p95/p99/mean/max latency in ms, queries per call and calls per second."""
+    samples = np.asarray(latencies) * 1000
+    if not len(samples):
+        return {"calls": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    elapsed = elapsed if elapsed is not None else float(np.sum(latencies))
+    return {
+        "calls": len(samples),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+        "max_ms": round(float(samples.max()), 3),
+        "queries_per_call": round(float(np.mean(queries)), 2),
+        "calls_per_sec": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+
+def measure(call):
+    """Runs `call` once and returns (seconds, statements issued)."""
+    queries_before = instrumentation.statements_issued()
+    started = time.perf_counter()
+    call()
+    return time.perf_counter() - started, instrumentation.statements_issued() - queries_before
+
+def bench_function(call, repeat, warmup=2):
+    for _ in range(warmup):
+        call()
+    latencies, queries = [], []
+    for _ in range(repeat):
+        seconds, issued = measure(call)
+        latencies.append(seconds)
+        queries.append(issued)
+    return summarize(latencies, queries)
+
+# --- Workload ---
+
+def _lookup_id(table, column, value):
+    """Returns the newest id in `table` whose `column` equals `value` (writes don't return ids)."""
+    conn = backend.get_db_connection()
+    if conn is None:
+        raise RuntimeError("Database connection failed.")
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT MAX(id) FROM {table} WHERE {column} = %s;", (value,))
+            row = cur.fetchone()
+        conn.commit()
+        return row[0]
+    finally:
+        backend.release_db_connection(conn)
+
+class Fixture:
+    """Ids sampled from the seeded data plus scratch rows created for write benchmarks."""
+
+    def __init__(self, seed_value=0):
+        self.random = random.Random(seed_value)
+        conn = backend.get_db_connection()
+        if conn is None:
+            raise RuntimeError("Database connection failed.")
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM campaigns ORDER BY random() LIMIT 1000;")
+                self.campaign_ids = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT id FROM segments;")
+                self.segment_ids = [row[0] for row in cur.fetchall()]
+            conn.commit()
+        finally:
+            backend.release_db_connection(conn)
+        if not self.campaign_ids:
+            raise RuntimeError("No data to benchmark; run python -m benchmarks.seed first.")
+        self.scratch_campaign = self._create_campaign("bench-scratch")
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _create_campaign(self, name):
+        today = date.today()
+        backend.create_campaign(name, 1000, today - timedelta(days=30), today, "load test", ["Email"])
+        return _lookup_id("campaigns", "name", name)
+
+    def unique(self, prefix):
+        with self._lock:
+            self._sequence += 1
+            return f"{prefix}-{threading.get_ident()}-{self._sequence}-{time.time_ns()}"
+
+    def campaign(self):
+        return self.random.choice(self.campaign_ids)
+
+    def segment(self):
+        return self.random.choice(self.segment_ids) if self.segment_ids else None
+
+    def cleanup(self):
+        backend.delete_campaign(self.scratch_campaign)
+
+def _campaign_round_trip(fixture):
+    name = fixture.unique("bench-campaign")
+    today = date.today()
+    backend.create_campaign(name, 500, today, today + timedelta(days=14), "load test", ["Email", "SMS"])
+    campaign_id = _lookup_id("campaigns", "name", name)
+    if campaign_id:
+        backend.update_campaign(campaign_id, name, 750, today, today + timedelta(days=21), "load test")
+        backend.delete_campaign(campaign_id)
+
+def _customer_round_trip(fixture):
+    email = fixture.unique("bench") + "@example.com"
+    backend.create_customer("Bench Customer", email, {"age": 30, "city": "Austin", "tier": "pro"})
+    customer_id = _lookup_id("customers", "email", email)
+    if customer_id:
+        backend.update_customer(customer_id, "Bench Customer", email, {"age": 31, "city": "Boston", "tier": "pro"})
+        backend.delete_customer(customer_id)
+
+def _ingest_batch(fixture, rows=1000):
+    now = datetime.now()
+    events = (
+        (fixture.scratch_campaign, "emails_sent", random.randint(1, 100), now - timedelta(seconds=i))
+        for i in range(rows)
+    )
+    backend.ingest_performance_events(events)
+
+def _drain(iterator, limit=5000):
+    for count, _ in enumerate(iterator, start=1):
+        if count >= limit:
+            break
+
+def function_calls(fixture):
+    """(name, callable) for every public backend function, using ids from the fixture."""
+    today = date.today()
+    return [
+        ("read_campaigns", lambda: backend.read_campaigns()),
+        ("read_campaigns[channel]", lambda: backend.read_campaigns("Email")),
+        ("read_campaigns_page", lambda: backend.read_campaigns_page()),
+        ("read_campaigns_page[channel]", lambda: backend.read_campaigns_page(channel="SMS")),
+        ("iter_campaigns[5k]", lambda: _drain(backend.iter_campaigns())),
+        ("read_customers", lambda: backend.read_customers()),
+        ("read_customers_page", lambda: backend.read_customers_page()),
+        ("iter_customers[5k]", lambda: _drain(backend.iter_customers())),
+        ("read_segments", lambda: backend.read_segments()),
+        ("count_segment_members", lambda: backend.count_segment_members(fixture.segment())),
+        ("iter_segment_member_ids[5k]", lambda: _drain(backend.iter_segment_member_ids(fixture.segment()))),
+        ("get_performance_data_by_campaign", lambda: backend.get_performance_data_by_campaign(fixture.campaign())),
+        ("get_performance_totals_by_campaign", lambda: backend.get_performance_totals_by_campaign(fixture.campaign())),
+        ("get_performance_series", lambda: backend.get_performance_series(fixture.campaign())),
+        ("get_performance_series[90d]", lambda: backend.get_performance_series(
+            fixture.campaign(), start=today - timedelta(days=90), end=today)),
+        ("get_total_campaign_count", backend.get_total_campaign_count),
+        ("get_total_customers_count", backend.get_total_customers_count),
+        ("get_avg_campaign_budget", backend.get_avg_campaign_budget),
+        ("get_max_campaign_budget", backend.get_max_campaign_budget),
+        ("get_min_campaign_budget", backend.get_min_campaign_budget),
+        ("get_total_emails_sent", backend.get_total_emails_sent),
+        ("get_insights_snapshot[uncached]", lambda: backend.get_insights_snapshot(ttl=0)),
+        ("add_performance_data", lambda: backend.add_performance_data(fixture.scratch_campaign, "emails_sent", 1)),
+        ("ingest_performance_events[1k]", lambda: _ingest_batch(fixture)),
+        ("campaign create/update/delete", lambda: _campaign_round_trip(fixture)),
+        ("customer create/update/delete", lambda: _customer_round_trip(fixture)),
+    ]
+
+# Relative weights of the mixed workload: mostly page reads, some writes
+MIXED_WORKLOAD = {
+    "read_campaigns_page": 30,
+    "read_customers_page": 20,
+    "get_performance_totals_by_campaign": 15,
+    "get_performance_series": 10,
+    "get_insights_snapshot[uncached]": 5,
+    "read_segments": 5,
+    "count_segment_members": 5,
+    "add_performance_data": 5,
+    "campaign create/update/delete": 3,
+    "customer create/update/delete": 2,
+}
+
+def run_mixed(fixture, threads, duration, weights=None):
+    """Runs a weighted mix of calls from `threads` threads for `duration` seconds."""
+    weights = weights or MIXED_WORKLOAD
+    calls = dict(function_calls(fixture))
+    names = list(weights)
+    results = {name: ([], []) for name in names}
+    errors = []
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(index)
+        local = {name: ([], []) for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=[weights[n] for n in names])[0]
+            try:
+                seconds, issued = measure(calls[name])
+            except Exception as e:  # keep the load running; errors are reported
+                errors.append(f"{name}: {e}")
+                continue
+            local[name][0].append(seconds)
+            local[name][1].append(issued)
+        return local
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for local in executor.map(worker, range(threads)):
+            for name, (latencies, queries) in local.items():
+                results[name][0].extend(latencies)
+                results[name][1].extend(queries)
+    elapsed = time.perf_counter() - started
+    all_latencies = [seconds for latencies, _ in results.values() for seconds in latencies]
+    all_queries = [issued for _, queries in results.values() for issued in queries]
+    return {
+        "threads": threads,
+        "seconds": round(elapsed, 2),
+        "errors": len(errors),
+        "error_samples": errors[:10],
+        "overall": summarize(all_latencies, all_queries, elapsed),
+        "functions": {name: summarize(latencies, queries, elapsed) for name, (latencies, queries) in results.items()},
+    }
+
+# --- Reporting ---
+
+def dataset_counts():
+    conn = backend.get_db_connection()
+    if conn is None:
+        raise RuntimeError("Database connection failed.")
+    try:
+        with conn.cursor() as cur:
+            counts = {}
+            for table in ("campaigns", "campaign_channels", "customers", "segments", "segment_members",
+                          "campaign_performance", "campaign_performance_daily"):
+                cur.execute(f"SELECT COUNT(*) FROM {table};")
+                counts[table] = cur.fetchone()[0]
+        conn.commit()
+        return counts
+    finally:
+        backend.release_db_connection(conn)
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old_path, new_path, threshold=0.1):
+    """Prints p50/p95 changes per function between two result files, flagging regressions over `threshold`."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'function':<38}{'p50 old':>10}{'p50 new':>10}{'p95 old':>10}{'p95 new':>10}")
+    for name, stats in new["functions"].items():
+        before = old["functions"].get(name)
+        if not before or not stats.get("calls") or not before.get("calls"):
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(
+            f"{name:<38}{before['p50_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+            f"{before['p95_ms']:>10.2f}{stats['p95_ms']:>10.2f}{flag}"
+        )
+
+def print_table(title, functions):
+    print(title)
+    print(f"  {'function':<38}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/call':>8}{'calls/s':>10}")
+    for name, stats in functions.items():
+        if stats.get("calls"):
+            print(
+                f"  {name:<38}{stats['calls']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                f"{stats['p99_ms']:>10.2f}{stats['queries_per_call']:>8.1f}{stats['calls_per_sec']:>10.1f}"
+            )
+
+def run(repeat, threads, duration, output=None, only=None, seed_value=0):
+    if not backend.QUERY_INSTRUMENTATION:
+        raise RuntimeError("Queries per call need QUERY_INSTRUMENTATION=1.")
+    fixture = Fixture(seed_value)
+    try:
+        results = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "psycopg2": psycopg2.__version__,
+            "config": {"repeat": repeat, "threads": threads, "duration": duration,
+                       "pool_max": backend.DB_POOL_MAX, "page_size": backend.PAGE_SIZE},
+            "dataset": dataset_counts(),
+            "functions": {},
+        }
+        for name, call in function_calls(fixture):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results["functions"][name] = bench_function(call, repeat)
+        print_table(f"Per-function latency ({repeat} calls each)", results["functions"])
+        if threads and duration:
+            results["mixed"] = run_mixed(fixture, threads, duration)
+            overall = results["mixed"]["overall"]
+            print_table(f"\nMixed workload, {threads} threads for {duration}s", results["mixed"]["functions"])
+            print(
+                f"  overall: {overall.get('calls_per_sec', 0):,.1f} calls/s, p95 {overall.get('p95_ms', 0):.2f} ms, "
+                f"{results['mixed']['errors']} errors"
+            )
+        results["pool"] = backend.get_pool_stats()
+        results["slowest_queries"] = instrumentation.get_query_stats()[:20]
+    finally:
+        fixture.cleanup()
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"\nResults written to {output}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend functions and mixed concurrent load.")
+    parser.add_argument("--repeat", type=int, default=30, help="calls per function")
+    parser.add_argument("--threads", type=int, default=8, help="threads for the mixed workload (0 to skip)")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of mixed workload")
+    parser.add_argument("--only", nargs="*", help="only benchmark functions whose name contains one of these")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args.repeat, args.threads, args.duration, args.output, args.only, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Checks read-replica routing and read-your-writes against a primary and its standbys.
+
+Point DB_HOST at the primary and DB_REPLICA_HOSTS at one or more streaming
+standbys (see "Read replicas" in the README). Each iteration creates a
+scratch campaign on the primary and immediately counts campaigns through the
+routed read path: once with the session token (the count must include the
+write) and once without it (stale counts show raw replication lag). The
+scratch campaigns are deleted afterwards.
+
+    DB_REPLICA_HOSTS=localhost:5433 python -m benchmarks.replica_check --iterations 200
+"""
+import argparse
+import sys
+import time
+from datetime import date
+
+import backend
+
+PREFIX = "replica-check-"
+
+def primary_count():
+    conn = backend.get_db_connection(read_only=False)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM campaigns;")
+            return cur.fetchone()[0]
+    finally:
+        backend.release_db_connection(conn)
+
+def run(iterations, use_token):
+    """Writes then reads `iterations` times; returns (stale reads, average read seconds)."""
+    stale = 0
+    read_seconds = 0.0
+    expected = primary_count()
+    for i in range(iterations):
+        backend.set_session_token(None)
+        today = date.today()
+        success, message = backend.create_campaign(f"{PREFIX}{i}", 0, today, today, "replica check", [])
+        if not success:
+            raise RuntimeError(message)
+        expected += 1
+        if not use_token:
+            backend.set_session_token(None)
+        started = time.perf_counter()
+        if backend.get_total_campaign_count() < expected:
+            stale += 1
+        read_seconds += time.perf_counter() - started
+    return stale, read_seconds / iterations if iterations else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    if not backend.DB_REPLICA_HOSTS:
+        print("DB_REPLICA_HOSTS is not set; every read would go to the primary.")
+        return 1
+
+    failed = False
+    try:
+        print(f"{'mode':<20}{'stale reads':>12}{'avg read (ms)':>15}")
+        for mode, use_token in (("session token", True), ("no token", False)):
+            stale, seconds = run(args.iterations, use_token)
+            print(f"{mode:<20}{stale:>12}{seconds * 1000:>15.2f}")
+            failed = failed or (use_token and stale > 0)
+    finally:
+        backend.bulk_delete_campaigns(filters={"name_contains": PREFIX})
+
+    stats = backend.get_pool_stats()
+    routing = stats["routing"]
+    print()
+    print(f"primary reads {routing['primary_reads']}, replica reads {routing['replica_reads']}, "
+          f"read-your-writes fallbacks {routing['lsn_fallbacks']}, writes {routing['writes']}")
+    for name, replica in stats["replicas"].items():
+        status = "skipped" if replica["down"] else "up"
+        print(f"  {name:<24}{replica['reads']:>8} reads{replica['errors']:>6} errors  {status}")
+    if failed:
+        print("Reads with the session token missed the session's own writes.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
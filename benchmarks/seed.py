@@ -0,0 +1,33 @@
+"""Seeds the configured database with synthetic data for benchmarks.
+
+A benchmark-sized front end to datagen.py, which holds the NumPy generators
+and the process-pool COPY loader.
+
+    python -m benchmarks.seed --campaigns 10000 --customers 100000 --days 90 --reset
+"""
+import argparse
+
+import datagen
+
+def seed(campaigns=1000, customers=10000, days=30, segments=True, reset=False, seed_value=0, workers=None):
+    """Generates and COPYs a synthetic dataset; returns row counts and timings per table."""
+    return datagen.generate(campaigns, customers, days, segments=segments, reset=reset,
+                            seed_value=seed_value, workers=workers)
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic benchmark data.")
+    parser.add_argument("--campaigns", type=int, default=1000)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30, help="days of performance history per campaign")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--no-segments", action="store_true")
+    parser.add_argument("--reset", action="store_true", help="truncate every backend table first")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    datagen.print_report(
+        seed(args.campaigns, args.customers, args.days, not args.no_segments, args.reset, args.seed, args.workers)
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Streaming bulk import and export of customers.
+
+The importer reads CSV (name, email, demographics as JSON text) or JSONL
+files lazily, validates records in a process pool, COPYs valid rows into a
+temporary staging table and finally upserts them into customers, keeping the
+last occurrence of each email. Memory stays bounded by the batch size and the
+number of chunks in flight, whatever the file size.
+
+The exporter streams customers (optionally one segment's members) to CSV with
+COPY TO STDOUT, or to JSONL through a server-side cursor.
+
+    python customer_io.py import partners.csv --workers 4
+    python customer_io.py export customers.jsonl --segment-id 3
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+
+from backend import (
+    get_db_connection, release_db_connection, bump_table_version, start_segment_rebuild, normalize_email,
+    STREAM_ITERSIZE
+)
+
+# Records per validation chunk and per COPY into the staging table
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "20000"))
+# Rejected rows kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# --- Validation (runs in worker processes) ---
+
+def validate_record(record):
+    """Returns (name, email, demographics_json) for a raw record or raises ValueError."""
+    if isinstance(record, str):
+        record = json.loads(record)
+        if not isinstance(record, dict):
+            raise ValueError("record is not a JSON object")
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    email = normalize_email(str(record.get("email") or ""))
+    if not EMAIL_PATTERN.match(email):
+        raise ValueError(f"invalid email {email!r}")
+    demographics = record.get("demographics")
+    if demographics is None or demographics == "":
+        demographics = {}
+    elif isinstance(demographics, str):
+        demographics = json.loads(demographics)
+    if not isinstance(demographics, dict):
+        raise ValueError("demographics must be a JSON object")
+    return name, email, json.dumps(demographics, separators=(",", ":"))
+
+def validate_chunk(chunk):
+    """Validates [(line_number, record)] and returns (valid rows, errors)."""
+    rows, errors = [], []
+    for line_number, record in chunk:
+        try:
+            rows.append((line_number, *validate_record(record)))
+        except (ValueError, RecursionError) as e:
+            # RecursionError: json.loads on absurdly nested input
+            errors.append((line_number, str(e)))
+    return rows, errors
+
+# --- Reading ---
+
+def read_records(path, fmt=None):
+    """Yields (line_number, record) lazily; JSONL records stay raw strings so workers parse them."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as stream:
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(stream, start=1):
+                if line.strip():
+                    yield line_number, line
+
+def _chunks(records, size):
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _validated_chunks(chunks, workers):
+    """Yields validate_chunk results in input order, keeping at most 2 * workers chunks in flight."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield validate_chunk(chunk)
+        return
+    # Spawned, not forked: the parent holds a checked-out connection with an open transaction
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(validate_chunk, chunk))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+# --- Import ---
+
+STAGING_SQL = """
+CREATE TEMPORARY TABLE customer_import (
+    line_number BIGINT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    demographics JSONB NOT NULL
+) ON COMMIT DROP;
+"""
+
+# The last occurrence of an email in the file wins
+UPSERT_SQL = """
+WITH upserted AS (
+    INSERT INTO customers (name, email, demographics)
+    SELECT DISTINCT ON (email) name, email, demographics
+    FROM customer_import
+    ORDER BY email, line_number DESC
+    ON CONFLICT (lower(email)) DO UPDATE
+        SET name = EXCLUDED.name, demographics = EXCLUDED.demographics
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM upserted;
+"""
+
+def import_customers(path, fmt=None, workers=None, batch_size=None):
+    """Imports a CSV/JSONL file of customers in one transaction and returns (success, message, stats).
+
+    stats holds rows read, valid, rejected, inserted, updated, duplicates,
+    seconds, rows_per_sec and the first MAX_REPORTED_ERRORS (line, reason) pairs.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    stats = {
+        "read": 0, "valid": 0, "rejected": 0, "inserted": 0, "updated": 0, "duplicates": 0,
+        "seconds": 0.0, "rows_per_sec": 0.0, "errors": [],
+    }
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed.", stats
+    started = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(STAGING_SQL)
+            chunks = _chunks(read_records(path, fmt), batch_size)
+            for rows, errors in _validated_chunks(chunks, workers):
+                stats["read"] += len(rows) + len(errors)
+                stats["valid"] += len(rows)
+                stats["rejected"] += len(errors)
+                room = MAX_REPORTED_ERRORS - len(stats["errors"])
+                stats["errors"].extend(errors[:max(room, 0)])
+                if rows:
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(rows)
+                    buffer.seek(0)
+                    cur.copy_expert(
+                        "COPY customer_import (line_number, name, email, demographics) FROM STDIN WITH (FORMAT csv);",
+                        buffer
+                    )
+            cur.execute("ANALYZE customer_import;")
+            cur.execute(UPSERT_SQL)
+            stats["inserted"], stats["updated"] = cur.fetchone()
+        conn.commit()
+        stats["duplicates"] = stats["valid"] - stats["inserted"] - stats["updated"]
+        bump_table_version("customers", "segment_members")
+        # Memberships of every imported customer may have changed
+        start_segment_rebuild()
+        return True, (
+            f"Imported {stats['valid']:,} of {stats['read']:,} rows: {stats['inserted']:,} new, "
+            f"{stats['updated']:,} updated, {stats['rejected']:,} rejected."
+        ), stats
+    except (psycopg2.Error, OSError, csv.Error, ValueError) as e:
+        # ValueError covers UnicodeDecodeError from a file that is not UTF-8
+        conn.rollback()
+        return False, f"Error importing customers: {e}", stats
+    finally:
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_sec"] = stats["read"] / stats["seconds"] if stats["seconds"] else 0.0
+        release_db_connection(conn)
+
+# --- Export ---
+
+def _export_query(segment_id):
+    sql = "SELECT id, name, email, demographics, created_at FROM customers"
+    if segment_id is not None:
+        sql += " WHERE id IN (SELECT customer_id FROM segment_members WHERE segment_id = %s)"
+    return sql + " ORDER BY id", ([segment_id] if segment_id is not None else [])
+
+def export_customers(path, fmt=None, segment_id=None):
+    """Streams customers (or one segment's members) to a CSV/JSONL file and returns (success, message, stats)."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    stats = {"rows": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+    conn = get_db_connection(read_only=True)
+    if conn is None:
+        return False, "Database connection failed.", stats
+    started = time.perf_counter()
+    try:
+        sql, params = _export_query(segment_id)
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            if fmt == "csv":
+                with conn.cursor() as cur:
+                    query = cur.mogrify(sql, params).decode()
+                    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+                    stats["rows"] = cur.rowcount
+            else:
+                with conn.cursor(name="export_customers") as cur:
+                    cur.itersize = STREAM_ITERSIZE
+                    cur.execute(sql, params)
+                    columns = None
+                    for row in cur:
+                        columns = columns or [column.name for column in cur.description]
+                        out.write(json.dumps(dict(zip(columns, row)), default=str) + "\n")
+                        stats["rows"] += 1
+        return True, f"Exported {stats['rows']:,} customers to {path}.", stats
+    except (psycopg2.Error, OSError) as e:
+        return False, f"Error exporting customers: {e}", stats
+    finally:
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        release_db_connection(conn)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export customers.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    import_parser = subcommands.add_parser("import", help="load a CSV/JSONL file of customers")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"))
+    import_parser.add_argument("--workers", type=int, help="validation processes (default: CPU count)")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    export_parser = subcommands.add_parser("export", help="write customers to a CSV/JSONL file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"))
+    export_parser.add_argument("--segment-id", type=int, help="only export this segment's members")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        success, message, stats = import_customers(args.path, args.format, args.workers, args.batch_size)
+        for line_number, reason in stats["errors"][:20]:
+            print(f"  line {line_number}: {reason}")
+    else:
+        success, message, stats = export_customers(args.path, args.format, args.segment_id)
+    rows = stats.get("read", stats.get("rows", 0))
+    print(f"{message} {rows:,} rows in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)")
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""Synthetic data generator for scale testing.
+
+Generates campaigns with their channel mixes, customers with demographics,
+segments, and daily sent/opened/clicked funnels (sent >= opened >= clicked).
+Each column is drawn with NumPy for a whole chunk at once and loaded with
+COPY, one chunk per transaction. Chunks are spread over a process pool, each
+worker with its own connection; campaigns and customers load first, then the
+performance rows that reference the campaigns.
+
+Id ranges are reserved up front by moving each table's sequence past them,
+so workers write explicit ids without colliding with each other or with the
+running app. Every chunk gets its own seed spawned from --seed, so a dataset
+is reproducible whatever the worker count.
+
+    python datagen.py --campaigns 100000 --customers 5000000 --days 90 --workers 8 --reset
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import psycopg2
+
+import backend
+import migrations
+
+CHANNELS = np.array(["Email", "Social Media", "Paid Ads", "Content Marketing", "SMS"])
+CITIES = np.array(["New York", "Austin", "Boston", "Chicago", "Denver", "Seattle", "Miami", "Portland"])
+TIERS = np.array(["free", "basic", "pro", "enterprise"])
+GENDERS = np.array(["female", "male", "other"])
+
+SEGMENT_CRITERIA = [
+    ("Young adults", '{"age": {"$gte": 18, "$lt": 30}}'),
+    ("New York", '{"city": "New York"}'),
+    ("Paying customers", '{"tier": ["basic", "pro", "enterprise"]}'),
+    ("Enterprise in Austin or Boston", '{"tier": "enterprise", "city": {"$in": ["Austin", "Boston"]}}'),
+    ("Seniors", '{"age": {"$gte": 65}}'),
+    ("Not free tier", '{"tier": {"$ne": "free"}}'),
+]
+
+# Rows per generated chunk and COPY; bounds each worker's memory use
+DATAGEN_CHUNK_ROWS = int(os.environ.get("DATAGEN_CHUNK_ROWS", "500000"))
+
+TRUNCATE_SQL = """
+TRUNCATE campaign_performance, campaign_performance_daily, campaign_channels, campaigns,
+         segment_members, segments, customers RESTART IDENTITY CASCADE;
+"""
+
+# --- Column generators ---
+
+def _join(*parts):
+    """Concatenates string arrays and scalars element-wise."""
+    result = np.asarray(parts[0]).astype(str).astype(object)
+    for part in parts[1:]:
+        result = result + np.asarray(part).astype(str).astype(object)
+    return result
+
+def campaign_columns(rng, first_id, count, today):
+    """Returns (ids, names, budgets, start dates, end dates, descriptions)."""
+    ids = np.arange(first_id, first_id + count)
+    starts = np.datetime64(today) - rng.integers(0, 365, count).astype("timedelta64[D]")
+    ends = starts + rng.integers(7, 120, count).astype("timedelta64[D]")
+    budgets = np.round(rng.lognormal(8.5, 1.0, count), 2)
+    return ids, _join("Campaign ", ids), budgets, starts, ends, _join("Synthetic campaign ", ids)
+
+def channel_columns(rng, campaign_ids):
+    """Gives every campaign 1-3 distinct channels; returns (campaign ids, channel names)."""
+    counts = rng.integers(1, 4, len(campaign_ids))
+    owners = np.repeat(campaign_ids, counts)
+    # Distinct channels per campaign: a random rotation of the channel list, truncated
+    offsets = np.repeat(rng.integers(0, len(CHANNELS), len(campaign_ids)), counts)
+    positions = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, CHANNELS[(offsets + positions) % len(CHANNELS)]
+
+def customer_columns(rng, first_id, count, now):
+    """Returns (ids, names, emails, demographics JSON, created_at)."""
+    ids = np.arange(first_id, first_id + count)
+    demographics = _join(
+        '{"age": ', rng.integers(18, 80, count),
+        ', "city": "', CITIES[rng.integers(0, len(CITIES), count)],
+        '", "tier": "', TIERS[rng.choice(len(TIERS), count, p=[0.55, 0.25, 0.15, 0.05])],
+        '", "gender": "', GENDERS[rng.integers(0, len(GENDERS), count)], '"}'
+    )
+    created = np.datetime64(now, "s") - rng.integers(0, 365 * 86400, count).astype("timedelta64[s]")
+    return ids, _join("Customer ", ids), _join("customer", ids, "@example.com"), demographics, created
+
+def performance_columns(rng, campaign_ids, days, end_day, samples_per_day=1):
+    """Sent/opened/clicked rows (sent >= opened >= clicked) for each campaign over `days` days.
+
+    Each day is split into `samples_per_day` rows at random times. Returns
+    (campaign ids, metric names, values, timestamps).
+    """
+    per_metric = len(campaign_ids) * days * samples_per_day
+    owners = np.repeat(campaign_ids, days * samples_per_day)
+    day_offsets = np.tile(np.repeat(np.arange(days), samples_per_day), len(campaign_ids))
+    timestamps = (
+        np.datetime64(end_day, "s")
+        - (day_offsets * 86400).astype("timedelta64[s]")
+        + rng.integers(0, 86400, per_metric).astype("timedelta64[s]")
+    )
+    sent = rng.poisson(rng.gamma(2.0, 500.0, len(campaign_ids)).repeat(days * samples_per_day) / samples_per_day)
+    opened = rng.binomial(sent, rng.uniform(0.1, 0.5, per_metric))
+    clicked = rng.binomial(opened, rng.uniform(0.02, 0.3, per_metric))
+    metrics = np.repeat(np.array(["emails_sent", "emails_opened", "emails_clicked"]), per_metric)
+    return (
+        np.tile(owners, 3), metrics, np.concatenate([sent, opened, clicked]), np.tile(timestamps, 3)
+    )
+
+# --- Loading ---
+
+def copy_columns(cur, table, columns, arrays):
+    """COPYs parallel column arrays into `table` in text format."""
+    buffer = io.StringIO()
+    lines = arrays[0].astype(str).astype(object)
+    for column in arrays[1:]:
+        lines = lines + "\t" + column.astype(str).astype(object)
+    buffer.write("\n".join(lines))
+    buffer.write("\n")
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN;", buffer)
+
+def reserve_ids(cur, table, count):
+    """Moves `table`'s id sequence past `count` new ids and returns the first of them.
+
+    Inserts into the table wait until the caller's transaction ends, so commit promptly.
+    """
+    cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE;")
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'id');", (table,))
+    sequence = cur.fetchone()[0]
+    cur.execute(f"SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {sequence};")
+    used = cur.fetchone()[0]
+    cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table};")
+    first = max(used, cur.fetchone()[0]) + 1
+    if count:
+        cur.execute("SELECT setval(%s, %s);", (sequence, first + count - 1))
+    return first
+
+def _load_campaigns(cur, rng, first_id, count, options):
+    ids, names, budgets, starts, ends, descriptions = campaign_columns(rng, first_id, count, options["today"])
+    copy_columns(cur, "campaigns", ("id", "name", "budget", "start_date", "end_date", "description"),
+                 (ids, names, budgets, starts, ends, descriptions))
+    owners, channels = channel_columns(rng, ids)
+    copy_columns(cur, "campaign_channels", ("campaign_id", "channel_name"), (owners, channels))
+    return {"campaigns": count, "campaign_channels": len(owners)}
+
+def _load_customers(cur, rng, first_id, count, options):
+    copy_columns(cur, "customers", ("id", "name", "email", "demographics", "created_at"),
+                 customer_columns(rng, first_id, count, options["now"]))
+    return {"customers": count}
+
+def _load_performance(cur, rng, first_id, count, options):
+    columns = performance_columns(
+        rng, np.arange(first_id, first_id + count), options["days"], options["end_day"], options["samples_per_day"]
+    )
+    copy_columns(cur, "campaign_performance", ("campaign_id", "metric_name", "value", "timestamp"), columns)
+    return {"campaign_performance": len(columns[0])}
+
+LOADERS = {
+    "campaigns": _load_campaigns,
+    "customers": _load_customers,
+    "performance": _load_performance,
+}
+
+def _load_chunk(task):
+    """Pool worker: generates one chunk and COPYs it in its own transaction; returns (rows per table, seconds)."""
+    kind, first_id, count, seed_sequence, options = task
+    started = time.perf_counter()
+    conn = backend.get_db_connection()
+    if conn is None:
+        raise RuntimeError("Database connection failed.")
+    try:
+        with conn.cursor() as cur:
+            rows = LOADERS[kind](cur, np.random.default_rng(seed_sequence), first_id, count, options)
+        conn.commit()
+        return rows, time.perf_counter() - started
+    except psycopg2.Error as e:
+        conn.rollback()
+        # psycopg2 errors do not survive pickling back to the parent
+        raise RuntimeError(f"Error loading {kind} {first_id}-{first_id + count - 1}: {e}") from None
+    finally:
+        backend.release_db_connection(conn)
+
+def _chunks(kind, first_id, total, per_chunk, options):
+    return [
+        (kind, first_id + offset, min(per_chunk, total - offset), None, options)
+        for offset in range(0, total, per_chunk)
+    ]
+
+def _run(tasks, pool, report):
+    """Runs a phase of chunk tasks and folds their row counts and worker seconds into `report`."""
+    results = pool.imap_unordered(_load_chunk, tasks) if pool is not None else map(_load_chunk, tasks)
+    for rows, seconds in results:
+        for table, count in rows.items():
+            report.setdefault(table, {"rows": 0, "seconds": 0.0})["rows"] += count
+        # Time is charged to the chunk's main table, listed first
+        report[next(iter(rows))]["seconds"] += seconds
+
+def generate(campaigns=1000, customers=10000, days=30, samples_per_day=1, segments=True, reset=False,
+             seed_value=0, workers=None, chunk_rows=None):
+    """Generates and COPYs a synthetic dataset; returns {table: {"rows", "seconds"}}.
+
+    Seconds are summed over workers, except "total", which is wall-clock time.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_rows = chunk_rows or DATAGEN_CHUNK_ROWS
+    today, now = date.today(), datetime.now().replace(microsecond=0)
+    options = {
+        "today": today, "now": now, "days": days, "samples_per_day": samples_per_day,
+        "end_day": datetime.combine(today, datetime.min.time()),
+    }
+    started = time.perf_counter()
+    report = {}
+
+    conn = backend.get_db_connection()
+    if conn is None:
+        raise RuntimeError("Database connection failed.")
+    try:
+        with conn.cursor() as cur:
+            if reset:
+                cur.execute(TRUNCATE_SQL)
+            migrations.ensure_performance_partitions(cur, today - timedelta(days=days), today)
+            first_campaign = reserve_ids(cur, "campaigns", campaigns)
+            first_customer = reserve_ids(cur, "customers", customers)
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        backend.release_db_connection(conn)
+
+    per_campaign_rows = 3 * max(days, 1) * samples_per_day
+    phases = [
+        _chunks("campaigns", first_campaign, campaigns, chunk_rows, options)
+        + _chunks("customers", first_customer, customers, chunk_rows, options),
+        # Performance rows reference the campaigns, so they load once those have committed
+        _chunks("performance", first_campaign, campaigns, max(1, chunk_rows // per_campaign_rows), options),
+    ]
+    seeds = iter(np.random.SeedSequence(seed_value).spawn(sum(len(tasks) for tasks in phases)))
+    phases = [[(kind, first, count, next(seeds), opts) for kind, first, count, _, opts in tasks] for tasks in phases]
+
+    # spawn rather than fork, so workers never share the parent's pooled connections
+    pool = multiprocessing.get_context("spawn").Pool(workers) if workers > 1 else None
+    try:
+        for tasks in phases:
+            _run(tasks, pool, report)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    conn = backend.get_db_connection()
+    if conn is None:
+        raise RuntimeError("Database connection failed.")
+    try:
+        with conn.cursor() as cur:
+            if segments:
+                segment_started = time.perf_counter()
+                for name, criteria in SEGMENT_CRITERIA:
+                    cur.execute("INSERT INTO segments (segment_name, criteria) VALUES (%s, %s);", (name, criteria))
+                report["segments"] = {"rows": len(SEGMENT_CRITERIA), "seconds": time.perf_counter() - segment_started}
+        conn.commit()
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE;")
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        backend.release_db_connection(conn)
+    if segments:
+        segment_started = time.perf_counter()
+        backend.rebuild_segment_members()
+        report["segment_members"] = {"seconds": time.perf_counter() - segment_started}
+    backend.bump_table_version(
+        "campaigns", "customers", "segments", "segment_members", "campaign_performance"
+    )
+    report["total"] = {"seconds": time.perf_counter() - started}
+    return report
+
+def print_report(report):
+    for table, stats in report.items():
+        rows = f"{stats['rows']:>14,} rows" if "rows" in stats else " " * 19
+        print(f"{table:<22}{rows}  {stats['seconds']:9.2f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset into the configured database.")
+    parser.add_argument("--campaigns", type=int, default=1000)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30, help="days of performance history per campaign")
+    parser.add_argument("--samples-per-day", type=int, default=1, help="performance rows per metric per day")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="rows per generated chunk")
+    parser.add_argument("--no-segments", action="store_true")
+    parser.add_argument("--reset", action="store_true", help="truncate every backend table first")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print_report(generate(
+        args.campaigns, args.customers, args.days, args.samples_per_day, not args.no_segments, args.reset,
+        args.seed, args.workers, args.chunk_rows
+    ))
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,170 @@
+import functools
+import json
+import logging
+import os
+import sys
+from datetime import date, datetime, timedelta
+
 import streamlit as st
-import pandas as pd
-from datetime import date
-from backend_fin import (
-    create_campaign, read_campaigns, update_campaign, delete_campaign,
-    create_customer, read_customers, update_customer, delete_customer,
-    create_segment, read_segments, delete_segment,
-    add_performance_data, get_performance_data_by_campaign,
-    get_total_campaign_count, get_total_customers_count,
-    get_avg_campaign_budget, get_max_campaign_budget, get_min_campaign_budget,
-    get_total_emails_sent
-)
-import random
+
+import startup_profile
+
+# pandas, the backend and their dependencies are imported by the page that needs them,
+# so a fresh process renders its first page without loading every page's modules
 
 # Set Streamlit page configuration
 st.set_page_config(layout="wide", page_title="Marketing Campaign Manager")
 
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+# The Diagnostics page is hidden unless MARK_DIAGNOSTICS=1
+SHOW_DIAGNOSTICS = os.environ.get("MARK_DIAGNOSTICS") == "1"
+# Serve Prometheus metrics at :<port>/metrics when set
+METRICS_PORT = os.environ.get("MARK_METRICS_PORT")
+if METRICS_PORT:
+    with startup_profile.imports():
+        import instrumentation
+        from backend import get_prometheus_metrics
+    instrumentation.start_metrics_server(int(METRICS_PORT), get_prometheus_metrics)
+# Page shown when a session starts
+DEFAULT_PAGE = os.environ.get("MARK_DEFAULT_PAGE", "Campaigns")
+# Import every page's dependencies in the background after the first render; 0 disables
+PRELOAD = os.environ.get("MARK_PRELOAD", "1") != "0"
+PRELOAD_MODULES = ("pandas", "backend", "query_cache", "analytics", "live_metrics", "instrumentation")
+
+# st.experimental_rerun was removed in the Streamlit releases that ship st.fragment
+rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+def uses_session_token(page):
+    """Page decorator carrying the WAL position of the session's writes across reruns, so replica reads see them."""
+    @functools.wraps(page)
+    def render_page():
+        with startup_profile.imports():
+            import backend
+        backend.set_session_token(st.session_state.get("db_session_token"))
+        try:
+            page()
+        finally:
+            # Also runs when the page reruns itself right after a write
+            st.session_state["db_session_token"] = backend.get_session_token()
+    return render_page
+
+def paginate(key, fetch_page):
+    """Renders Previous/Next controls for a keyset-paginated read and returns the current page's rows."""
+    # One `after` key per visited page; the last entry is the page being shown
+    page_keys = st.session_state.setdefault(key, [None])
+    rows, next_key = fetch_page(page_keys[-1])
+    col_prev, col_page, col_next = st.columns([1, 4, 1])
+    with col_prev:
+        if st.button("Previous", key=f"{key}_prev", disabled=len(page_keys) == 1):
+            page_keys.pop()
+            rerun()
+    with col_page:
+        st.caption(f"Page {len(page_keys)}")
+    with col_next:
+        if st.button("Next", key=f"{key}_next", disabled=next_key is None):
+            page_keys.append(next_key)
+            rerun()
+    return rows
+
+def select_rows(df, label, key):
+    """Multi-select over a page of rows; returns {id: version} for the chosen rows."""
+    names = df.set_index('id')['name']
+    chosen = st.multiselect(label, df['id'].tolist(), key=key, format_func=lambda row_id: f"{row_id}: {names[row_id]}")
+    versions = df.set_index('id')['version'] if 'version' in df else None
+    return {int(row_id): (int(versions[row_id]) if versions is not None else None) for row_id in chosen}
+
+def _render_bulk_result(success, message, conflicts):
+    (st.success if success else st.error)(message)
+    if conflicts:
+        st.warning(f"Changed by someone else since this page loaded: {', '.join(map(str, conflicts))}")
+
+def show_bulk_result(key, success, message, result):
+    """Reports a bulk update/delete; when something changed, keeps the report for pending_bulk_result and reruns."""
+    if success and result["affected"]:
+        st.session_state[f"{key}_result"] = (success, message, result["conflicts"])
+        rerun()
+    _render_bulk_result(success, message, result["conflicts"])
+
+def pending_bulk_result(key):
+    """Shows, once, the report a bulk action under `key` kept before rerunning the page."""
+    report = st.session_state.pop(f"{key}_result", None)
+    if report is not None:
+        _render_bulk_result(*report)
+
+# Seconds between live dashboard refreshes; they read in-memory totals, not the database
+LIVE_REFRESH_SECONDS = float(os.environ.get("LIVE_REFRESH_SECONDS", "2"))
+live_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+if live_fragment is None:
+    live_fragment = lambda run_every=None: (lambda function: function)
+
+@live_fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_performance_totals(campaign_id):
+    """Shows a campaign's totals from the NOTIFY listener, with the change since the previous refresh."""
+    import pandas as pd
+    import psycopg2
+    from live_metrics import get_listener
+    from query_cache import get_performance_totals_by_campaign
+
+    listener = get_listener()
+    deltas = {}
+    totals = None
+    if listener is not None:
+        version_key = f"live_version_{campaign_id}"
+        try:
+            if version_key in st.session_state:
+                totals, version, deltas = listener.changes_since(campaign_id, st.session_state[version_key])
+            else:
+                totals, version = listener.get_totals(campaign_id)
+            st.session_state[version_key] = version
+        except psycopg2.Error:
+            # Listener not connected yet; the caption below reports it
+            st.session_state.pop(version_key, None)
+        deltas = deltas or {}
+    if totals is None:
+        # Notifications not installed (migration 6) or not connected; fall back to the cached rollup read
+        totals = get_performance_totals_by_campaign(campaign_id)
+    if not totals:
+        st.info("No performance data available for this campaign. Generate some using the sidebar.")
+        return
+
+    sent, opened, clicked = st.columns(3)
+    for column, label, metric_name in (
+        (sent, "Emails Sent", "emails_sent"),
+        (opened, "Emails Opened", "emails_opened"),
+        (clicked, "Emails Clicked", "emails_clicked"),
+    ):
+        with column:
+            delta = deltas.get(metric_name)
+            st.metric(label, f"{totals.get(metric_name, 0):,}", delta=f"{delta:+,}" if delta else None)
+
+    df_performance = pd.DataFrame({'metric_name': list(totals), 'value': [float(v) for v in totals.values()]})
+    df_performance['metric_name'] = df_performance['metric_name'].str.replace('_', ' ').str.title()
+    st.bar_chart(df_performance, x='metric_name', y='value')
+    if listener is not None:
+        st.caption("Live" if listener.connected else "Reconnecting to live updates...")
+
 st.title("Marketing Campaign Manager")
 st.write("Plan, execute, and track your marketing campaigns.")
 
 # --- Sidebar Navigation ---
 st.sidebar.title("Navigation")
-page = st.sidebar.radio(
-    "Go to",
-    ("Campaigns", "Customers", "Segments", "Performance Dashboard", "Business Insights")
-)
+pages = ["Campaigns", "Customers", "Segments", "Performance Dashboard", "Business Insights"]
+if SHOW_DIAGNOSTICS:
+    pages.append("Diagnostics")
+page = st.sidebar.radio("Go to", pages, index=pages.index(DEFAULT_PAGE) if DEFAULT_PAGE in pages else 0)
 
 # --- Campaign Management Section ---
-if page == "Campaigns":
+@uses_session_token
+def campaigns_page():
+    with startup_profile.imports():
+        import pandas as pd
+        from backend import (
+            create_campaign, bulk_create_campaigns, update_campaign, delete_campaign,
+            bulk_update_campaigns, bulk_delete_campaigns
+        )
+        from query_cache import read_campaigns_page
+
     st.header("Campaign Management")
 
     with st.expander("Create a New Campaign"):
@@ -56,13 +194,60 @@ if page == "Campaigns":
                 else:
                     st.warning("Please fill in all required fields.")
 
+    with st.expander("Import Campaigns from CSV"):
+        st.caption(
+            "Columns: name, budget, start_date, end_date, description, channels "
+            "(separate multiple channels with ';')."
+        )
+        uploaded_file = st.file_uploader("Import CSV", type="csv")
+        if uploaded_file is not None and st.button("Import Campaigns"):
+            df_import = pd.read_csv(uploaded_file)
+            df_import = df_import.astype(object).where(df_import.notna(), None)
+            success, message, errors = bulk_create_campaigns(df_import.to_dict("records"))
+            if success:
+                st.success(message)
+            else:
+                st.error(message)
+            if errors:
+                st.warning(f"{len(errors)} row(s) were skipped.")
+                st.dataframe(pd.DataFrame(errors, columns=["Row", "Error"]), use_container_width=True)
+
     st.subheader("Existing Campaigns")
-    campaigns_data = read_campaigns()
+    channel_filter = st.selectbox(
+        "Filter by channel",
+        ["All Channels", "Email", "Social Media", "Paid Ads", "Content Marketing", "SMS"]
+    )
+    channel = None if channel_filter == "All Channels" else channel_filter
+    campaigns_data = paginate(
+        f"campaign_pages_{channel_filter}",
+        lambda after: read_campaigns_page(after=after, channel=channel)
+    )
     df_campaigns = pd.DataFrame(campaigns_data)
+    pending_bulk_result("bulk_campaigns")
 
     if not df_campaigns.empty:
         st.dataframe(df_campaigns, use_container_width=True)
 
+        with st.expander("Bulk Actions"):
+            selected = select_rows(df_campaigns, "Campaigns on this page", "bulk_campaigns")
+            # Rows edited since this page was read are skipped and reported as conflicts
+            versions = {row_id: version for row_id, version in selected.items() if version is not None}
+            col_budget, col_end = st.columns(2)
+            with col_budget:
+                bulk_budget = st.number_input("New budget ($)", min_value=0.0, format="%.2f", key="bulk_budget")
+                if st.button("Set budget", disabled=not selected):
+                    show_bulk_result("bulk_campaigns", *bulk_update_campaigns(
+                        {"budget": bulk_budget}, ids=list(selected), expected_versions=versions
+                    ))
+            with col_end:
+                bulk_end_date = st.date_input("New end date", key="bulk_end_date")
+                if st.button("Set end date", disabled=not selected):
+                    show_bulk_result("bulk_campaigns", *bulk_update_campaigns(
+                        {"end_date": bulk_end_date}, ids=list(selected), expected_versions=versions
+                    ))
+            if st.button(f"Delete {len(selected)} selected campaign(s)", disabled=not selected):
+                show_bulk_result("bulk_campaigns", *bulk_delete_campaigns(ids=list(selected), expected_versions=versions))
+
         selected_campaign = st.selectbox("Select a campaign to update or delete:", df_campaigns['name'], index=0)
         selected_row = df_campaigns[df_campaigns['name'] == selected_campaign].iloc[0]
 
@@ -83,7 +268,7 @@ if page == "Campaigns":
                     )
                     if success:
                         st.success(message)
-                        st.experimental_rerun()
+                        rerun()
                     else:
                         st.error(message)
 
@@ -92,28 +277,34 @@ if page == "Campaigns":
                     success, message = delete_campaign(selected_row['id'])
                     if success:
                         st.success(message)
-                        st.experimental_rerun()
+                        rerun()
                     else:
                         st.error(message)
     else:
         st.info("No campaigns found. Create one to get started!")
 
 # --- Customer Management Section ---
-elif page == "Customers":
+@uses_session_token
+def customers_page():
+    with startup_profile.imports():
+        import pandas as pd
+        from backend import create_customer, bulk_update_customers, bulk_delete_customers
+        from query_cache import read_customers_page
+
     st.header("Customer Management")
     with st.expander("Add New Customer"):
         with st.form("new_customer_form"):
             name = st.text_input("Full Name")
             email = st.text_input("Email")
             demographics = st.text_area(
-                "Demographics (e.g., {'city': 'New York', 'age': 30})",
+                'Demographics (e.g., {"city": "New York", "age": 30})',
                 "{}", help="Enter customer demographics as a JSON string."
             )
             submit_button = st.form_submit_button("Add Customer")
 
             if submit_button:
                 try:
-                    demographics_json = eval(demographics)
+                    demographics_json = json.loads(demographics)
                     if not isinstance(demographics_json, dict):
                         raise ValueError
                     success, message = create_customer(name, email, demographics_json)
@@ -125,28 +316,56 @@ elif page == "Customers":
                     st.error("Invalid demographics format. Please use a valid JSON dictionary.")
 
     st.subheader("Customer Database")
-    customers_data = read_customers()
+    customers_data = paginate("customer_pages", lambda after: read_customers_page(after=after))
+    pending_bulk_result("bulk_customers")
     if customers_data:
         df_customers = pd.DataFrame(customers_data)
         st.dataframe(df_customers, use_container_width=True)
+
+        with st.expander("Bulk Actions"):
+            selected = select_rows(df_customers, "Customers on this page", "bulk_customers")
+            versions = {row_id: version for row_id, version in selected.items() if version is not None}
+            bulk_demographics = st.text_area(
+                "New demographics for the selected customers (JSON, replaces the current value)",
+                '{"age": 30, "city": "New York"}', key="bulk_demographics"
+            )
+            if st.button("Set demographics", disabled=not selected):
+                try:
+                    demographics_json = json.loads(bulk_demographics)
+                    if not isinstance(demographics_json, dict):
+                        raise ValueError
+                except ValueError:
+                    st.error("Invalid demographics format. Please use a valid JSON dictionary.")
+                else:
+                    show_bulk_result("bulk_customers", *bulk_update_customers(
+                        {"demographics": demographics_json}, ids=list(selected), expected_versions=versions
+                    ))
+            if st.button(f"Delete {len(selected)} selected customer(s)", disabled=not selected):
+                show_bulk_result("bulk_customers", *bulk_delete_customers(ids=list(selected), expected_versions=versions))
     else:
         st.info("No customers found.")
 
 # --- Segments Section ---
-elif page == "Segments":
+@uses_session_token
+def segments_page():
+    with startup_profile.imports():
+        import pandas as pd
+        from backend import create_segment, delete_segment, start_segment_rebuild
+        from query_cache import read_segments, count_segment_members
+
     st.header("Customer Segmentation")
     with st.expander("Create a New Segment"):
         with st.form("new_segment_form"):
             segment_name = st.text_input("Segment Name")
             criteria = st.text_area(
-                "Dynamic Criteria (e.g., {'city': 'New York', 'purchase_history': 'last_6_months'})",
+                'Dynamic Criteria (e.g., {"city": "New York", "age": {"$gte": 18}})',
                 "{}", help="Define the criteria for this segment as a JSON string."
             )
             submit_button = st.form_submit_button("Create Segment")
 
             if submit_button:
                 try:
-                    criteria_json = eval(criteria)
+                    criteria_json = json.loads(criteria)
                     if not isinstance(criteria_json, dict):
                         raise ValueError
                     success, message = create_segment(segment_name, criteria_json)
@@ -165,25 +384,38 @@ elif page == "Segments":
 
         selected_segment = st.selectbox("Select a segment to delete:", df_segments['segment_name'], index=0)
         selected_row = df_segments[df_segments['segment_name'] == selected_segment].iloc[0]
+        col_members, col_live = st.columns(2)
+        with col_members:
+            st.metric("Members", f"{int(selected_row['member_count']):,}")
+        with col_live:
+            st.metric("Matching Customers (live)", f"{count_segment_members(int(selected_row['id'])):,}")
+        if st.button("Rebuild Segment Membership"):
+            start_segment_rebuild()
+            st.info("Rebuilding membership for all segments in the background.")
         if st.button(f"Delete '{selected_segment}'"):
             success, message = delete_segment(selected_row['id'])
             if success:
                 st.success(message)
-                st.experimental_rerun()
+                rerun()
             else:
                 st.error(message)
     else:
         st.info("No segments found.")
 
 # --- Performance Dashboard Section ---
-elif page == "Performance Dashboard":
+@uses_session_token
+def performance_dashboard_page():
+    with startup_profile.imports():
+        import random
+        from backend import ingest_performance_events, choose_series_bucket
+        from query_cache import read_campaigns, get_performance_series
+
     st.header("Real-Time Performance Dashboard")
 
-    campaigns_data = read_campaigns()
-    if not campaigns_data:
+    df_campaigns = read_campaigns(fmt="frame")
+    if df_campaigns.empty:
         st.info("No campaigns to track. Please create a campaign first.")
     else:
-        df_campaigns = pd.DataFrame(campaigns_data)
         campaign_names = df_campaigns['name'].tolist()
         selected_campaign_name = st.selectbox("Select a campaign to view performance:", campaign_names)
         
@@ -196,61 +428,223 @@ elif page == "Performance Dashboard":
             emails_opened = random.randint(emails_sent // 5, emails_sent // 2)
             emails_clicked = random.randint(emails_opened // 5, emails_opened // 2)
 
-            add_performance_data(selected_campaign_id, 'emails_sent', emails_sent)
-            add_performance_data(selected_campaign_id, 'emails_opened', emails_opened)
-            add_performance_data(selected_campaign_id, 'emails_clicked', emails_clicked)
+            ingest_performance_events([
+                (selected_campaign_id, 'emails_sent', emails_sent, None),
+                (selected_campaign_id, 'emails_opened', emails_opened, None),
+                (selected_campaign_id, 'emails_clicked', emails_clicked, None),
+            ])
             st.success("Mock performance data generated!")
-            st.experimental_rerun()
+            rerun()
 
         # Display Performance Metrics
-        performance_data = get_performance_data_by_campaign(selected_campaign_id)
-        if performance_data:
-            df_performance = pd.DataFrame(performance_data)
-            df_performance['metric_name'] = df_performance['metric_name'].str.replace('_', ' ').str.title()
-            
-            # Use columns to display key metrics
-            sent, opened, clicked = st.columns(3)
-            with sent:
-                sent_value = df_performance[df_performance['metric_name'] == 'Emails Sent']['value'].sum()
-                st.metric("Emails Sent", f"{sent_value:,}")
-            with opened:
-                opened_value = df_performance[df_performance['metric_name'] == 'Emails Opened']['value'].sum()
-                st.metric("Emails Opened", f"{opened_value:,}")
-            with clicked:
-                clicked_value = df_performance[df_performance['metric_name'] == 'Emails Clicked']['value'].sum()
-                st.metric("Emails Clicked", f"{clicked_value:,}")
-
-            # Visualize performance trends
-            st.subheader("Performance Trends")
-            st.line_chart(df_performance.pivot_table(index='metric_name', values='value', aggfunc='sum'))
-            st.bar_chart(df_performance, x='metric_name', y='value')
-        else:
-            st.info("No performance data available for this campaign. Generate some using the sidebar.")
+        live_performance_totals(int(selected_campaign_id))
+
+        # Visualize performance trends
+        st.subheader("Performance Trends")
+        date_range = st.date_input(
+            "Date range", value=(date.today() - timedelta(days=30), date.today())
+        )
+        if isinstance(date_range, (tuple, list)) and len(date_range) == 2:
+            range_start = datetime.combine(date_range[0], datetime.min.time())
+            range_end = datetime.combine(date_range[1] + timedelta(days=1), datetime.min.time())
+            df_series = get_performance_series(
+                int(selected_campaign_id), start=range_start, end=range_end, fmt="frame"
+            )
+            if not df_series.empty:
+                st.caption(f"Aggregated per {choose_series_bucket(range_start, range_end)}.")
+                st.line_chart(df_series.pivot_table(index='bucket', columns='metric_name', values='value', aggfunc='sum'))
+            else:
+                st.info("No performance data in the selected date range.")
 
 # --- Business Insights Section ---
-elif page == "Business Insights":
+@uses_session_token
+def business_insights_page():
+    with startup_profile.imports():
+        import pandas as pd
+        from backend import get_insights_snapshot
+        from query_cache import get_campaign_leaderboard
+
     st.header("Business Insights")
     st.write("Leveraging data to provide key business insights.")
 
+    insights = get_insights_snapshot()
+
     col1, col2, col3 = st.columns(3)
     with col1:
-        total_campaigns = get_total_campaign_count()
-        st.metric("Total Campaigns", total_campaigns)
+        st.metric("Total Campaigns", insights["total_campaigns"])
     with col2:
-        total_customers = get_total_customers_count()
-        st.metric("Total Customers", total_customers)
+        st.metric("Total Customers", insights["total_customers"])
     with col3:
-        total_emails_sent = get_total_emails_sent()
-        st.metric("Total Emails Sent", f"{total_emails_sent:,}")
+        st.metric("Total Emails Sent", f"{insights['total_emails_sent']:,}")
 
     st.subheader("Campaign Budget Analysis")
     col4, col5, col6 = st.columns(3)
     with col4:
-        avg_budget = get_avg_campaign_budget()
-        st.metric("Avg. Campaign Budget", f"${avg_budget:,.2f}")
+        st.metric("Avg. Campaign Budget", f"${insights['avg_budget']:,.2f}")
     with col5:
-        max_budget = get_max_campaign_budget()
-        st.metric("Max Campaign Budget", f"${max_budget:,.2f}")
+        st.metric("Max Campaign Budget", f"${insights['max_budget']:,.2f}")
     with col6:
-        min_budget = get_min_campaign_budget()
-        st.metric("Min Campaign Budget", f"${min_budget:,.2f}")
+        st.metric("Min Campaign Budget", f"${insights['min_budget']:,.2f}")
+
+    st.subheader("Campaign Leaderboard")
+    leaderboard_metrics = {
+        "Click-Through Rate": "click_through_rate",
+        "Open Rate": "open_rate",
+        "Click-to-Open Rate": "click_to_open_rate",
+        "Cost per Click": "cost_per_click",
+        "Budget Burn Rate": "burn_rate",
+        "Clicks": "clicked",
+    }
+    col7, col8, col9 = st.columns(3)
+    with col7:
+        rank_by = st.selectbox("Rank By", list(leaderboard_metrics))
+    with col8:
+        top_n = st.number_input("Top", min_value=5, max_value=500, value=20, step=5)
+    with col9:
+        min_sent = st.number_input("Min. Emails Sent", min_value=0, value=100, step=100)
+    leaderboard = get_campaign_leaderboard(leaderboard_metrics[rank_by], int(top_n), int(min_sent))
+    if leaderboard and len(leaderboard["id"]):
+        df_leaderboard = pd.DataFrame({
+            "Rank": leaderboard["rank"],
+            "Campaign": leaderboard["name"],
+            "Sent": leaderboard["sent"].astype(int),
+            "Open Rate": leaderboard["open_rate"],
+            "CTR": leaderboard["click_through_rate"],
+            "Click-to-Open": leaderboard["click_to_open_rate"],
+            "Cost per Click": leaderboard["cost_per_click"],
+            "Budget Burn": leaderboard["burn_rate"],
+            "Budget": leaderboard["budget"],
+        })
+        st.dataframe(
+            df_leaderboard.style.format({
+                "Sent": "{:,}", "Open Rate": "{:.1%}", "CTR": "{:.2%}", "Click-to-Open": "{:.1%}",
+                "Cost per Click": "${:,.2f}", "Budget Burn": "{:.0%}", "Budget": "${:,.2f}",
+            }, na_rep="-"),
+            hide_index=True,
+        )
+        st.caption("Cost per click uses budget spent to date assuming even pacing over the campaign's dates.")
+    else:
+        st.info("No campaigns with enough performance data to rank yet.")
+
+# --- Diagnostics Section ---
+def diagnostics_page():
+    with startup_profile.imports():
+        import pandas as pd
+        import instrumentation
+        from backend import get_pool_stats, get_prometheus_metrics
+
+    st.header("Diagnostics")
+    st.write("Query counts and timings per backend function since this server process started.")
+
+    pool_stats = get_pool_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Connections In Use", pool_stats.get("in_use", 0))
+    with col2:
+        st.metric("Checkouts", f"{pool_stats.get('checkouts', 0):,}")
+    with col3:
+        st.metric("Avg. Wait (ms)", f"{pool_stats.get('wait_time_avg', 0.0) * 1000:,.2f}")
+    with col4:
+        st.metric("Pool Timeouts", pool_stats.get("timeouts", 0))
+
+    if pool_stats.get("replicas"):
+        routing = pool_stats["routing"]
+        st.subheader("Read Replicas")
+        st.write(
+            f"Replica reads: {routing['replica_reads']:,} · primary reads: {routing['primary_reads']:,} · "
+            f"writes: {routing['writes']:,} · read-your-writes fallbacks: {routing['lsn_fallbacks']:,}"
+        )
+        st.dataframe(pd.DataFrame([
+            {
+                "Replica": name,
+                "Reads": stats["reads"],
+                "In Use": stats.get("in_use", 0),
+                "Errors": stats["errors"],
+                "Status": "skipped" if stats["down"] else "up",
+            }
+            for name, stats in pool_stats["replicas"].items()
+        ]), use_container_width=True)
+
+    st.subheader("Backend Functions")
+    function_stats = instrumentation.get_function_stats()
+    if function_stats:
+        df_functions = pd.DataFrame([
+            {
+                "Function": name,
+                "Calls": stats["calls"],
+                "Round Trips / Call": stats["round_trips_per_call"],
+                "Connect (ms avg)": stats["connect_ms_avg"],
+                "Query (ms avg)": stats["query_ms_avg"],
+                "Rows": stats["rows"],
+                "Errors": stats["errors"],
+            }
+            for name, stats in function_stats.items()
+        ]).sort_values("Calls", ascending=False)
+        st.dataframe(df_functions, hide_index=True)
+    else:
+        st.info("No backend calls recorded yet.")
+
+    st.subheader("Queries by Total Time")
+    query_stats = instrumentation.get_query_stats()[:50]
+    if query_stats:
+        df_queries = pd.DataFrame(query_stats)[
+            ["function", "query_id", "executions", "ms_avg", "max_seconds", "rows", "slow", "errors", "fingerprint"]
+        ]
+        st.dataframe(df_queries, hide_index=True)
+
+    st.subheader(f"Slow Queries (over {instrumentation.SLOW_QUERY_MS:g} ms)")
+    slow_queries = instrumentation.get_slow_queries()
+    if slow_queries:
+        st.dataframe(pd.DataFrame(slow_queries), hide_index=True)
+    else:
+        st.info("No slow queries recorded.")
+
+    with st.expander("Prometheus Metrics"):
+        metrics_text = get_prometheus_metrics()
+        st.code(metrics_text, language="text")
+        st.download_button("Download metrics.txt", metrics_text, file_name="metrics.txt")
+    st.subheader("Startup")
+    startup = startup_profile.get_report()
+    if startup["first_render"]:
+        st.caption(
+            f"First render ({startup['first_render']['page']}) finished "
+            f"{startup['first_render']['seconds_since_start']:.2f}s after the app was first loaded."
+        )
+    st.dataframe(pd.DataFrame([
+        {
+            "Page": name,
+            "Renders": stats["renders"],
+            "First Render (s)": stats["first_render_seconds"],
+            "Last Render (s)": stats["last_render_seconds"],
+            "Imports (s)": stats["import_seconds"],
+            "Modules Loaded": ", ".join(stats["modules"]),
+        }
+        for name, stats in startup["pages"].items()
+    ]), hide_index=True)
+
+    if st.button("Reset Counters"):
+        instrumentation.reset_stats()
+        rerun()
+
+PAGES = {
+    "Campaigns": campaigns_page,
+    "Customers": customers_page,
+    "Segments": segments_page,
+    "Performance Dashboard": performance_dashboard_page,
+    "Business Insights": business_insights_page,
+    "Diagnostics": diagnostics_page,
+}
+
+with startup_profile.render(page):
+    PAGES[page]()
+if PRELOAD:
+    startup_profile.preload(PRELOAD_MODULES)
+
+# Shown once a page has loaded the cache; importing it here would defeat the lazy imports
+query_cache = sys.modules.get("query_cache")
+if query_cache is not None:
+    cache_stats = query_cache.get_cache_stats()
+    st.sidebar.caption(
+        f"Query cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+        f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1024:,.0f} KiB"
+    )
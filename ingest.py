@@ -0,0 +1,75 @@
+"""Command-line ingestion of performance events from JSONL or CSV files.
+
+Each record needs campaign_id, metric_name and value; timestamp is optional.
+Files are read lazily and streamed through backend.ingest_performance_events,
+so memory use does not grow with file size.
+
+    python ingest.py events.jsonl clicks.csv --batch-size 100000
+    cat events.jsonl | python ingest.py - --format jsonl
+"""
+import argparse
+import csv
+import json
+import sys
+
+from backend import INGEST_BATCH_SIZE, ingest_performance_events
+
+def _event_from_record(record, line_number):
+    """Returns an event tuple for a parsed record or raw JSON line; raises ValueError naming the line."""
+    try:
+        if isinstance(record, str):
+            record = json.loads(record)
+        return (
+            int(record["campaign_id"]),
+            record["metric_name"],
+            float(record["value"]),
+            record.get("timestamp") or None,
+        )
+    except KeyError as e:
+        raise ValueError(f"line {line_number}: record is missing field {e}")
+    except (TypeError, ValueError) as e:
+        # null or non-object records, non-numeric ids or values, malformed JSON
+        raise ValueError(f"line {line_number}: invalid record: {e}")
+
+def read_jsonl_events(stream):
+    """Yields event tuples from a JSON-lines stream, skipping blank lines."""
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield _event_from_record(line, line_number)
+
+def read_csv_events(stream):
+    """Yields event tuples from a CSV stream with a header row."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield _event_from_record(record, reader.line_num)
+
+def read_events(path, fmt=None):
+    """Yields event tuples from a file path ('-' for stdin), detecting the format from its extension."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    reader = read_csv_events if fmt == "csv" else read_jsonl_events
+    if path == "-":
+        yield from reader(sys.stdin)
+        return
+    with open(path, newline="", encoding="utf-8") as stream:
+        yield from reader(stream)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest performance events into campaign_performance.")
+    parser.add_argument("paths", nargs="+", help="JSONL or CSV files, or '-' for stdin")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="override format detection")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="rows per COPY batch")
+    args = parser.parse_args(argv)
+
+    exit_code = 0
+    for path in args.paths:
+        success, message, stats = ingest_performance_events(read_events(path, args.format), args.batch_size)
+        print(
+            f"{path}: {message} {stats['batches']} batches in {stats['seconds']:.2f}s "
+            f"({stats['rows_per_sec']:,.0f} rows/sec)"
+        )
+        if not success:
+            exit_code = 1
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""Per-call query instrumentation for pooled backend connections.
+
+backend.get_pool() opens connections with InstrumentedConnection, whose
+cursors (whatever their cursor_factory) time every execute, executemany and
+COPY. backend.get_db_connection() tags each checkout with the calling
+function and the time spent waiting for the connection, and
+release_db_connection() closes the logical call, so counters are kept both
+per function (calls, round trips, connect vs query time) and per SQL
+fingerprint within a function (executions, time, rows).
+
+Statements slower than SLOW_QUERY_MS are logged as one JSON object per line
+on the "mark.slow_queries" logger and kept in a short in-memory history.
+render_prometheus() returns every counter in the Prometheus text format and
+start_metrics_server() serves it over HTTP.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from psycopg2 import extensions
+
+# Statements slower than this are written to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "250"))
+# Distinct (function, fingerprint) pairs tracked before new ones are lumped together
+MAX_TRACKED_QUERIES = int(os.environ.get("MAX_TRACKED_QUERIES", "500"))
+# Slow queries kept for the diagnostics page
+SLOW_QUERY_HISTORY = 50
+
+slow_query_logger = logging.getLogger("mark.slow_queries")
+
+_lock = threading.Lock()
+_function_stats = {}
+_query_stats = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+_thread = threading.local()
+
+# --- Fingerprints ---
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s")
+_VALUE_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROW_LIST = re.compile(r"\(\?(?:\.\.\.)?\)(?:\s*,\s*\(\?(?:\.\.\.)?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(sql):
+    """Normalizes SQL so statements differing only in literals or list lengths share a key."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _VALUE_LIST.sub("?...", sql)
+    sql = _ROW_LIST.sub("(?...)...", sql)
+    return _WHITESPACE.sub(" ", sql).strip().rstrip(";")
+
+def query_id(fingerprint_text):
+    """Short stable id for a fingerprint, used as a metrics label."""
+    return hashlib.sha1(fingerprint_text.encode()).hexdigest()[:12]
+
+# --- Connections and cursors ---
+
+def _sql_text(cursor, sql):
+    if isinstance(sql, (str, bytes)):
+        return sql
+    try:
+        return sql.as_string(cursor)
+    except (AttributeError, TypeError):
+        return str(sql)
+
+_cursor_classes = {}
+
+def instrumented_cursor(base):
+    """Returns a subclass of cursor class `base` that records every statement it runs."""
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        class InstrumentedCursor(base):
+            def execute(self, query, vars=None):
+                return _timed(self, query, lambda: super(InstrumentedCursor, self).execute(query, vars))
+
+            def executemany(self, query, vars_list):
+                return _timed(self, query, lambda: super(InstrumentedCursor, self).executemany(query, vars_list))
+
+            def copy_expert(self, sql, file, size=8192):
+                return _timed(self, sql, lambda: super(InstrumentedCursor, self).copy_expert(sql, file, size))
+
+        InstrumentedCursor.__name__ = f"Instrumented{base.__name__}"
+        cls = _cursor_classes.setdefault(base, InstrumentedCursor)
+    return cls
+
+class InstrumentedConnection(extensions.connection):
+    """psycopg2 connection whose cursors report to this module."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.caller = None
+        self.connect_seconds = 0.0
+        self.round_trips = 0
+        self.query_seconds = 0.0
+        self.rows = 0
+        self.errors = 0
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or extensions.cursor
+        kwargs["cursor_factory"] = instrumented_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+def _timed(cursor, sql, run):
+    conn = cursor.connection
+    started = time.perf_counter()
+    failed = False
+    try:
+        return run()
+    except Exception:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        _thread.statements = getattr(_thread, "statements", 0) + 1
+        if isinstance(conn, InstrumentedConnection):
+            rows = max(cursor.rowcount, 0)
+            conn.round_trips += 1
+            conn.query_seconds += seconds
+            conn.rows += rows
+            conn.errors += failed
+            _record_query(conn, _sql_text(cursor, sql), seconds, rows, failed)
+
+def _record_query(conn, sql, seconds, rows, failed):
+    function = conn.caller or "untracked"
+    text = fingerprint(sql)
+    with _lock:
+        key = (function, text)
+        stats = _query_stats.get(key)
+        if stats is None:
+            if len(_query_stats) >= MAX_TRACKED_QUERIES:
+                key = (function, "other")
+            stats = _query_stats.setdefault(
+                key, {"executions": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0, "errors": 0, "slow": 0}
+            )
+        stats["executions"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["rows"] += rows
+        stats["errors"] += failed
+        slow = seconds * 1000 >= SLOW_QUERY_MS
+        stats["slow"] += slow
+    if slow:
+        entry = {
+            "event": "slow_query",
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "function": function,
+            "query_id": query_id(text),
+            "fingerprint": text,
+            "ms": round(seconds * 1000, 2),
+            "rows": rows,
+            "connect_ms": round(conn.connect_seconds * 1000, 2),
+            "round_trip": conn.round_trips,
+            "failed": failed,
+        }
+        with _lock:
+            _slow_queries.append(entry)
+        slow_query_logger.warning(json.dumps(entry))
+
+def begin_call(conn, caller, connect_seconds):
+    """Starts a logical call: `caller` checked out `conn` after waiting `connect_seconds`."""
+    if isinstance(conn, InstrumentedConnection):
+        conn.caller = caller
+        conn.connect_seconds = connect_seconds
+        conn.round_trips = 0
+        conn.query_seconds = 0.0
+        conn.rows = 0
+        conn.errors = 0
+
+def end_call(conn):
+    """Folds the counters of the call that held `conn` into the per-function totals."""
+    if not isinstance(conn, InstrumentedConnection) or conn.caller is None:
+        return
+    with _lock:
+        stats = _function_stats.setdefault(conn.caller, {
+            "calls": 0, "round_trips": 0, "connect_seconds": 0.0, "query_seconds": 0.0, "rows": 0, "errors": 0,
+        })
+        stats["calls"] += 1
+        stats["round_trips"] += conn.round_trips
+        stats["connect_seconds"] += conn.connect_seconds
+        stats["query_seconds"] += conn.query_seconds
+        stats["rows"] += conn.rows
+        stats["errors"] += conn.errors
+    conn.caller = None
+
+def statements_issued():
+    """Returns how many statements the current thread has run through instrumented cursors."""
+    return getattr(_thread, "statements", 0)
+
+# --- Reporting ---
+
+def get_function_stats():
+    """Returns {function: counters} with per-call averages added."""
+    with _lock:
+        snapshot = {name: dict(stats) for name, stats in _function_stats.items()}
+    for stats in snapshot.values():
+        calls = stats["calls"] or 1
+        stats["round_trips_per_call"] = stats["round_trips"] / calls
+        stats["connect_ms_avg"] = stats["connect_seconds"] * 1000 / calls
+        stats["query_ms_avg"] = stats["query_seconds"] * 1000 / calls
+    return snapshot
+
+def get_query_stats():
+    """Returns per (function, fingerprint) counters, slowest total time first."""
+    with _lock:
+        rows = [
+            dict(stats, function=function, fingerprint=text, query_id=query_id(text))
+            for (function, text), stats in _query_stats.items()
+        ]
+    for row in rows:
+        row["ms_avg"] = row["seconds"] * 1000 / row["executions"] if row["executions"] else 0.0
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+def get_slow_queries():
+    """Returns the most recent slow queries, newest first."""
+    with _lock:
+        return list(reversed(_slow_queries))
+
+def reset_stats():
+    """Clears every counter and the slow-query history."""
+    with _lock:
+        _function_stats.clear()
+        _query_stats.clear()
+        _slow_queries.clear()
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def render_prometheus(gauges=None, counters=None):
+    """Returns all counters in the Prometheus text exposition format.
+
+    `gauges` and `counters` may add {name: (help, value)} entries, e.g.
+    connection pool figures; counter names should end in _total.
+    """
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(item)}"' for key, item in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    functions = get_function_stats()
+    for metric, key, kind, help_text in (
+        ("mark_backend_calls_total", "calls", "counter", "Logical backend calls (connection checkouts)."),
+        ("mark_backend_round_trips_total", "round_trips", "counter", "Statements sent per backend function."),
+        ("mark_backend_connect_seconds_total", "connect_seconds", "counter", "Time spent obtaining a connection."),
+        ("mark_backend_query_seconds_total", "query_seconds", "counter", "Time spent executing statements."),
+        ("mark_backend_rows_total", "rows", "counter", "Rows returned or affected."),
+        ("mark_backend_errors_total", "errors", "counter", "Statements that raised."),
+    ):
+        family(metric, kind, help_text, [({"function": name}, stats[key]) for name, stats in sorted(functions.items())])
+
+    queries = get_query_stats()
+    for metric, key, help_text in (
+        ("mark_query_executions_total", "executions", "Executions per query fingerprint."),
+        ("mark_query_seconds_total", "seconds", "Execution time per query fingerprint."),
+        ("mark_query_rows_total", "rows", "Rows per query fingerprint."),
+        ("mark_slow_queries_total", "slow", f"Executions slower than {SLOW_QUERY_MS:g} ms."),
+    ):
+        family(metric, "counter", help_text, [
+            ({"function": row["function"], "query_id": row["query_id"]}, row[key]) for row in queries
+        ])
+    for name, (help_text, value) in (counters or {}).items():
+        family(name, "counter", help_text, [({}, value)])
+    for name, (help_text, value) in (gauges or {}).items():
+        family(name, "gauge", help_text, [({}, value)])
+    return "\n".join(lines) + "\n"
+
+_server = None
+
+def start_metrics_server(port, render=render_prometheus, host="0.0.0.0"):
+    """Serves render() at /metrics on a daemon thread; later calls return the running server."""
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
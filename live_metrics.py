@@ -0,0 +1,381 @@
+"""Live per-campaign totals fed by LISTEN/NOTIFY.
+
+A statement-level trigger on campaign_performance (migration 6) publishes one
+NOTIFY per inserting statement, after commit, on the campaign_performance
+channel. The payload holds the inserting transaction's id and the
+per-(campaign, metric) sums of the rows it inserted. PerformanceListener keeps
+a dedicated connection LISTENing on a background thread and folds those
+deltas into in-memory totals. Dashboards can then poll get_totals() and
+changes_since() as often as they like without querying the database.
+
+A campaign's totals are loaded from the daily rollups the first time it is
+asked for, once the LISTEN is active so no commit can fall between the load
+and the first notification. The load records the transaction snapshot it
+read, so notifications for transactions it already included are not applied
+twice.
+If the listening connection drops, every loaded campaign is forgotten and
+reloaded on next use, because notifications sent while disconnected are lost.
+
+    python live_metrics.py install   # create the notify trigger
+    python live_metrics.py listen    # print deltas as they arrive
+"""
+import argparse
+import json
+import logging
+import select
+import sys
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+import backend
+from backend import get_db_connection, release_db_connection
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "campaign_performance"
+# (campaign, metric) groups per notification; keeps payloads under NOTIFY's 8000-byte limit
+NOTIFY_GROUPS_PER_PAYLOAD = 40
+# Deltas kept per campaign for changes_since()
+DELTA_HISTORY = 200
+# Seconds between reconnect attempts after the listening connection fails
+RECONNECT_DELAY = 5
+# Seconds a first load waits for the listening connection before giving up
+LISTEN_WAIT_TIMEOUT = 5
+# At most one campaign_performance cache bump per this many seconds, however many notifications arrive
+CACHE_BUMP_INTERVAL = 1.0
+
+NOTIFY_DDL = f"""
+CREATE OR REPLACE FUNCTION notify_campaign_performance() RETURNS trigger AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    FOR payload IN
+        SELECT json_build_object(
+                   'xid', txid_current(),
+                   'rows', json_agg(json_build_array(campaign_id, metric_name, total, samples))
+               )::text
+        FROM (
+            SELECT campaign_id, metric_name, SUM(value) AS total, COUNT(*) AS samples,
+                   (ROW_NUMBER() OVER (ORDER BY campaign_id, metric_name) - 1) / {NOTIFY_GROUPS_PER_PAYLOAD} AS chunk
+            FROM new_rows
+            GROUP BY campaign_id, metric_name
+        ) grouped
+        GROUP BY chunk
+    LOOP
+        PERFORM pg_notify('{NOTIFY_CHANNEL}', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS campaign_performance_notify ON campaign_performance;
+CREATE TRIGGER campaign_performance_notify
+    AFTER INSERT ON campaign_performance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_campaign_performance();
+"""
+
+# Snapshot and totals from one statement, so both see the same committed transactions
+LOAD_TOTALS_SQL = """
+    SELECT txid_current_snapshot()::text,
+           COALESCE(json_object_agg(metric_name, total), '{}'::json)
+    FROM (
+        SELECT metric_name, SUM(total) AS total
+        FROM campaign_performance_daily
+        WHERE campaign_id = %s
+        GROUP BY metric_name
+    ) totals;
+"""
+
+def parse_snapshot(text):
+    """Parses txid_current_snapshot() text into (xmin, xmax, in-progress xids)."""
+    xmin, xmax, in_progress = text.split(":")
+    return int(xmin), int(xmax), {int(xid) for xid in in_progress.split(",") if xid}
+
+def visible_in_snapshot(xid, snapshot):
+    """True if transaction `xid` had committed when `snapshot` was taken."""
+    xmin, xmax, in_progress = snapshot
+    return xid < xmin or (xid < xmax and xid not in in_progress)
+
+def _number(value):
+    return int(value) if float(value).is_integer() else float(value)
+
+class _CampaignTotals:
+    def __init__(self):
+        self.loaded = False
+        self.snapshot = None
+        self.pending = []
+        self.totals = {}
+        self.version = 0
+        self.deltas = deque(maxlen=DELTA_HISTORY)
+        self.updated_at = None
+
+    def apply(self, xid, deltas):
+        if self.snapshot is not None and visible_in_snapshot(xid, self.snapshot):
+            return
+        for metric_name, value in deltas.items():
+            self.totals[metric_name] = self.totals.get(metric_name, 0) + value
+        self.version += 1
+        self.deltas.append((self.version, deltas))
+        self.updated_at = time.time()
+
+class PerformanceListener:
+    """Background LISTEN loop maintaining running totals per campaign."""
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._campaigns = {}
+        self._thread = None
+        self._stop = threading.Event()
+        # Set while LISTEN is active on the listening connection
+        self._listening = threading.Event()
+        self._bump_pending = False
+        self._bumped_at = 0.0
+        self.stats = {"notifications": 0, "reconnects": 0, "loads": 0}
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Starts the listening thread if it is not running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="performance-listener", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """Stops the listening thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def connected(self):
+        return self._listening.is_set()
+
+    def _connect(self):
+        conn = psycopg2.connect(
+            dbname=backend.DB_NAME, user=backend.DB_USER, password=backend.DB_PASSWORD,
+            host=backend.DB_HOST, port=backend.DB_PORT
+        )
+        conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+        return conn
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                self._listening.set()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], min(1.0, CACHE_BUMP_INTERVAL)) != ([], [], []):
+                        conn.poll()
+                        while conn.notifies:
+                            self._handle(conn.notifies.pop(0).payload)
+                    self._bump_cache_version()
+            except (psycopg2.Error, OSError) as e:
+                logger.warning("Performance listener disconnected: %s", e)
+            finally:
+                self._listening.clear()
+                self._bump_cache_version(force=True)
+                if conn is not None:
+                    conn.close()
+            if not self._stop.is_set():
+                # Notifications sent while disconnected are lost; reload on next use
+                with self._lock:
+                    self._campaigns.clear()
+                    self.stats["reconnects"] += 1
+                self._stop.wait(RECONNECT_DELAY)
+
+    # --- Notifications ---
+
+    def _handle(self, payload):
+        try:
+            message = json.loads(payload)
+            xid = int(message["xid"])
+            by_campaign = {}
+            for campaign_id, metric_name, total, _ in message["rows"]:
+                by_campaign.setdefault(campaign_id, {})[metric_name] = _number(total)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring malformed performance notification: %s", e)
+            return
+        with self._lock:
+            self.stats["notifications"] += 1
+            for campaign_id, deltas in by_campaign.items():
+                state = self._campaigns.get(campaign_id)
+                if state is None:
+                    continue
+                if state.loaded:
+                    state.apply(xid, deltas)
+                else:
+                    state.pending.append((xid, deltas))
+            self._lock.notify_all()
+        self._bump_pending = True
+
+    def _bump_cache_version(self, force=False):
+        # Other processes' inserts invalidate this process's cached reads too; coalesced so
+        # a busy ingest does not empty the cache on every notification
+        now = time.monotonic()
+        if self._bump_pending and (force or now - self._bumped_at >= CACHE_BUMP_INTERVAL):
+            self._bump_pending = False
+            self._bumped_at = now
+            backend.bump_table_version("campaign_performance")
+
+    # --- Reads ---
+
+    def _load(self, campaign_id):
+        with self._lock:
+            state = self._campaigns.get(campaign_id)
+            if state is not None:
+                return state
+            state = self._campaigns[campaign_id] = _CampaignTotals()
+        conn = None
+        try:
+            # Commits between the snapshot and LISTEN would otherwise never reach the totals
+            if not self._listening.wait(LISTEN_WAIT_TIMEOUT):
+                raise psycopg2.OperationalError("Performance listener is not connected.")
+            conn = get_db_connection()
+            if conn is None:
+                raise psycopg2.OperationalError("Database connection failed.")
+            with conn.cursor() as cur:
+                cur.execute(LOAD_TOTALS_SQL, (campaign_id,))
+                snapshot_text, totals = cur.fetchone()
+            conn.commit()
+        except psycopg2.Error:
+            with self._lock:
+                self._campaigns.pop(campaign_id, None)
+            raise
+        finally:
+            release_db_connection(conn)
+        with self._lock:
+            state.snapshot = parse_snapshot(snapshot_text)
+            state.totals = {metric: _number(value) for metric, value in totals.items()}
+            state.loaded = True
+            state.updated_at = time.time()
+            for xid, deltas in state.pending:
+                state.apply(xid, deltas)
+            state.pending = []
+            self.stats["loads"] += 1
+            self._lock.notify_all()
+        return state
+
+    def get_totals(self, campaign_id):
+        """Returns ({metric_name: total}, version) for a campaign, loading it on first use."""
+        state = self._load(campaign_id)
+        with self._lock:
+            while not state.loaded and campaign_id in self._campaigns:
+                self._lock.wait(1.0)
+            return dict(state.totals), state.version
+
+    def changes_since(self, campaign_id, version):
+        """Returns (totals, version, summed deltas since `version`) for a campaign.
+
+        The deltas are None if `version` is older than the kept history, in
+        which case callers should treat the totals as a fresh baseline.
+        """
+        totals, current = self.get_totals(campaign_id)
+        with self._lock:
+            state = self._campaigns.get(campaign_id)
+            history = list(state.deltas) if state is not None else []
+        if current == version:
+            return totals, current, {}
+        if not history or history[0][0] > version + 1:
+            return totals, current, None
+        summed = {}
+        for delta_version, deltas in history:
+            if delta_version > version:
+                for metric_name, value in deltas.items():
+                    summed[metric_name] = summed.get(metric_name, 0) + value
+        return totals, current, summed
+
+    def wait_for_change(self, campaign_id, version, timeout=None):
+        """Blocks until the campaign's version passes `version` or `timeout` elapses; returns the version."""
+        self._load(campaign_id)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                state = self._campaigns.get(campaign_id)
+                if state is None or state.version != version:
+                    return state.version if state is not None else version
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return version
+                self._lock.wait(remaining)
+
+_listener = None
+_listener_lock = threading.Lock()
+
+def notifications_installed():
+    """True if the notify trigger from migration 6 exists."""
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'campaign_performance_notify');")
+            return cur.fetchone()[0]
+    except psycopg2.Error as e:
+        logger.error("Error checking performance notifications: %s", e)
+        return False
+    finally:
+        release_db_connection(conn)
+
+def get_listener():
+    """Returns the process-wide running listener, or None if notifications are not installed."""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            if not notifications_installed():
+                return None
+            _listener = PerformanceListener()
+        return _listener.start()
+
+def install_notifications():
+    """Creates the notify trigger on campaign_performance."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            cur.execute(NOTIFY_DDL)
+        conn.commit()
+        return True, "Performance notifications installed."
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error installing performance notifications: {e}"
+    finally:
+        release_db_connection(conn)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live campaign performance notifications.")
+    parser.add_argument("command", choices=("install", "listen"))
+    args = parser.parse_args(argv)
+
+    if args.command == "install":
+        success, message = install_notifications()
+        print(message)
+        return 0 if success else 1
+
+    conn = PerformanceListener()._connect()
+    print(f"Listening on {NOTIFY_CHANNEL}; Ctrl-C to stop.")
+    try:
+        while True:
+            if select.select([conn], [], [], 5.0) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                print(conn.notifies.pop(0).payload)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
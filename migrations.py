@@ -0,0 +1,481 @@
+"""Versioned schema migrations for the backend tables.
+
+Migrations run in order, each in its own transaction, and are recorded in
+schema_migrations so re-running `migrate` only applies what is missing.
+campaign_performance is range-partitioned by month on its timestamp; run the
+`partitions` command (e.g. from cron) to keep future months created ahead of
+time. The `explain` command reports sequential scans in the plans of the
+queries backend.py issues.
+
+    python migrations.py migrate
+    python migrations.py rebuild-segments
+    python migrations.py duplicate-emails
+    python migrations.py status
+    python migrations.py partitions --ahead 3
+    python migrations.py explain [--analyze]
+"""
+import argparse
+import json
+import logging
+import sys
+from datetime import date
+
+import psycopg2
+
+import backend
+import live_metrics
+import rollups
+from backend import get_db_connection, release_db_connection
+
+logger = logging.getLogger(__name__)
+
+BASE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    budget NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    description TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS campaign_channels (
+    id SERIAL PRIMARY KEY,
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    channel_name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    demographics JSONB NOT NULL DEFAULT '{}',
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS segments (
+    id SERIAL PRIMARY KEY,
+    segment_name VARCHAR(255) NOT NULL,
+    criteria JSONB NOT NULL DEFAULT '{}',
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+"""
+
+PARTITIONED_PERFORMANCE_SQL = """
+CREATE SEQUENCE IF NOT EXISTS campaign_performance_id_seq;
+ALTER SEQUENCE campaign_performance_id_seq AS BIGINT;
+
+CREATE TABLE campaign_performance (
+    id BIGINT NOT NULL DEFAULT nextval('campaign_performance_id_seq'),
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    metric_name VARCHAR(100) NOT NULL,
+    value NUMERIC NOT NULL,
+    timestamp TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+ALTER SEQUENCE campaign_performance_id_seq OWNED BY campaign_performance.id;
+
+CREATE TABLE campaign_performance_default PARTITION OF campaign_performance DEFAULT;
+"""
+
+INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS campaigns_start_date_id_idx ON campaigns (start_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS campaign_channels_campaign_idx ON campaign_channels (campaign_id);
+CREATE INDEX IF NOT EXISTS campaign_channels_channel_idx ON campaign_channels (channel_name, campaign_id);
+
+CREATE INDEX IF NOT EXISTS customers_created_at_id_idx ON customers (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS customers_demographics_idx ON customers USING GIN (demographics jsonb_path_ops);
+
+CREATE INDEX IF NOT EXISTS segments_created_at_idx ON segments (created_at DESC);
+CREATE INDEX IF NOT EXISTS segments_criteria_idx ON segments USING GIN (criteria jsonb_path_ops);
+
+CREATE INDEX IF NOT EXISTS campaign_performance_campaign_ts_idx ON campaign_performance (campaign_id, timestamp);
+CREATE INDEX IF NOT EXISTS campaign_performance_metric_idx ON campaign_performance (metric_name);
+"""
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def partition_name(month):
+    """Returns the partition table name for the month starting at `month`."""
+    return f"campaign_performance_y{month.year}m{month.month:02d}"
+
+def ensure_performance_partitions(cur, first_month, last_month):
+    """Creates monthly partitions from first_month to last_month inclusive.
+
+    Rows already sitting in the default partition for a new month are moved
+    into it before it is attached, so partitions can also be created late.
+    Returns the names of the partitions created.
+    """
+    created = []
+    month = _month_start(first_month)
+    while month <= last_month:
+        name = partition_name(month)
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+        if not cur.fetchone()[0]:
+            bounds = (month, _next_month(month))
+            cur.execute(
+                f"CREATE TABLE {name} (LIKE campaign_performance INCLUDING DEFAULTS INCLUDING CONSTRAINTS);"
+            )
+            cur.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM campaign_performance_default
+                    WHERE timestamp >= %s AND timestamp < %s
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved;
+                """,
+                bounds
+            )
+            cur.execute(
+                f"ALTER TABLE campaign_performance ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s);",
+                bounds
+            )
+            created.append(name)
+        month = _next_month(month)
+    return created
+
+def _partition_campaign_performance(cur):
+    """Creates campaign_performance as a monthly-partitioned table, converting a plain legacy table in place."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('campaign_performance');")
+    row = cur.fetchone()
+    relkind = row[0] if row else None
+    if relkind == "p":
+        return
+    if relkind == "r":
+        cur.execute("ALTER TABLE campaign_performance RENAME TO campaign_performance_legacy;")
+        cur.execute("ALTER INDEX IF EXISTS campaign_performance_pkey RENAME TO campaign_performance_legacy_pkey;")
+    cur.execute(PARTITIONED_PERFORMANCE_SQL)
+
+    today = date.today()
+    first_month = today
+    if relkind == "r":
+        cur.execute("SELECT MIN(timestamp)::date FROM campaign_performance_legacy;")
+        first_month = min(cur.fetchone()[0] or today, today)
+    ensure_performance_partitions(cur, first_month, _next_month(_next_month(_month_start(today))))
+
+    if relkind == "r":
+        cur.execute(
+            """
+            INSERT INTO campaign_performance (id, campaign_id, metric_name, value, timestamp)
+            SELECT id, campaign_id, metric_name, value, COALESCE(timestamp, now())
+            FROM campaign_performance_legacy;
+            """
+        )
+        cur.execute(
+            "SELECT setval('campaign_performance_id_seq', GREATEST((SELECT MAX(id) FROM campaign_performance), 1));"
+        )
+        cur.execute("DROP TABLE campaign_performance_legacy;")
+
+def _install_rollups(cur):
+    cur.execute(rollups.ROLLUP_DDL)
+    rollups.rebuild_rollups(cur)
+
+SEGMENT_MEMBERS_SQL = """
+CREATE TABLE IF NOT EXISTS segment_members (
+    segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+    customer_id INTEGER NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    PRIMARY KEY (segment_id, customer_id)
+);
+
+CREATE INDEX IF NOT EXISTS segment_members_customer_idx ON segment_members (customer_id);
+"""
+
+def _install_segment_members(cur):
+    cur.execute(SEGMENT_MEMBERS_SQL)
+    for segment_id, plan in backend._load_segment_plans(cur, versioned=False):
+        backend.rebuild_segment(cur, segment_id, plan)
+
+ROW_VERSION_SQL = """
+CREATE OR REPLACE FUNCTION bump_row_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+""" + "".join(f"""
+ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+DROP TRIGGER IF EXISTS {table}_row_version ON {table};
+CREATE TRIGGER {table}_row_version
+    BEFORE UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+""" for table in ("campaigns", "customers", "segments"))
+
+PERFORMANCE_ARCHIVE_SQL = """
+CREATE TABLE IF NOT EXISTS performance_archive (
+    month DATE PRIMARY KEY,
+    partition_name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    row_count BIGINT NOT NULL,
+    total NUMERIC NOT NULL,
+    state TEXT NOT NULL CHECK (state IN ('exported', 'archived')),
+    exported_at TIMESTAMP NOT NULL DEFAULT now(),
+    archived_at TIMESTAMP
+);
+"""
+
+def duplicate_customer_emails(cur):
+    """Returns [(normalized email, [customer ids])] for emails shared once case and whitespace are ignored."""
+    cur.execute(
+        """
+        SELECT lower(btrim(email)), array_agg(id ORDER BY id)
+        FROM customers
+        GROUP BY 1
+        HAVING COUNT(*) > 1
+        ORDER BY 1;
+        """
+    )
+    return cur.fetchall()
+
+def _unique_customer_emails(cur):
+    """Stores emails in normalized form and makes them unique regardless of case.
+
+    Refuses to run while duplicates exist; they are listed by the
+    `duplicate-emails` command and have to be merged or corrected first.
+    """
+    duplicates = duplicate_customer_emails(cur)
+    if duplicates:
+        sample = "; ".join(f"{email} (ids {', '.join(map(str, ids))})" for email, ids in duplicates[:5])
+        raise ValueError(
+            f"{len(duplicates)} email(s) belong to more than one customer, e.g. {sample}. "
+            "Run `python migrations.py duplicate-emails` and resolve them first."
+        )
+    cur.execute("UPDATE customers SET email = lower(btrim(email)) WHERE email <> lower(btrim(email));")
+    cur.execute("DROP INDEX IF EXISTS customers_email_key;")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS customers_email_lower_key ON customers (lower(email));")
+
+# (version, description, SQL string or callable taking a cursor)
+MIGRATIONS = [
+    (1, "base schema", BASE_SCHEMA_SQL),
+    (2, "partition campaign_performance by month", _partition_campaign_performance),
+    (3, "hot-path, keyset and jsonb GIN indexes", INDEXES_SQL),
+    (4, "daily performance rollups", _install_rollups),
+    (5, "materialized segment membership", _install_segment_members),
+    (6, "performance change notifications", live_metrics.NOTIFY_DDL),
+    (7, "row versions for optimistic concurrency", ROW_VERSION_SQL),
+    (8, "performance archive catalog", PERFORMANCE_ARCHIVE_SQL),
+    (9, "case-insensitive unique customer emails", _unique_customer_emails),
+]
+
+def _ensure_migrations_table(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """
+    )
+
+def applied_versions(cur):
+    """Returns the set of migration versions recorded in schema_migrations."""
+    _ensure_migrations_table(cur)
+    cur.execute("SELECT version FROM schema_migrations;")
+    return {row[0] for row in cur.fetchall()}
+
+def migrate(target=None):
+    """Applies pending migrations up to `target` (default: all) and returns (success, message)."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    applied = []
+    version = None
+    try:
+        for version, description, step in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            with conn.cursor() as cur:
+                # Serialize concurrent migrators; released when the transaction ends
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'));")
+                if version in applied_versions(cur):
+                    conn.rollback()
+                    continue
+                if callable(step):
+                    step(cur)
+                else:
+                    cur.execute(step)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s);",
+                    (version, description)
+                )
+            conn.commit()
+            applied.append(version)
+        backend.bump_table_version(
+            "campaigns", "customers", "segments", "segment_members", "campaign_performance"
+        )
+        if not applied:
+            return True, "Schema is up to date."
+        return True, f"Applied migrations {', '.join(map(str, applied))}."
+    except (psycopg2.Error, ValueError) as e:
+        conn.rollback()
+        return False, f"Error applying migration {version}: {e}"
+    finally:
+        release_db_connection(conn)
+
+def create_future_partitions(months_ahead=3):
+    """Creates campaign_performance partitions from this month through `months_ahead` months ahead."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        last_month = _month_start(date.today())
+        for _ in range(months_ahead):
+            last_month = _next_month(last_month)
+        with conn.cursor() as cur:
+            created = ensure_performance_partitions(cur, date.today(), last_month)
+        conn.commit()
+        return True, f"Created partitions: {', '.join(created)}." if created else "All partitions already exist."
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error creating partitions: {e}"
+    finally:
+        release_db_connection(conn)
+
+# --- Query plan inspection ---
+
+def _sample_ids(cur):
+    cur.execute(
+        "SELECT (SELECT MIN(id) FROM campaigns), (SELECT MIN(id) FROM customers), (SELECT MIN(id) FROM segments);"
+    )
+    campaign_id, customer_id, segment_id = cur.fetchone()
+    return campaign_id or 0, customer_id or 0, segment_id or 0
+
+def backend_queries(cur):
+    """Returns (name, sql, params) for the queries backend.py issues, with sample parameters."""
+    campaign_id, customer_id, _ = _sample_ids(cur)
+    today = date.today()
+    return [
+        ("read_campaigns", *backend._campaigns_query()),
+        ("read_campaigns(channel)", *backend._campaigns_query("Email")),
+        ("read_campaigns_page", *backend._campaigns_query(limit=backend.PAGE_SIZE + 1)),
+        ("read_campaigns_page(after)", *backend._campaigns_query(after=(today, campaign_id), limit=backend.PAGE_SIZE + 1)),
+        ("read_customers_page",
+         "SELECT * FROM customers ORDER BY created_at DESC, id DESC LIMIT %s;", [backend.PAGE_SIZE + 1]),
+        ("read_customers_page(after)",
+         "SELECT * FROM customers WHERE (created_at, id) < (now(), %s) ORDER BY created_at DESC, id DESC LIMIT %s;",
+         [customer_id, backend.PAGE_SIZE + 1]),
+        # Matches customers_email_lower_key (migration 9); a plain `email = %s` cannot use it
+        ("customer by email", "SELECT * FROM customers WHERE lower(email) = lower(%s);", ["someone@example.com"]),
+        ("read_segments", "SELECT * FROM segments ORDER BY created_at DESC;", []),
+        ("get_performance_data_by_campaign",
+         "SELECT metric_name, value FROM campaign_performance WHERE campaign_id = %s ORDER BY timestamp ASC;",
+         [campaign_id]),
+        ("get_performance_series(raw)",
+         "SELECT date_trunc('hour', timestamp), metric_name, SUM(value) FROM campaign_performance "
+         "WHERE campaign_id = %s AND timestamp >= now() - interval '7 days' AND timestamp < now() GROUP BY 1, 2;",
+         [campaign_id]),
+        ("get_performance_totals_by_campaign",
+         "SELECT metric_name, SUM(total) FROM campaign_performance_daily WHERE campaign_id = %s GROUP BY metric_name;",
+         [campaign_id]),
+        ("get_insights_snapshot", backend.INSIGHTS_SNAPSHOT_SQL, []),
+    ]
+
+def find_seq_scans(plan):
+    """Walks an EXPLAIN (FORMAT JSON) plan and returns the relations read with a sequential scan."""
+    scans = []
+    if plan.get("Node Type") == "Seq Scan":
+        scans.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        scans.extend(find_seq_scans(child))
+    return scans
+
+def explain(cur, sql, params=None, analyze=False):
+    """Returns the JSON plan of `sql`; with analyze=True the query is executed."""
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    cur.execute(f"EXPLAIN ({options}) {sql.rstrip().rstrip(';')}", params or [])
+    result = cur.fetchone()[0]
+    plan = result if isinstance(result, list) else json.loads(result)
+    return plan[0]["Plan"]
+
+def explain_backend_queries(analyze=False):
+    """Explains every backend query and returns rows of name, seq_scans and total_cost."""
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    report = []
+    try:
+        with conn.cursor() as cur:
+            for name, sql, params in backend_queries(cur):
+                plan = explain(cur, sql, params, analyze)
+                report.append({
+                    "name": name,
+                    "seq_scans": sorted(set(find_seq_scans(plan))),
+                    "total_cost": plan.get("Total Cost"),
+                })
+        return report
+    except psycopg2.Error as e:
+        logger.error("Error explaining backend queries: %s", e)
+        return report
+    finally:
+        # EXPLAIN ANALYZE runs the statements; never keep their effects
+        conn.rollback()
+        release_db_connection(conn)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the backend schema.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate", help="apply pending migrations")
+    migrate_parser.add_argument("--target", type=int, help="stop after this version")
+    subcommands.add_parser("status", help="list migrations and whether they are applied")
+    partitions_parser = subcommands.add_parser("partitions", help="create upcoming monthly partitions")
+    partitions_parser.add_argument("--ahead", type=int, default=3, help="months to create ahead of today")
+    subcommands.add_parser("rebuild-segments", help="recompute segment_members for every segment")
+    subcommands.add_parser("duplicate-emails", help="list customers sharing an email regardless of case")
+    explain_parser = subcommands.add_parser("explain", help="report seq scans in backend query plans")
+    explain_parser.add_argument("--analyze", action="store_true", help="run EXPLAIN ANALYZE (executes the queries)")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        conn = get_db_connection()
+        if conn is None:
+            print("Database connection failed.")
+            return 1
+        try:
+            with conn.cursor() as cur:
+                applied = applied_versions(cur)
+            conn.commit()
+        finally:
+            release_db_connection(conn)
+        for version, description, _ in MIGRATIONS:
+            print(f"{version:>3} {'applied' if version in applied else 'pending':<8} {description}")
+        return 0
+
+    if args.command == "duplicate-emails":
+        conn = get_db_connection()
+        if conn is None:
+            print("Database connection failed.")
+            return 1
+        try:
+            with conn.cursor() as cur:
+                duplicates = duplicate_customer_emails(cur)
+        finally:
+            release_db_connection(conn)
+        for email, ids in duplicates:
+            print(f"{email:<40} {', '.join(map(str, ids))}")
+        return 1 if duplicates else 0
+
+    if args.command == "explain":
+        report = explain_backend_queries(args.analyze)
+        for row in report:
+            scans = ", ".join(row["seq_scans"]) or "-"
+            print(f"{row['name']:<36} cost={row['total_cost']:<12} seq scans: {scans}")
+        return 1 if any(row["seq_scans"] for row in report) else 0
+
+    if args.command == "migrate":
+        success, message = migrate(args.target)
+    elif args.command == "rebuild-segments":
+        success, message = backend.rebuild_segment_members()
+    else:
+        success, message = create_future_partitions(args.ahead)
+    print(message)
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
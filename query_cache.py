@@ -0,0 +1,142 @@
+"""Version-keyed LRU cache for backend reads across Streamlit reruns.
+
+Every widget interaction reruns frontend.py, which would otherwise repeat the
+same reads. Entries are keyed on the function, its arguments and the version
+counters of the tables it reads (backend.bump_table_version is called by each
+write), so a cached result is served until a write to one of those tables
+actually happens. Entries are evicted least-recently-used once the pickled
+size of the cache exceeds QUERY_CACHE_MAX_BYTES.
+
+Cached values are shared between reruns and sessions; treat them as read-only.
+With read replicas configured, a miss reads only from a replica that has
+replayed every write committed before it (backend.consistent_reads), so a
+lagging replica cannot store old rows under a new version.
+Version counters are per process, so writes made by other processes are only
+seen once this process writes to the same table.
+"""
+import functools
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import backend
+
+QUERY_CACHE_MAX_BYTES = int(os.environ.get("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+def _freeze(value):
+    """Turns arguments into a hashable cache-key component."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _is_empty(value):
+    # Backend reads return empty results on errors, so those are never cached
+    if isinstance(value, tuple) and value:
+        return _is_empty(value[0])
+    if hasattr(value, "empty"):
+        return value.empty
+    return not value
+
+def _load(function, args, kwargs):
+    # Runs after the key's versions were read, so every write they count is included
+    with backend.consistent_reads():
+        return function(*args, **kwargs)
+
+class QueryCache:
+    """Thread-safe LRU of query results with a memory cap and hit/miss counters."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0}
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value for `key`, calling `loader()` and caching its result on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+        value = loader()
+        if _is_empty(value):
+            return value
+        try:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return value
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+        return value
+
+    def cached(self, *tables):
+        """Decorates a read function so its results are cached until one of `tables` changes."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                key = (
+                    function.__module__, function.__qualname__,
+                    _freeze(args), _freeze(kwargs),
+                    backend.get_table_versions(*tables),
+                )
+                return self.get_or_load(key, lambda: _load(function, args, kwargs))
+            wrapper.uncached = function
+            return wrapper
+        return decorator
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns hit/miss/eviction counters plus entry count and bytes cached."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["bytes"] = self._bytes
+        snapshot["max_bytes"] = self.max_bytes
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+cache = QueryCache(QUERY_CACHE_MAX_BYTES)
+
+# --- Cached backend reads ---
+
+read_campaigns = cache.cached("campaigns")(backend.read_campaigns)
+read_campaigns_page = cache.cached("campaigns")(backend.read_campaigns_page)
+read_customers_page = cache.cached("customers")(backend.read_customers_page)
+read_segments = cache.cached("segments", "segment_members")(backend.read_segments)
+count_segment_members = cache.cached("segments", "customers")(backend.count_segment_members)
+get_performance_totals_by_campaign = cache.cached("campaign_performance")(backend.get_performance_totals_by_campaign)
+get_performance_series = cache.cached("campaign_performance")(backend.get_performance_series)
+
+@cache.cached("campaigns", "campaign_performance")
+def get_campaign_leaderboard(sort_by="click_through_rate", top=20, min_sent=0):
+    """Cached analytics.get_campaign_leaderboard; analytics and NumPy load on first use."""
+    import analytics
+    return analytics.get_campaign_leaderboard(sort_by, top, min_sent)
+
+def get_cache_stats():
+    """Returns the shared cache's counters."""
+    return cache.stats()
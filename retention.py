@@ -0,0 +1,420 @@
+"""Retention and archival for campaign_performance.
+
+Raw rows older than PERFORMANCE_RETENTION_DAYS are moved out of PostgreSQL
+one monthly partition at a time, oldest first. For each month past the
+horizon, archive_month():
+
+1. compares the month's daily rollups with its raw rows and rebuilds them if
+   they disagree, so totals survive the raw rows;
+2. streams the partition through COPY into a zstd-compressed Parquet file in
+   PERFORMANCE_ARCHIVE_DIR, sorted by campaign so readers can skip row groups,
+   and records the month in performance_archive (migration 8) as 'exported';
+3. detaches and drops the partition and marks the month 'archived', after
+   checking that the file and the partition still hold the same rows.
+
+Each step commits on its own, so an interrupted run resumes where it stopped:
+'exported' months are finished before new ones are started, and a month
+whose partition changed after export is exported again. `run` archives at
+most --max-months months per invocation, so it can be scheduled to work
+through a backlog incrementally.
+
+read_archive() serves archived rows back. backend.get_performance_data_by_campaign
+and the sub-day buckets of backend.get_performance_series merge them in, so
+callers see the same data before and after archival; day and coarser series
+and totals already come from the rollups, which are kept. Rows inserted later
+for an archived month land in the default partition and are read from there.
+
+    python retention.py status
+    python retention.py run [--max-months 1] [--dry-run]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+import psycopg2
+
+import backend
+import migrations
+import rollups
+from backend import get_db_connection, release_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Raw rows older than this many days are archived, a whole month at a time
+PERFORMANCE_RETENTION_DAYS = int(os.environ.get("PERFORMANCE_RETENTION_DAYS", "180"))
+# Directory the Parquet files are written to
+PERFORMANCE_ARCHIVE_DIR = os.environ.get("PERFORMANCE_ARCHIVE_DIR", os.path.join("archive", "campaign_performance"))
+# Rows per Parquet row group; smaller groups let campaign filters skip more of a file
+ARCHIVE_ROW_GROUP_SIZE = int(os.environ.get("ARCHIVE_ROW_GROUP_SIZE", "250000"))
+
+ARCHIVE_COLUMNS = ("id", "campaign_id", "metric_name", "value", "timestamp")
+_PARTITION_NAME = re.compile(r"^campaign_performance_y(\d{4})m(\d{2})$")
+
+def _archive_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("campaign_id", pa.int32()),
+        ("metric_name", pa.string()),
+        # value is an unconstrained NUMERIC, so no decimal128 precision fits every row; keep its exact text
+        ("value", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+    ])
+
+def archive_horizon(today=None):
+    """Returns the first month kept in the database; every earlier month is due for archival."""
+    return migrations._month_start((today or date.today()) - timedelta(days=PERFORMANCE_RETENTION_DAYS))
+
+def archive_path(month):
+    return os.path.join(PERFORMANCE_ARCHIVE_DIR, f"{month:%Y_%m}.parquet")
+
+# --- Catalog ---
+
+CATALOG_EXISTS_SQL = "SELECT to_regclass('performance_archive') IS NOT NULL;"
+
+_catalog_seen = False
+
+def catalog_exists(cur):
+    """True if performance_archive (migration 8) exists; once seen, later calls skip the check."""
+    global _catalog_seen
+    if not _catalog_seen:
+        cur.execute(CATALOG_EXISTS_SQL)
+        _catalog_seen = cur.fetchone()[0]
+    return _catalog_seen
+
+def _partition_months(cur):
+    """Returns the months of the attached monthly partitions, oldest first."""
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'campaign_performance'::regclass;"
+    )
+    months = []
+    for (name,) in cur.fetchall():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+def _archive_state(cur, month):
+    cur.execute("SELECT state FROM performance_archive WHERE month = %s;", (month,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def pending_months(cur, today=None):
+    """Returns the months to archive: unfinished exports first, then partitions past the horizon."""
+    cur.execute("SELECT month FROM performance_archive WHERE state = 'exported' ORDER BY month;")
+    exported = [row[0] for row in cur.fetchall()]
+    horizon = archive_horizon(today)
+    return exported + [month for month in _partition_months(cur) if month < horizon and month not in exported]
+
+def archived_through():
+    """Returns the first day after the newest archived month, or None if nothing is archived."""
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        with conn.cursor() as cur:
+            if not catalog_exists(cur):
+                return None
+            cur.execute("SELECT MAX(month) FROM performance_archive WHERE state = 'archived';")
+            month = cur.fetchone()[0]
+            return migrations._next_month(month) if month else None
+    except psycopg2.Error as e:
+        logger.error("Error reading the performance archive catalog: %s", e)
+        return None
+    finally:
+        release_db_connection(conn)
+
+# --- Archiving ---
+
+def _write_parquet(cur, name, path):
+    """Streams partition `name` through COPY into a Parquet file at `path`; returns the rows written."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    schema = _archive_schema()
+    partial = path + ".partial"
+    rows = 0
+    with tempfile.TemporaryFile(dir=directory) as spool:
+        cur.copy_expert(
+            f"COPY (SELECT {', '.join(ARCHIVE_COLUMNS)} FROM {name} ORDER BY campaign_id, timestamp) "
+            "TO STDOUT WITH (FORMAT csv, HEADER)",
+            spool
+        )
+        spool.seek(0)
+        reader = pa_csv.open_csv(spool, convert_options=pa_csv.ConvertOptions(column_types=schema))
+        with pq.ParquetWriter(partial, schema, compression="zstd") as writer:
+            # CSV blocks are small; gather them into full row groups
+            batches, buffered = [], 0
+            for batch in reader:
+                batches.append(batch)
+                buffered += batch.num_rows
+                if buffered >= ARCHIVE_ROW_GROUP_SIZE:
+                    writer.write_table(pa.Table.from_batches(batches, schema))
+                    rows += buffered
+                    batches, buffered = [], 0
+            if batches or not rows:
+                writer.write_table(pa.Table.from_batches(batches, schema))
+                rows += buffered
+    os.replace(partial, path)
+    return rows
+
+def _parquet_rows(path):
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+def _roll_up_month(month):
+    """Rebuilds the month's rollups if they disagree with its raw rows; returns (success, message)."""
+    end_day = migrations._next_month(month)
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            if not rollups.rollup_mismatches(cur, first_day=month, end_day=end_day):
+                conn.rollback()
+                return True, f"Rollups for {month:%Y-%m} are up to date."
+            rows = rollups.rebuild_rollups(cur, first_day=month, end_day=end_day)
+        conn.commit()
+        return True, f"Rebuilt {rows} daily rollup rows for {month:%Y-%m}."
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error rolling up {month:%Y-%m}: {e}"
+    finally:
+        release_db_connection(conn)
+
+def _export_month(month):
+    """Writes one partition to Parquet and records it as 'exported'; returns (success, message)."""
+    name = migrations.partition_name(month)
+    path = archive_path(month)
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            # Holds off inserts into this month until the export is recorded
+            cur.execute(f"LOCK TABLE {name} IN SHARE MODE;")
+            cur.execute(f"SELECT COUNT(*), COALESCE(SUM(value), 0) FROM {name};")
+            row_count, total = cur.fetchone()
+            _write_parquet(cur, name, path)
+            cur.execute(
+                """
+                INSERT INTO performance_archive (month, partition_name, path, row_count, total, state)
+                VALUES (%s, %s, %s, %s, %s, 'exported')
+                ON CONFLICT (month) DO UPDATE
+                SET path = EXCLUDED.path, row_count = EXCLUDED.row_count, total = EXCLUDED.total,
+                    state = 'exported', exported_at = now(), archived_at = NULL;
+                """,
+                (month, name, path, row_count, total)
+            )
+        conn.commit()
+        return True, f"Exported {row_count:,} rows of {month:%Y-%m} to {path}."
+    except (psycopg2.Error, OSError, ValueError) as e:
+        conn.rollback()
+        return False, f"Error exporting {month:%Y-%m}: {e}"
+    finally:
+        release_db_connection(conn)
+
+def _drop_month(month):
+    """Detaches and drops an exported partition once its file is verified; returns (success, message)."""
+    name = migrations.partition_name(month)
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT path, row_count FROM performance_archive WHERE month = %s AND state = 'exported' FOR UPDATE;",
+                (month,)
+            )
+            record = cur.fetchone()
+            if record is None:
+                conn.rollback()
+                return False, f"{month:%Y-%m} has not been exported."
+            path, row_count = record
+            cur.execute(f"ALTER TABLE campaign_performance DETACH PARTITION {name};")
+            cur.execute(f"SELECT COUNT(*) FROM {name};")
+            current = cur.fetchone()[0]
+            archived = _parquet_rows(path)
+            if current != row_count or archived != row_count:
+                conn.rollback()
+                return False, (
+                    f"{name} has {current:,} rows and {path} {archived:,}, but {row_count:,} were exported."
+                )
+            cur.execute(f"DROP TABLE {name};")
+            cur.execute(
+                "UPDATE performance_archive SET state = 'archived', archived_at = now() WHERE month = %s;",
+                (month,)
+            )
+        conn.commit()
+        backend.bump_table_version("campaign_performance")
+        return True, f"Archived {row_count:,} rows of {month:%Y-%m} to {path}."
+    except (psycopg2.Error, OSError) as e:
+        conn.rollback()
+        return False, f"Error archiving {month:%Y-%m}: {e}"
+    finally:
+        release_db_connection(conn)
+
+def archive_month(month):
+    """Archives one monthly partition, resuming after whichever step last completed; returns (success, message)."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            state = _archive_state(cur, month)
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error reading the performance archive catalog: {e}"
+    finally:
+        release_db_connection(conn)
+    if state == "archived":
+        return True, f"{month:%Y-%m} is already archived."
+
+    # A partition that changed after its export is exported once more
+    for attempt in range(2):
+        if state != "exported" or attempt:
+            for step in (_roll_up_month, _export_month):
+                success, message = step(month)
+                if not success:
+                    return False, message
+        success, message = _drop_month(month)
+        if success:
+            return True, message
+        logger.warning("Re-exporting %s: %s", f"{month:%Y-%m}", message)
+    return False, message
+
+def run_retention(max_months=1, dry_run=False, today=None):
+    """Archives up to `max_months` due months (all if 0) and returns (success, message, archived months)."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed.", []
+    try:
+        with conn.cursor() as cur:
+            # Session lock held on this connection for the whole run
+            cur.execute("SELECT pg_try_advisory_lock(hashtext('performance_archive'));")
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return False, "Another retention run is in progress.", []
+            months = pending_months(cur, today)
+        conn.commit()
+        months = months[:max_months] if max_months else months
+        if dry_run:
+            listed = ", ".join(f"{month:%Y-%m}" for month in months) or "nothing"
+            return True, f"Would archive {listed}.", months
+        archived = []
+        for month in months:
+            success, message = archive_month(month)
+            logger.info(message)
+            if not success:
+                return False, message, archived
+            archived.append(month)
+        return True, f"Archived {len(archived)} month(s); horizon is {archive_horizon(today):%Y-%m}.", archived
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error listing months to archive: {e}", []
+    finally:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock_all();")
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+        release_db_connection(conn)
+
+# --- Reads ---
+
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else datetime.combine(value, dt_time.min)
+
+def archive_paths_query(start=None, end=None):
+    """Builds the catalog query for the files of archived months overlapping start..end."""
+    conditions, params = ["state = 'archived'"], []
+    if start is not None:
+        conditions.append("month + interval '1 month' > %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("month < %s")
+        params.append(end)
+    return f"SELECT path FROM performance_archive WHERE {' AND '.join(conditions)} ORDER BY month;", params
+
+def read_archive(conn, campaign_id, start=None, end=None):
+    """Returns a campaign's archived rows with timestamps in start..end as a DataFrame.
+
+    Returns None when no archived month overlaps the range (or migration 8
+    has not run), so callers can skip the merge. Runs its catalog query on
+    `conn`. Values are exact Decimals, as psycopg2 returns NUMERIC.
+    """
+    with conn.cursor() as cur:
+        if not catalog_exists(cur):
+            return None
+        cur.execute(*archive_paths_query(start, end))
+        paths = [row[0] for row in cur.fetchall()]
+    return read_archive_files(paths, campaign_id, start, end)
+
+def read_archive_files(paths, campaign_id, start=None, end=None):
+    """Reads a campaign's rows with timestamps in start..end from the Parquet files `paths`; None if there are none."""
+    if not paths:
+        return None
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    filters = [("campaign_id", "=", int(campaign_id))]
+    if start is not None:
+        filters.append(("timestamp", ">=", _as_datetime(start)))
+    if end is not None:
+        filters.append(("timestamp", "<", _as_datetime(end)))
+    tables = []
+    for path in paths:
+        try:
+            table = pq.read_table(path, filters=filters)
+        except OSError as e:
+            logger.error("Error reading performance archive %s: %s", path, e)
+            continue
+        tables.append(table)
+    if not tables:
+        return None
+    frame = pa.concat_tables(tables).to_pandas()
+    frame["value"] = frame["value"].map(Decimal)
+    return frame
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old campaign_performance partitions to Parquet.")
+    parser.add_argument("command", choices=("run", "status"))
+    parser.add_argument("--max-months", type=int, default=1, help="months to archive this run (0: every due month)")
+    parser.add_argument("--dry-run", action="store_true", help="list the months that would be archived")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "run":
+        success, message, _ = run_retention(args.max_months, args.dry_run)
+        print(message)
+        return 0 if success else 1
+
+    conn = get_db_connection()
+    if conn is None:
+        print("Database connection failed.")
+        return 1
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT month, state, row_count, total, path FROM performance_archive ORDER BY month;")
+            catalog = cur.fetchall()
+            due = pending_months(cur)
+        conn.commit()
+    finally:
+        release_db_connection(conn)
+    for month, state, row_count, total, path in catalog:
+        print(f"{month:%Y-%m} {state:<9} {row_count:>12,} rows  total={total}  {path}")
+    print(f"Horizon {archive_horizon():%Y-%m}; {len(due)} month(s) due.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""Daily rollups of campaign_performance.
+
+campaign_performance_daily keeps one row per (campaign_id, metric_name, day)
+with the summed value and the number of raw samples. A statement-level
+trigger folds every INSERT (including COPY) into the rollup in the same
+transaction, so readers never scan the raw table for totals.
+
+    python rollups.py install   # create the table and trigger, then backfill
+    python rollups.py rebuild   # recompute every rollup from the raw rows
+    python rollups.py check     # report rollups that disagree with the raw rows
+
+Rollups of months moved out by retention.py stay in place after their raw
+rows are gone, so `check` and `rebuild` leave archived days alone unless
+--since says otherwise.
+"""
+import argparse
+import logging
+import sys
+from datetime import date
+
+import psycopg2
+import psycopg2.extras
+
+from backend import get_db_connection, release_db_connection, bump_table_version
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_DDL = """
+CREATE TABLE IF NOT EXISTS campaign_performance_daily (
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    metric_name VARCHAR(100) NOT NULL,
+    day DATE NOT NULL,
+    total NUMERIC NOT NULL DEFAULT 0,
+    samples BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (campaign_id, metric_name, day)
+);
+
+CREATE INDEX IF NOT EXISTS campaign_performance_daily_metric_idx
+    ON campaign_performance_daily (metric_name);
+
+CREATE OR REPLACE FUNCTION rollup_campaign_performance() RETURNS trigger AS $$
+BEGIN
+    -- Ordered so concurrent statements lock rollup rows in the same order
+    INSERT INTO campaign_performance_daily AS d (campaign_id, metric_name, day, total, samples)
+    SELECT campaign_id, metric_name, timestamp::date, SUM(value), COUNT(*)
+    FROM new_rows
+    GROUP BY campaign_id, metric_name, timestamp::date
+    ORDER BY 1, 2, 3
+    ON CONFLICT (campaign_id, metric_name, day)
+    DO UPDATE SET total = d.total + EXCLUDED.total,
+                  samples = d.samples + EXCLUDED.samples;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS campaign_performance_rollup ON campaign_performance;
+CREATE TRIGGER campaign_performance_rollup
+    AFTER INSERT ON campaign_performance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_campaign_performance();
+"""
+
+# Raw rows aggregated the same way the trigger does
+RAW_DAILY_SQL = """
+    SELECT campaign_id, metric_name, timestamp::date AS day,
+           SUM(value) AS total, COUNT(*) AS samples
+    FROM campaign_performance
+    {where}
+    GROUP BY campaign_id, metric_name, timestamp::date
+"""
+
+def _filters(campaign_id=None, first_day=None, end_day=None):
+    """Returns (raw WHERE, rollup WHERE, params) for one campaign and/or days in first_day..end_day (exclusive)."""
+    raw, rolled, params = [], [], []
+    for value, raw_condition, rollup_condition in (
+        (campaign_id, "campaign_id = %s", "d.campaign_id = %s"),
+        (first_day, "timestamp >= %s", "d.day >= %s"),
+        (end_day, "timestamp < %s", "d.day < %s"),
+    ):
+        if value is not None:
+            raw.append(raw_condition)
+            rolled.append(rollup_condition)
+            params.append(value)
+    if not params:
+        return "", "", []
+    return "WHERE " + " AND ".join(raw), "WHERE " + " AND ".join(rolled), params
+
+def rebuild_rollups(cur, campaign_id=None, first_day=None, end_day=None):
+    """Recomputes rollups from the raw table on an open cursor, for one campaign or all, optionally for a day range."""
+    # SHARE mode blocks inserts (and so the trigger) until the rebuild commits
+    cur.execute("LOCK TABLE campaign_performance IN SHARE MODE;")
+    where, rollup_where, params = _filters(campaign_id, first_day, end_day)
+    if not params:
+        cur.execute("TRUNCATE campaign_performance_daily;")
+    else:
+        cur.execute("DELETE FROM campaign_performance_daily d " + rollup_where + ";", params)
+    cur.execute(
+        "INSERT INTO campaign_performance_daily (campaign_id, metric_name, day, total, samples) "
+        + RAW_DAILY_SQL.format(where=where) + ";",
+        params
+    )
+    return cur.rowcount
+
+def install_rollups():
+    """Creates the rollup table and trigger and backfills it from existing rows."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            cur.execute(ROLLUP_DDL)
+            rows = rebuild_rollups(cur)
+        conn.commit()
+        bump_table_version("campaign_performance")
+        return True, f"Rollups installed; {rows} daily rollup rows backfilled."
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error installing rollups: {e}"
+    finally:
+        release_db_connection(conn)
+
+def refresh_rollups(campaign_id=None, since=None):
+    """Rebuilds rollups for one campaign, or all campaigns, from day `since` on if given, in a single transaction."""
+    conn = get_db_connection()
+    if conn is None:
+        return False, "Database connection failed."
+    try:
+        with conn.cursor() as cur:
+            rows = rebuild_rollups(cur, campaign_id, first_day=since)
+        conn.commit()
+        bump_table_version("campaign_performance")
+        return True, f"Rebuilt {rows} daily rollup rows."
+    except psycopg2.Error as e:
+        conn.rollback()
+        return False, f"Error rebuilding rollups: {e}"
+    finally:
+        release_db_connection(conn)
+
+def rollup_mismatches(cur, campaign_id=None, first_day=None, end_day=None):
+    """Returns the (campaign, metric, day) rollup rows that differ from the raw table, on an open cursor."""
+    where, rollup_where, params = _filters(campaign_id, first_day, end_day)
+    cur.execute(
+        f"""
+        WITH raw AS ({RAW_DAILY_SQL.format(where=where)}),
+             rolled AS (SELECT * FROM campaign_performance_daily d {rollup_where})
+        SELECT COALESCE(raw.campaign_id, rolled.campaign_id) AS campaign_id,
+               COALESCE(raw.metric_name, rolled.metric_name) AS metric_name,
+               COALESCE(raw.day, rolled.day) AS day,
+               raw.total AS raw_total, rolled.total AS rollup_total,
+               raw.samples AS raw_samples, rolled.samples AS rollup_samples
+        FROM raw
+        FULL OUTER JOIN rolled
+          ON rolled.campaign_id = raw.campaign_id
+         AND rolled.metric_name = raw.metric_name
+         AND rolled.day = raw.day
+        WHERE raw.total IS DISTINCT FROM rolled.total
+           OR raw.samples IS DISTINCT FROM rolled.samples
+        ORDER BY 1, 2, 3;
+        """,
+        params + params
+    )
+    return cur.fetchall()
+
+def check_rollups(campaign_id=None, since=None):
+    """Compares rollups with the raw table, from day `since` on if given, and returns the rows that differ."""
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            return rollup_mismatches(cur, campaign_id, first_day=since)
+    except psycopg2.Error as e:
+        logger.error("Error checking rollups: %s", e)
+        return []
+    finally:
+        release_db_connection(conn)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain campaign_performance rollups.")
+    parser.add_argument("command", choices=("install", "rebuild", "check"))
+    parser.add_argument("--campaign-id", type=int, help="limit rebuild/check to one campaign")
+    parser.add_argument("--since", type=date.fromisoformat,
+                        help="check/rebuild days from this date on (default: the first day not archived)")
+    args = parser.parse_args(argv)
+
+    since = args.since
+    if since is None and args.command != "install":
+        import retention
+        since = retention.archived_through()
+
+    if args.command == "check":
+        mismatches = check_rollups(args.campaign_id, since)
+        for row in mismatches:
+            print(
+                f"campaign {row['campaign_id']} {row['metric_name']} {row['day']}: "
+                f"raw={row['raw_total']} ({row['raw_samples']} samples) "
+                f"rollup={row['rollup_total']} ({row['rollup_samples']} samples)"
+            )
+        print(f"{len(mismatches)} mismatched rollup rows.")
+        return 1 if mismatches else 0
+
+    if args.command == "install":
+        success, message = install_rollups()
+    else:
+        success, message = refresh_rollups(args.campaign_id, since)
+    print(message)
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
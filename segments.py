@@ -0,0 +1,145 @@
+"""Compiles segment criteria into parameterized SQL over customers.demographics.
+
+Criteria are dicts keyed by demographics field; nested dicts and dotted keys
+address nested fields. Plain values and {"$eq": v} become a single jsonb
+containment test (demographics @> ...) that the jsonb_path_ops GIN index
+serves; other operators add further conditions:
+
+    {"city": "New York"}                       equality
+    {"address": {"country": "US"}}             nested equality
+    {"address.zip": "10001"}                   dotted path
+    {"age": {"$gte": 18, "$lt": 35}}           ranges ($gt, $gte, $lt, $lte)
+    {"city": {"$in": ["Austin", "Boston"]}}    membership (a list value means the same)
+    {"city": {"$nin": [...]}}, {"tier": {"$ne": "free"}}, {"phone": {"$exists": True}}
+
+Compiled plans are cached per segment id together with the row version they
+were compiled from (segments.version, bumped on every UPDATE), so an edit
+made by another process is picked up on the next read of that row.
+"""
+import json
+import threading
+from collections import namedtuple
+
+CompiledSegment = namedtuple("CompiledSegment", ["version", "fingerprint", "where_sql", "params"])
+
+RANGE_OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def _nested_document(path, value):
+    document = value
+    for key in reversed(path):
+        document = {key: document}
+    return document
+
+def _merge_into(target, path, value):
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+        if not isinstance(target, dict):
+            raise ValueError(f"conflicting criteria for {'.'.join(path)}")
+    if path[-1] in target and target[path[-1]] != value:
+        raise ValueError(f"conflicting criteria for {'.'.join(path)}")
+    target[path[-1]] = value
+
+def _any_of(column, path, values, params):
+    if not values:
+        return "FALSE"
+    for value in values:
+        params.append(json.dumps(_nested_document(path, value)))
+    return "(" + " OR ".join(f"{column} @> %s::jsonb" for _ in values) + ")"
+
+def _compile_operators(column, path, operators, containment, clauses, params):
+    for operator, operand in operators.items():
+        if operator == "$eq":
+            _merge_into(containment, path, operand)
+        elif operator == "$ne":
+            params.append(json.dumps(_nested_document(path, operand)))
+            clauses.append(f"NOT {column} @> %s::jsonb")
+        elif operator == "$in":
+            clauses.append(_any_of(column, path, list(operand), params))
+        elif operator == "$nin":
+            values = list(operand)
+            if values:
+                clauses.append("NOT " + _any_of(column, path, values, params))
+        elif operator == "$exists":
+            params.append(list(path))
+            clauses.append(f"{column} #> %s IS {'NOT NULL' if operand else 'NULL'}")
+        elif operator in RANGE_OPERATORS:
+            sql_operator = RANGE_OPERATORS[operator]
+            if isinstance(operand, bool) or not isinstance(operand, (int, float, str)):
+                raise ValueError(f"{operator} needs a number or string, got {operand!r}")
+            if isinstance(operand, str):
+                params.extend([list(path), operand])
+                clauses.append(f"({column} #>> %s) {sql_operator} %s")
+            else:
+                # Only compare values stored as JSON numbers; anything else never matches
+                params.extend([list(path), list(path), operand])
+                clauses.append(
+                    f"CASE WHEN jsonb_typeof({column} #> %s) = 'number' "
+                    f"THEN ({column} #> %s)::numeric END {sql_operator} %s"
+                )
+        else:
+            raise ValueError(f"unsupported operator {operator!r} for {'.'.join(path)}")
+
+def _compile_into(column, criteria, prefix, containment, clauses, params):
+    for key, value in criteria.items():
+        path = prefix + tuple(str(key).split("."))
+        if isinstance(value, dict) and value and all(str(k).startswith("$") for k in value):
+            _compile_operators(column, path, value, containment, clauses, params)
+        elif isinstance(value, dict) and value:
+            _compile_into(column, value, path, containment, clauses, params)
+        elif isinstance(value, (list, tuple)):
+            clauses.append(_any_of(column, path, list(value), params))
+        else:
+            _merge_into(containment, path, value)
+
+def compile_criteria(criteria, column="demographics"):
+    """Compiles a criteria dict into a (where_sql, params) pair; empty criteria match everyone."""
+    if not isinstance(criteria, dict):
+        raise ValueError("segment criteria must be a JSON object")
+    containment, clauses, params = {}, [], []
+    _compile_into(column, criteria, (), containment, clauses, params)
+    if containment:
+        clauses.insert(0, f"{column} @> %s::jsonb")
+        params.insert(0, json.dumps(containment))
+    return (" AND ".join(clauses) if clauses else "TRUE"), params
+
+def criteria_fingerprint(criteria):
+    """Returns a canonical string for a criteria dict, used to detect criteria changes."""
+    return json.dumps(criteria, sort_keys=True, default=str)
+
+_plan_cache = {}
+_plan_cache_lock = threading.Lock()
+
+def get_compiled_segment(segment_id, criteria, version=None):
+    """Returns the cached plan for a segment, compiling it if missing or stale.
+
+    A plan is reused when it was compiled from the same row `version`, or,
+    without a version, from the same criteria.
+    """
+    with _plan_cache_lock:
+        plan = _plan_cache.get(segment_id)
+    if plan is not None and version is not None and plan.version == version:
+        return plan
+    fingerprint = criteria_fingerprint(criteria)
+    if plan is not None and plan.fingerprint == fingerprint:
+        if plan.version != version:
+            plan = plan._replace(version=version)
+            with _plan_cache_lock:
+                _plan_cache[segment_id] = plan
+        return plan
+    plan = CompiledSegment(version, fingerprint, *compile_criteria(criteria))
+    with _plan_cache_lock:
+        _plan_cache[segment_id] = plan
+    return plan
+
+def get_cached_segment(segment_id):
+    """Returns the cached plan for a segment, or None; it may be stale, see get_compiled_segment."""
+    with _plan_cache_lock:
+        return _plan_cache.get(segment_id)
+
+def invalidate_segment(segment_id=None):
+    """Drops the cached plan for one segment, or for all segments."""
+    with _plan_cache_lock:
+        if segment_id is None:
+            _plan_cache.clear()
+        else:
+            _plan_cache.pop(segment_id, None)
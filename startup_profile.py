@@ -0,0 +1,225 @@
+"""Startup profiling for the Streamlit app.
+
+frontend.py imports only Streamlit and the standard library up front; each
+page imports pandas, the backend and its other dependencies inside its own
+function, wrapped in imports(), and is rendered inside render(). Together
+they record, per page and per process, the time of the first render, how much
+of it went to imports, and which top-level modules it pulled in. Modules are
+charged to the thread that actually loaded them, so the background preload
+never shows up under a page rendered at the same time. The
+Diagnostics page shows get_report().
+
+After the first render, preload() imports the remaining page dependencies on
+a background thread, so later pages are warm without delaying the first one.
+
+The CLI measures a cold container: every module's import time in a fresh
+interpreter, then each page's first render in a fresh process (through
+Streamlit's AppTest, which runs the app against the configured database).
+
+    python startup_profile.py
+    python startup_profile.py --pages Campaigns "Business Insights" --output startup.json
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend.py")
+# Modules timed by the CLI, each in a fresh interpreter
+PROFILE_MODULES = (
+    "streamlit", "pandas", "numpy", "psycopg2", "backend", "query_cache", "analytics", "live_metrics",
+)
+# Seconds the CLI waits for one page to render
+RENDER_TIMEOUT = 120
+
+PROCESS_STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+_pages = {}
+_first_render = None
+_current = threading.local()
+
+class _ImportRecorder:
+    """Meta path finder that notes the top-level modules each thread loads; it never finds anything itself."""
+
+    def find_spec(self, fullname, path=None, target=None):
+        # Only reached for modules not yet in sys.modules, i.e. ones this thread is about to load
+        loaded = getattr(_current, "loaded", None)
+        if loaded is not None:
+            loaded.add(fullname.split(".")[0])
+        return None
+
+sys.meta_path.insert(0, _ImportRecorder())
+
+def _page_stats(page):
+    return _pages.setdefault(page, {
+        "renders": 0, "first_render_seconds": None, "last_render_seconds": None,
+        "import_seconds": 0.0, "modules": [],
+    })
+
+@contextmanager
+def imports():
+    """Times the imports in the block and charges them, and the modules they loaded, to the page being rendered."""
+    outer = getattr(_current, "loaded", None)
+    _current.loaded = set()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        # Failed optional imports are looked up too; keep only what was loaded
+        loaded = sorted(name for name in _current.loaded if name in sys.modules)
+        if outer is not None:
+            outer.update(_current.loaded)
+        _current.loaded = outer
+        page = getattr(_current, "page", None) or "startup"
+        with _lock:
+            stats = _page_stats(page)
+            stats["import_seconds"] += seconds
+            stats["modules"] = sorted(set(stats["modules"]) | set(loaded))
+
+@contextmanager
+def render(page):
+    """Times one render of `page`."""
+    global _first_render
+    _current.page = page
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _current.page = None
+        with _lock:
+            stats = _page_stats(page)
+            stats["renders"] += 1
+            stats["last_render_seconds"] = seconds
+            if stats["first_render_seconds"] is None:
+                stats["first_render_seconds"] = seconds
+            if _first_render is None:
+                _first_render = {"page": page, "seconds_since_start": time.perf_counter() - PROCESS_STARTED}
+
+def get_report():
+    """Returns {"first_render": ..., "pages": {page: stats}} for this process."""
+    with _lock:
+        return {
+            "first_render": dict(_first_render) if _first_render else None,
+            "pages": {page: dict(stats, modules=list(stats["modules"])) for page, stats in _pages.items()},
+        }
+
+_preload_started = False
+
+def preload(modules):
+    """Imports `modules` on a daemon thread, once per process; failures are left for the page to report."""
+    global _preload_started
+    with _lock:
+        if _preload_started:
+            return
+        _preload_started = True
+
+    def run():
+        _current.page = "preload"
+        with imports():
+            for name in modules:
+                try:
+                    importlib.import_module(name)
+                except Exception:
+                    pass
+
+    threading.Thread(target=run, name="preload", daemon=True).start()
+
+# --- CLI ---
+
+def _cold_import_seconds(module):
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(FRONTEND)
+    )
+    return float(result.stdout.strip()) if result.returncode == 0 else None
+
+def _render_page(page):
+    """Child process: renders `page` once through AppTest and prints the measurements as JSON."""
+    from streamlit.testing.v1 import AppTest
+    started = time.perf_counter()
+    app = AppTest.from_file(FRONTEND, default_timeout=RENDER_TIMEOUT)
+    app.run()
+    seconds = time.perf_counter() - started
+    # This script runs as __main__; the app imported the file again as startup_profile, and that
+    # module's counters are the ones the renders updated
+    report = importlib.import_module("startup_profile").get_report()
+    print(json.dumps({
+        "page": page,
+        "seconds": seconds,
+        "report": report,
+        "exceptions": [str(exception.message) for exception in app.exception],
+    }))
+
+def _profile_page(page):
+    env = dict(os.environ, MARK_DEFAULT_PAGE=page, MARK_PRELOAD="0", MARK_DIAGNOSTICS="1")
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "_render", page],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(FRONTEND)
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        return {"page": page, "wall_seconds": wall, "error": result.stderr.strip().splitlines()[-1:]}
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    stats = measured["report"]["pages"].get(page, {})
+    return {
+        "page": page,
+        "wall_seconds": wall,
+        "app_seconds": measured["seconds"],
+        "render_seconds": stats.get("first_render_seconds"),
+        "import_seconds": stats.get("import_seconds"),
+        "modules": stats.get("modules", []),
+        "exceptions": measured["exceptions"],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import and first-render times of the Streamlit app.")
+    parser.add_argument("--pages", nargs="*", help="pages to render (default: every page)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_render"]:
+        _render_page(argv[1])
+        return 0
+    args = parser.parse_args(argv)
+
+    print(f"{'module':<16}{'cold import (s)':>16}")
+    modules = {}
+    for module in PROFILE_MODULES:
+        modules[module] = _cold_import_seconds(module)
+        seconds = modules[module]
+        print(f"{module:<16}{seconds:>16.3f}" if seconds is not None else f"{module:<16}{'failed':>16}")
+
+    pages = args.pages or [
+        "Campaigns", "Customers", "Segments", "Performance Dashboard", "Business Insights", "Diagnostics",
+    ]
+    print()
+    print(f"{'page':<24}{'process (s)':>12}{'render (s)':>12}{'imports (s)':>12}  modules loaded")
+    results = []
+    for page in pages:
+        result = _profile_page(page)
+        results.append(result)
+        if "error" in result:
+            print(f"{page:<24}{result['wall_seconds']:>12.2f}  failed: {' '.join(result['error'])}")
+            continue
+        print(
+            f"{page:<24}{result['wall_seconds']:>12.2f}{result['render_seconds'] or 0:>12.2f}"
+            f"{result['import_seconds'] or 0:>12.2f}  {', '.join(result['modules'])}"
+        )
+        for exception in result["exceptions"]:
+            print(f"{'':<24}exception: {exception}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"modules": modules, "pages": results}, output, indent=2)
+    return 0 if all("error" not in result for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Write-behind buffer for high-frequency performance events.
+
+Tracking pixels and click webhooks call add_performance_data once per event,
+paying for a connection checkout, an INSERT and a commit every time. A
+WriteBuffer accepts events in memory instead and sums them per
+(campaign_id, metric_name, time bucket). A background thread writes the
+coalesced rows with backend.ingest_performance_events (one COPY per flush)
+once WRITE_BUFFER_FLUSH_SIZE keys are pending or every
+WRITE_BUFFER_FLUSH_INTERVAL seconds, whichever comes first.
+
+Each flushed row carries the bucket's start as its timestamp and the summed
+value, so rollup totals are exact while `samples` counts flushed rows rather
+than raw events. When WRITE_BUFFER_MAX_PENDING keys are waiting (e.g. the
+database is down), add() blocks until a flush frees room, or fails once its
+timeout expires. close(), also registered with atexit for the shared buffer,
+flushes everything before returning.
+
+    from write_buffer import record_performance_event
+    record_performance_event(campaign_id, "emails_clicked", 1)
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import backend
+
+logger = logging.getLogger(__name__)
+
+# Flush once this many (campaign, metric, bucket) keys are pending
+WRITE_BUFFER_FLUSH_SIZE = int(os.environ.get("WRITE_BUFFER_FLUSH_SIZE", "5000"))
+# Flush at least this often (seconds)
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("WRITE_BUFFER_FLUSH_INTERVAL", "1"))
+# Producers block once this many keys are pending
+WRITE_BUFFER_MAX_PENDING = int(os.environ.get("WRITE_BUFFER_MAX_PENDING", "100000"))
+# Width of the time buckets events are summed into (seconds)
+WRITE_BUFFER_BUCKET_SECONDS = int(os.environ.get("WRITE_BUFFER_BUCKET_SECONDS", "1"))
+
+class WriteBuffer:
+    """Coalesces performance events in memory and flushes them in batches from a background thread."""
+
+    def __init__(self, flush_size=None, flush_interval=None, max_pending=None, bucket_seconds=None):
+        self.flush_size = flush_size or WRITE_BUFFER_FLUSH_SIZE
+        self.flush_interval = flush_interval or WRITE_BUFFER_FLUSH_INTERVAL
+        self.max_pending = max(max_pending or WRITE_BUFFER_MAX_PENDING, self.flush_size)
+        self.bucket_seconds = bucket_seconds or WRITE_BUFFER_BUCKET_SECONDS
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._closed = False
+        self._flushing = 0
+        self._stats = {
+            "events": 0, "rows_written": 0, "flushes": 0, "failed_flushes": 0,
+            "blocked": 0, "rejected": 0, "flush_seconds_total": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+        self._thread.start()
+
+    def _bucket(self, timestamp):
+        seconds = timestamp.timestamp()
+        return datetime.fromtimestamp(seconds - seconds % self.bucket_seconds)
+
+    def add(self, campaign_id, metric_name, value, timestamp=None, timeout=None):
+        """Buffers one event and returns (success, message).
+
+        Blocks while the buffer is full, for at most `timeout` seconds if given.
+        """
+        key = (campaign_id, metric_name, self._bucket(timestamp or datetime.now()))
+        with self._condition:
+            if self._closed:
+                self._stats["rejected"] += 1
+                return False, "Write buffer is closed."
+            if key not in self._pending and len(self._pending) >= self.max_pending:
+                self._stats["blocked"] += 1
+                self._flush_requested = True
+                self._condition.notify_all()
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while key not in self._pending and len(self._pending) >= self.max_pending and not self._closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats["rejected"] += 1
+                        return False, "Write buffer is full."
+                    self._condition.wait(remaining)
+                if self._closed:
+                    self._stats["rejected"] += 1
+                    return False, "Write buffer is closed."
+            self._pending[key] = self._pending.get(key, 0) + value
+            self._stats["events"] += 1
+            if len(self._pending) >= self.flush_size and not self._flush_requested:
+                self._flush_requested = True
+                self._condition.notify_all()
+        return True, "Performance data buffered."
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._flush_requested and not self._closed:
+                    self._condition.wait(self.flush_interval)
+                closing = self._closed
+                self._flush_requested = False
+            flushed = self._flush_once()
+            if closing:
+                with self._condition:
+                    # Give up on a failing database rather than spin; close() reports what is left
+                    if not self._pending or not flushed:
+                        return
+
+    def _flush_once(self):
+        with self._condition:
+            if not self._pending:
+                return True
+            batch, self._pending = self._pending, {}
+            self._flushing += 1
+            # Room was freed; wake blocked producers
+            self._condition.notify_all()
+        started = time.perf_counter()
+        events = ((cid, metric, value, bucket) for (cid, metric, bucket), value in batch.items())
+        # One COPY and commit for the whole batch, so a failed flush wrote nothing and can be retried
+        success, message, stats = backend.ingest_performance_events(events, batch_size=len(batch))
+        with self._condition:
+            self._flushing -= 1
+            self._stats["flush_seconds_total"] += time.perf_counter() - started
+            self._stats["rows_written"] += stats["rows"]
+            if success:
+                self._stats["flushes"] += 1
+            else:
+                self._stats["failed_flushes"] += 1
+                for key, value in batch.items():
+                    self._pending[key] = self._pending.get(key, 0) + value
+            self._condition.notify_all()
+        if not success:
+            logger.error("Write buffer flush failed: %s", message)
+        return success
+
+    def flush(self, timeout=None):
+        """Asks the worker to flush now and waits until the buffer is drained; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while (self._pending or self._flushing) and self._thread.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining if remaining is not None else self.flush_interval)
+        return True
+
+    def close(self, timeout=None):
+        """Stops accepting events, flushes what is pending and stops the worker."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        with self._condition:
+            if self._pending:
+                logger.error("Write buffer closed with %d unwritten keys.", len(self._pending))
+        return not self._thread.is_alive()
+
+    def stats(self):
+        """Returns event, row and flush counters plus the pending key count and coalescing ratio."""
+        with self._condition:
+            snapshot = dict(self._stats)
+            snapshot["pending"] = len(self._pending)
+        snapshot["coalescing_ratio"] = snapshot["events"] / snapshot["rows_written"] if snapshot["rows_written"] else 0.0
+        return snapshot
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def get_write_buffer():
+    """Returns the process-wide write buffer, starting it on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBuffer()
+            atexit.register(_buffer.close)
+        return _buffer
+
+def record_performance_event(campaign_id, metric_name, value, timestamp=None, timeout=None):
+    """Buffered counterpart of backend.add_performance_data; returns (success, message)."""
+    return get_write_buffer().add(campaign_id, metric_name, value, timestamp, timeout)